@@ -1,8 +1,13 @@
 
 from mesa.agent import Agent
 import numpy as np
-import heapq
+import logging
 
+from events import STATUS, MOVEMENT, TASK, PATHFINDING
+from state import ROLES, ROLE_CODES, NO_PACKAGE, PackageStack
+from occupancy import HEADING_INDEX
+
+# Packages are integer ids in the world state; the agent class is kept for the visualization imports
 class Package(Agent):
     def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
@@ -11,17 +16,59 @@ class Package(Agent):
 class Robot(Agent):
 
     def __init__(self, unique_id, model, role='storage'):
+        # Position, role and carried package live in model.world; the agent is a view over its slot
+        self.world = model.world
+        self.slot = model.world.add_robot(unique_id, role)
+        self.model = model
+        self._pos = None
+        self.heading = (1, 0)
         super().__init__(unique_id, model)
-        self.role = role  # 'storage' para recoger del camión, 'loading' para recoger de los estantes
+        self.role = role  # 'storage' picks up from the truck, 'loading' picks up from the shelves
         self.carrying_package = None
         self.destination = None
         self.path = []
+        self.plan_version = None
         self.speed = 1
         self.movements = 0
         self.packages_delivered = 0
         self.stuck_time = 0
 
-        self.path_taken = []
+    @property
+    def pos(self):
+        return self._pos
+
+    @pos.setter
+    def pos(self, pos):
+        old_pos = self._pos
+        self._pos = pos
+        self.world.robot_xy[self.slot] = (-1, -1) if pos is None else pos
+        self.model.occupancy.move(old_pos, pos)
+        if old_pos is not None and pos is not None and (pos[0] - old_pos[0], pos[1] - old_pos[1]) in HEADING_INDEX:
+            self.heading = (pos[0] - old_pos[0], pos[1] - old_pos[1])
+
+    @property
+    def role(self):
+        return ROLES[self.world.robot_role[self.slot]]
+
+    @role.setter
+    def role(self, role):
+        self.world.robot_role[self.slot] = ROLE_CODES[role]
+
+    @property
+    def carrying_package(self):
+        package = self.world.robot_carrying[self.slot]
+        return None if package == NO_PACKAGE else int(package)
+
+    @carrying_package.setter
+    def carrying_package(self, package):
+        self.world.robot_carrying[self.slot] = NO_PACKAGE if package is None else package
+
+    @property
+    def path_taken(self):
+        return self.model.trajectory.robot_path(self.unique_id)
+
+    def record_action(self, pos, action):
+        self.model.trajectory.record(self.model.time_elapsed, self.unique_id, pos, action)
 
     def step(self):
         self.adjust_speed()
@@ -33,7 +80,7 @@ class Robot(Agent):
                     self.destination = self.model.unload_for_agent
                 else:
                     self.destination = self.find_shelf_with_package()
-                self.path = self.a_star_search(self.destination)
+                self.path = self.plan_path(self.destination)
 
             if self.pos == self.destination:
                 self.pick_up_package()
@@ -42,120 +89,87 @@ class Robot(Agent):
         else:
             if self.destination is None:
                 self.destination = self.find_destination()
-                self.path = self.a_star_search(self.destination)
+                self.path = self.plan_path(self.destination)
 
             if self.pos == self.destination:
                 self.deliver_package()
             else:
                 self.move_along_path()
 
-    def pick_up_package(self):
-        if self.role == 'storage':
-            unload_truck = self.model.grid.get_cell_list_contents([self.model.unload_for_agent])[0]
-            if isinstance(unload_truck, Truck) and unload_truck.packages:
-                self.carrying_package = unload_truck.packages.pop()
-                self.path_taken.append({"position": list(self.pos), "action": "pickup"})
-                print(f"Robot {self.unique_id} (storage) picked up a package from unload truck")
-        elif self.role == 'loading':
-            shelf_pos = self.model.shelf_to_stop.get(self.pos, None)
-            if shelf_pos:
-                shelf = self.model.grid.get_cell_list_contents([shelf_pos])
-                if shelf and isinstance(shelf[0], Shelf) and shelf[0].packages:
-                    self.carrying_package = shelf[0].packages.pop()
-                    self.path_taken.append({"position": list(self.pos), "action": "pickup_from_shelf"})
-                    print(f"Robot {self.unique_id} (loading) picked up a package from shelf at {shelf_pos}")
-        self.destination = None
-        self.stuck_time = 0
-
-
-    def deliver_package(self):
-        if self.pos == self.model.load_for_agent:
-            load_truck = self.model.grid.get_cell_list_contents([self.pos])[0]
-            if isinstance(load_truck, Truck):
-                load_truck.packages.append(self.carrying_package)
-                self.path_taken.append({"position": list(self.pos), "action": "deliver_load"})
-                self.packages_delivered += 1
-                print(f"Robot {self.unique_id} delivered a package to load truck. Total delivered: {self.packages_delivered}")
-        else:
-            shelf_pos = self.model.shelf_to_stop.get(self.pos, None)
-            if shelf_pos:
-                shelf = self.model.grid.get_cell_list_contents([shelf_pos])
-                if shelf and isinstance(shelf[0], Shelf) and shelf[0].add_package(self.carrying_package):
-                    self.path_taken.append({"position": list(self.pos), "action": "deliver_shelf"})
-                    self.packages_delivered += 1
-                    print(f"Robot {self.unique_id} delivered a package to shelf at {shelf_pos}. Total delivered: {self.packages_delivered}")
-
-        self.carrying_package = None
-        self.destination = None
-        self.stuck_time = 0
-
     def find_destination(self):
         if self.role == 'storage':
             return self.find_shelf_or_load_truck()
         elif self.role == 'loading':
             return self.model.load_for_agent
 
-    def find_shelf_or_load_truck(self):
-        shelves = [agent for agent in self.model.schedule.agents if isinstance(agent, Shelf) and agent.current_load < agent.capacity]
-        if not shelves:
-            return self.model.load_for_agent
-        nearest_shelf = min(shelves, key=lambda shelf: self.manhattan_distance(self.pos, shelf.pos))
-        stop_position = self.model.shelf_to_stop.get(nearest_shelf.pos, nearest_shelf.pos)
-        return stop_position
-
     def find_shelf_with_package(self):
-        shelves_with_packages = [agent for agent in self.model.schedule.agents if isinstance(agent, Shelf) and agent.current_load > 0]
-        if shelves_with_packages:
-            nearest_shelf = min(shelves_with_packages, key=lambda shelf: self.manhattan_distance(self.pos, shelf.pos))
+        nearest_shelf = self.model.shelf_index.nearest_with_packages(self.pos)
+        if nearest_shelf is not None:
             stop_position = self.model.shelf_to_stop.get(nearest_shelf.pos, nearest_shelf.pos)
             return stop_position
         else:
             return None
 
     def pick_up_package(self):
-        unload_truck = self.model.grid.get_cell_list_contents([self.model.unload_for_agent])[0]
-        if isinstance(unload_truck, Truck) and unload_truck.packages:
+        if self.model.docks.holds(self):
+            return  # queued for a slot, or still being served
+        shelf = self.model.workload.pick_from(self)
+        if shelf is not None:
+            # Sent to pick an outbound order from this shelf
+            self.carrying_package = shelf.pop_package()
+            self.model.robots_carrying += 1
+            self.record_action(self.pos, "pickup_from_shelf")
+            self.model.events.info(TASK, "Robot %s picked up a package for an order from shelf at %s", self.unique_id, shelf.pos, robot=self.unique_id, action="pickup_from_shelf")
+            self.destination = None
+            self.stuck_time = 0
+            return
+        unload_truck = self.model.docks.truck_at(self.pos, "unload")
+        if unload_truck is not None and unload_truck.packages:
             self.carrying_package = unload_truck.packages.pop()
-            self.path_taken.append({"position": list(self.pos), "action": "pickup"})
-            print(f"Robot {self.unique_id} picked up a package from unload truck")
+            self.model.robots_carrying += 1
+            self.record_action(self.pos, "pickup")
+            self.model.events.info(TASK, "Robot %s picked up a package from unload truck", self.unique_id, robot=self.unique_id, action="pickup")
         self.destination = None
         self.stuck_time = 0
 
 
 
     def deliver_package(self):
-        if self.pos == self.model.load_for_agent:
-            load_truck = self.model.grid.get_cell_list_contents([self.pos])[0]
-            if isinstance(load_truck, Truck):
-                load_truck.packages.append(self.carrying_package)
-                self.path_taken.append({"position": list(self.pos), "action": "deliver_load"})
-                self.packages_delivered += 1
-                self.model.packages_delivered_in_phase += 1
-                print(f"Robot {self.unique_id} delivered a package to load truck. Total delivered: {self.packages_delivered}")
+        if self.model.docks.holds(self):
+            return  # queued for a slot, or still being served
+        load_truck = self.model.docks.truck_at(self.pos, "load")
+        if load_truck is not None:
+            load_truck.packages.append(self.carrying_package)
+            self.record_action(self.pos, "deliver_load")
+            self.packages_delivered += 1
+            self.model.total_packages_delivered += 1
+            self.model.packages_delivered_in_phase += 1
+            self.model.workload.ship()
+            self.model.events.info(TASK, "Robot %s delivered a package to load truck. Total delivered: %s", self.unique_id, self.packages_delivered, robot=self.unique_id, action="deliver_load")
         else:
             shelf_pos = self.model.shelf_to_stop.get(self.pos, None)
             if shelf_pos:
                 shelf = self.model.grid.get_cell_list_contents([shelf_pos])
                 if shelf and isinstance(shelf[0], Shelf) and shelf[0].add_package(self.carrying_package):
-                    self.path_taken.append({"position": list(self.pos), "action": "deliver_shelf"})
+                    self.record_action(self.pos, "deliver_shelf")
                     self.packages_delivered += 1
+                    self.model.total_packages_delivered += 1
                     self.model.packages_delivered_in_phase += 1
-                    print(f"Robot {self.unique_id} delivered a package to shelf at {shelf_pos}. Total delivered: {self.packages_delivered}")
+                    self.model.events.info(TASK, "Robot %s delivered a package to shelf at %s. Total delivered: %s", self.unique_id, shelf_pos, self.packages_delivered, robot=self.unique_id, action="deliver_shelf")
 
         # Reset robot state after delivery
+        if self.carrying_package is not None:
+            self.model.robots_carrying -= 1
         self.carrying_package = None
         self.destination = None
         self.stuck_time = 0
 
 
     def find_shelf_or_load_truck(self):
-        shelves = [agent for agent in self.model.schedule.agents if isinstance(agent, Shelf) and agent.current_load < agent.capacity]
-        if not shelves:
+        # Find the nearest shelf with free capacity
+        nearest_shelf = self.model.shelf_index.nearest_with_capacity(self.pos)
+        if nearest_shelf is None:
             return self.model.load_for_agent
-        # return min(shelves, key=lambda shelf: self.manhattan_distance(self.pos, shelf.pos)).pos
-        
-        # Find the nearest shelf's stopping position
-        nearest_shelf = min(shelves, key=lambda shelf: self.manhattan_distance(self.pos, shelf.pos))
         
         # Get the stopping position from the dictionary
         stop_position = self.model.shelf_to_stop.get(nearest_shelf.pos, nearest_shelf.pos)
@@ -165,20 +179,41 @@ class Robot(Agent):
     def move_along_path(self):
         if self.path:
             next_pos = self.path[0]
-            if not self.is_position_occupied(next_pos) and not self.is_out_of_bounds(next_pos) and not self.is_position_occupied_by_obstacle(next_pos):
+            if next_pos == self.pos:
+                # Planned wait (cooperative planner)
                 self.path.pop(0)
-                self.path_taken.append({"position": list(next_pos), "action": "move"})
-                print(f"Robot {self.unique_id} moving to {next_pos}")
-                self.model.grid.move_agent(self, next_pos)
-                self.movements += 1
-                self.stuck_time = 0
+                self.model.wait_ticks += 1
+                return
+            if self.model.movement is not None:
+                # Synchronous movement: resolved with every other robot's move after the schedule step
+                self.model.movement.propose(self, next_pos)
+                return
+            if ((not self.is_position_occupied(next_pos) and not self.is_out_of_bounds(next_pos) and not self.is_position_occupied_by_obstacle(next_pos))
+                    or self.model.docks.make_way(self, next_pos)):
+                self.advance(next_pos)
             else:
-                self.stuck_time += 1
-                if self.stuck_time > 5:
-                    self.attempt_alternative_move()
+                self.wait_blocked()
         else:
             self.recalculate_path()
 
+    def advance(self, next_pos):
+        self.path.pop(0)
+        self.record_action(next_pos, "move")
+        self.model.events.debug(MOVEMENT, "Robot %s moving to %s", self.unique_id, next_pos)
+        self.model.grid.move_agent(self, next_pos)
+        self.movements += 1
+        self.model.total_movements += 1
+        self.stuck_time = 0
+
+    def wait_blocked(self):
+        if self.model.deadlocks is not None:
+            self.model.deadlocks.wait(self)
+        self.model.conflicts += 1
+        self.model.wait_ticks += 1
+        self.stuck_time += 1
+        if self.stuck_time > 5:
+            self.attempt_alternative_move()
+
 
 
     def is_out_of_bounds(self, pos):
@@ -192,10 +227,14 @@ class Robot(Agent):
         free_steps = [pos for pos in possible_steps if not self.is_position_occupied(pos) and not self.is_out_of_bounds(pos) and not self.is_position_occupied_by_obstacle(pos)]
 
         if free_steps:
+            self.model.alternative_moves += 1
+            if self.model.deadlocks is not None:
+                self.model.deadlocks.side_step(self)
             new_position = self.random.choice(free_steps)
-            print(f"Robot {self.unique_id} taking alternative step to {new_position}")
+            self.model.events.info(MOVEMENT, "Robot %s taking alternative step to %s", self.unique_id, new_position, robot=self.unique_id, action="alternative_move")
             self.model.grid.move_agent(self, new_position)
             self.movements += 1
+            self.model.total_movements += 1
             self.recalculate_path()
         self.stuck_time = 0
 
@@ -203,11 +242,11 @@ class Robot(Agent):
     def recalculate_path(self):
         if self.destination:
             # Ensure the new path avoids shelves
-            self.path = self.a_star_search(self.destination)
+            self.path = self.plan_path(self.destination)
             # Check the first few positions in the path and avoid shelves
             if self.path and any(self.is_position_occupied_by_obstacle(pos) for pos in self.path[:3]):
-                print(f"Robot {self.unique_id} recalculated path still includes a shelf, reattempting.")
-                self.path = self.a_star_search(self.destination)
+                self.model.events.warning(PATHFINDING, "Robot %s recalculated path still includes a shelf, reattempting.", self.unique_id)
+                self.path = self.plan_path(self.destination)
         else:
             self.find_new_task()
 
@@ -217,61 +256,30 @@ class Robot(Agent):
             self.destination = self.model.unload_for_agent
         else:
             self.destination = self.find_shelf_or_load_truck()
-        self.path = self.a_star_search(self.destination)
+        self.path = self.plan_path(self.destination)
 
     def is_position_occupied(self, pos):
-        cell_contents = self.model.grid.get_cell_list_contents(pos)
-        return any(isinstance(agent, Robot) for agent in cell_contents)
+        return self.model.occupancy.is_occupied(pos)
 
 
+    def plan_path(self, goal):
+        # Replanning from inside the robot's own step: the first move happens next tick
+        return self.model.planner.plan(self, goal, self.model.time_elapsed + 1)
+
     def a_star_search(self, goal):
-        def heuristic(a, b):
-            return abs(a[0] - b[0]) + abs(a[1] - b[1])
-
-        frontier = []
-        heapq.heappush(frontier, (0, self.pos))
-        came_from = {}
-        cost_so_far = {}
-        came_from[self.pos] = None
-        cost_so_far[self.pos] = 0
-
-        while frontier:
-            current = heapq.heappop(frontier)[1]
-
-            if current == goal:
-                break
-
-            for next_pos in self.model.grid.get_neighborhood(current, moore=False, include_center=False):
-                if self.is_out_of_bounds(next_pos) or self.is_position_occupied_by_obstacle(next_pos):
-                    continue
-                new_cost = cost_so_far[current] + 1
-                if next_pos not in cost_so_far or new_cost < cost_so_far[next_pos]:
-                    cost_so_far[next_pos] = new_cost
-                    priority = new_cost + heuristic(goal, next_pos)
-                    heapq.heappush(frontier, (priority, next_pos))
-                    came_from[next_pos] = current
-
-        if current != goal:
+        # Routes over the model's static navigation layer (computed once per start/goal pair)
+        path = self.model.navigation.shortest_path(self.pos, goal)
+        if path is None:
             # If the pathfinding failed, return an empty path or an alternative destination
-            print(f"Pathfinding failed from {self.pos} to {goal}. Returning to start or idle state.")
+            self.model.events.warning(PATHFINDING, "Pathfinding failed from %s to %s. Returning to start or idle state.", self.pos, goal, robot=self.unique_id)
             return []
-
-        path = []
-        while current != self.pos:
-            if current is None:
-                # If we can't reconstruct the path, return an empty path
-                return []
-            path.append(current)
-            current = came_from.get(current)
-        path.reverse()
         return path
 
 
 
 
     def is_position_occupied_by_obstacle(self, pos):
-        cell_contents = self.model.grid.get_cell_list_contents(pos)
-        return any(isinstance(agent, (Shelf, VisualTruck)) for agent in cell_contents)
+        return self.model.navigation.is_blocked(pos)
 
 
 
@@ -283,31 +291,47 @@ class Robot(Agent):
         self.speed = min(1, max(0.1, obstacle_free_distance / 10))
 
     def report_status(self):
-        print(f"Robot {self.unique_id}: Pos={self.pos}, Carrying={self.carrying_package is not None}, Speed={self.speed:.2f}")
+        events = self.model.events
+        if events.is_enabled(STATUS, logging.DEBUG):
+            events.debug(STATUS, "Robot %s: Pos=%s, Carrying=%s, Speed=%.2f", self.unique_id, self.pos, self.carrying_package is not None, self.speed)
 
     def calculate_obstacle_free_distance(self):
-        max_distance = 5
-        for distance in range(1, max_distance + 1):
-            next_pos = (self.pos[0] + distance, self.pos[1])
-            if self.model.grid.out_of_bounds(next_pos) or self.is_position_occupied(next_pos):
-                return distance - 1
-        return max_distance
+        # The clearance table the model computes for every robot at the start of the tick, rescanned
+        # for this robot if robots activated before it already moved
+        return self.model.occupancy.clearance_of(self.slot, self.pos, HEADING_INDEX[self.current_heading()])
+
+    def current_heading(self):
+        # Direction of the next planned step, or of the last move while waiting / without a path
+        if self.path:
+            dx, dy = self.path[0][0] - self.pos[0], self.path[0][1] - self.pos[1]
+            if (dx, dy) in HEADING_INDEX:
+                return (dx, dy)
+        return self.heading
 
 class Shelf(Agent):
     def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
         self.capacity = 10
-        self.packages = []
+        self.slot = model.world.add_shelf(self.capacity)
+        self.packages = PackageStack(model.world, "shelf_load", self.slot)
 
     def add_package(self, package):
         if len(self.packages) < self.capacity:
             self.packages.append(package)
+            self.model.total_packages_stored += 1
+            self.model.shelf_index.update(self)
             return True
         return False
 
+    def pop_package(self):
+        package = self.packages.pop()
+        self.model.total_packages_stored -= 1
+        self.model.shelf_index.update(self)
+        return package
+
     @property
     def current_load(self):
-        return len(self.packages)
+        return int(self.model.world.shelf_load[self.slot])
 
 
 
@@ -315,7 +339,8 @@ class Truck(Agent):
     def __init__(self, unique_id, model, truck_type):
         super().__init__(unique_id, model)
         self.truck_type = truck_type
-        self.packages = []
+        self.slot = model.world.add_truck()
+        self.packages = PackageStack(model.world, "truck_load", self.slot)
 
 
 class VisualTruck(Agent):
@@ -0,0 +1,183 @@
+# Headless batch runner: sweeps WarehouseModel over parameter grids on a process pool
+# and collects the final KPIs of every run into one tidy table.
+#
+#   python batch.py --num-robots 5 7 --initial-packages 100 200 --seeds 1 2 3 --out sweep.csv
+#
+# run_branches() does the same for variants that all continue from one snapshot (see snapshot.py).
+
+import argparse
+import csv
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from model import WarehouseModel
+from planning import PLANNERS
+from dispatch import DISPATCHERS
+from stepping import STEP_MODES
+from docks import DOCK_MODELS, DOCK_COLUMNS
+from movement import MOVEMENT_MODES
+from workload import WORKLOADS, WORKLOAD_COLUMNS
+from deadlock import DEADLOCK_POLICIES, DEADLOCK_COLUMNS
+from snapshot import restore
+
+DEFAULT_PARAMS = {
+    "width": 18,
+    "height": 12,
+    "num_robots": 5,
+    "initial_packages": 100,
+    "max_time": 1000,
+    "k": 0,
+    "phase_size": 10,
+    "seed": 0,
+    "planner": "greedy",
+    "layout": None,
+    "dispatcher": "greedy",
+    "step_mode": "tick",
+    "docks": "single",
+    "dock_options": None,
+    "movement": "sequential",
+    "workload": "batch",
+    "workload_options": None,
+    "deadlock_policy": "off",
+}
+
+RESULT_COLUMNS = ["time_elapsed", "total_movements", "total_packages_stored", "total_packages_delivered",
+                  "wait_ticks", "conflicts", "assignment_cost", "throughput"]
+
+
+def expand_grid(grid):
+    # {"num_robots": [5, 7], "seed": [1, 2]} -> one dict per combination, in a stable order
+    keys = list(grid)
+    combos = itertools.product(*(grid[key] for key in keys))
+    return [{**DEFAULT_PARAMS, **dict(zip(keys, values))} for values in combos]
+
+
+def run_single(params):
+    model = WarehouseModel(paths_file=None, log_level=None, **params)
+    while model.running:
+        model.step()
+    return result_row(model, params)
+
+
+def result_row(model, params):
+    row = dict(params)
+    for column in RESULT_COLUMNS:
+        value = getattr(model, column)
+        row[column] = value() if callable(value) else value
+    # Queue lengths and waiting times; left empty for the 'single' dock model
+    row.update(model.docks.metrics())
+    # Arrivals and order service; left empty for the 'batch' workload
+    row.update(model.workload.metrics())
+    # Wait-for cycles and side-step livelocks; left empty with deadlock_policy 'off'
+    if model.deadlocks is not None:
+        row.update(model.deadlocks.metrics())
+    return row
+
+
+def run_branch(job):
+    snapshot, overrides = job
+    model = restore(snapshot, log_level=None, **overrides)
+    while model.running:
+        model.step()
+    params = {name: model.params.get(name) for name in DEFAULT_PARAMS}
+    params.update(layout=model.layout.name, num_robots=len(model.world.robot_positions()),
+                  seed=overrides.get("seed", snapshot.meta["params"]["seed"]))
+    return result_row(model, params)
+
+
+def run_branches(snapshot, variants, workers=None):
+    # What-if runs: every variant (dict of constructor overrides) continues from the same snapshot
+    jobs = [(snapshot, overrides) for overrides in variants]
+    if workers == 1:
+        return [run_branch(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_branch, jobs))
+
+
+def run_sweep(grid, workers=None):
+    runs = expand_grid(grid)
+    if workers == 1:
+        return [run_single(params) for params in runs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_single, runs))
+
+
+def to_dataframe(rows):
+    import pandas as pd
+    return pd.DataFrame(rows, columns=list(DEFAULT_PARAMS) + RESULT_COLUMNS + DOCK_COLUMNS + WORKLOAD_COLUMNS
+                        + DEADLOCK_COLUMNS)
+
+
+def write_csv(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(DEFAULT_PARAMS) + RESULT_COLUMNS + DOCK_COLUMNS + WORKLOAD_COLUMNS
+                                + DEADLOCK_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run WarehouseModel parameter sweeps headlessly")
+    parser.add_argument("--width", type=int, nargs="+", default=[DEFAULT_PARAMS["width"]])
+    parser.add_argument("--height", type=int, nargs="+", default=[DEFAULT_PARAMS["height"]])
+    parser.add_argument("--num-robots", type=int, nargs="+", default=[DEFAULT_PARAMS["num_robots"]])
+    parser.add_argument("--initial-packages", type=int, nargs="+", default=[DEFAULT_PARAMS["initial_packages"]])
+    parser.add_argument("--max-time", type=int, nargs="+", default=[DEFAULT_PARAMS["max_time"]])
+    parser.add_argument("--k", type=int, nargs="+", default=[DEFAULT_PARAMS["k"]])
+    parser.add_argument("--phase-size", type=int, nargs="+", default=[DEFAULT_PARAMS["phase_size"]])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[DEFAULT_PARAMS["seed"]])
+    parser.add_argument("--planner", nargs="+", choices=PLANNERS, default=[DEFAULT_PARAMS["planner"]])
+    parser.add_argument("--layout", nargs="+", default=[DEFAULT_PARAMS["layout"]],
+                        help='layout JSON files or generated layouts such as "aisles:100x100"')
+    parser.add_argument("--dispatcher", nargs="+", choices=DISPATCHERS, default=[DEFAULT_PARAMS["dispatcher"]])
+    parser.add_argument("--step-mode", nargs="+", choices=STEP_MODES, default=[DEFAULT_PARAMS["step_mode"]],
+                        help='"event" gives the same results as "tick" and skips the ticks where robots only follow their paths')
+    parser.add_argument("--docks", nargs="+", choices=DOCK_MODELS, default=[DEFAULT_PARAMS["docks"]])
+    parser.add_argument("--dock-options", type=json.loads, default=DEFAULT_PARAMS["dock_options"],
+                        help='queued dock settings as JSON, e.g. \'{"slots": 3, "service_time": 2}\'')
+    parser.add_argument("--movement", nargs="+", choices=MOVEMENT_MODES, default=[DEFAULT_PARAMS["movement"]])
+    parser.add_argument("--workload", nargs="+", choices=WORKLOADS, default=[DEFAULT_PARAMS["workload"]])
+    parser.add_argument("--workload-options", type=json.loads, default=DEFAULT_PARAMS["workload_options"],
+                        help='streaming workload settings as JSON, e.g. \'{"inbound_rate": 0.2, "order_rate": 0.15}\'')
+    parser.add_argument("--deadlock-policy", nargs="+", choices=DEADLOCK_POLICIES,
+                        default=[DEFAULT_PARAMS["deadlock_policy"]])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default=None, help="CSV file for the results (printed to stdout if omitted)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    grid = {
+        "width": args.width,
+        "height": args.height,
+        "num_robots": args.num_robots,
+        "initial_packages": args.initial_packages,
+        "max_time": args.max_time,
+        "k": args.k,
+        "phase_size": args.phase_size,
+        "seed": args.seeds,
+        "planner": args.planner,
+        "layout": args.layout,
+        "dispatcher": args.dispatcher,
+        "step_mode": args.step_mode,
+        "docks": args.docks,
+        "dock_options": [args.dock_options],
+        "movement": args.movement,
+        "workload": args.workload,
+        "workload_options": [args.workload_options],
+        "deadlock_policy": args.deadlock_policy,
+    }
+    rows = run_sweep(grid, workers=args.workers)
+
+    if args.out:
+        write_csv(rows, args.out)
+        print(f"{len(rows)} runs saved to {args.out}")
+    else:
+        print(to_dataframe(rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# Benchmarks for the simulation core on seeded, headless scenarios.
+#
+#   python benchmark.py --out bench.json                  # run all scenarios
+#   python benchmark.py --out new.json --compare old.json # and print ratios against an earlier run
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+from agent import Robot
+from model import WarehouseModel
+
+SCENARIOS = {
+    "small": {"width": 18, "height": 12, "num_robots": 3, "initial_packages": 50, "max_time": 500, "k": 0},
+    "medium": {"width": 18, "height": 12, "num_robots": 5, "initial_packages": 100, "max_time": 1000, "k": 0},
+    "large": {"width": 30, "height": 20, "num_robots": 7, "initial_packages": 200, "max_time": 2000, "k": 1},
+    "aisles_60x40": {"width": None, "height": None, "num_robots": 40, "initial_packages": 400, "max_time": 1000, "k": 0,
+                     "layout": "aisles:60x40"},
+}
+
+MAX_GOALS = 16
+
+
+def build_model(params, seed):
+    return WarehouseModel(seed=seed, paths_file=None, log_level=None, **params)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"min": min(samples), "mean": sum(samples) / len(samples), "repeat": repeat}
+
+
+def bench_steps(params, seed):
+    model = build_model(params, seed)
+    samples = []
+    while model.running:
+        start = time.perf_counter()
+        model.step()
+        samples.append(time.perf_counter() - start)
+    return model, {
+        "steps": len(samples),
+        "total": sum(samples),
+        "mean": sum(samples) / len(samples),
+        "max": max(samples),
+        "total_movements": model.total_movements,
+        "total_packages_delivered": model.total_packages_delivered,
+    }
+
+
+def bench_queries(model, repeat):
+    robots = [agent for agent in model.schedule.agents if isinstance(agent, Robot)]
+    # Docks plus the first shelf stops; capped so large layouts stay comparable with small ones
+    goals = [model.unload_for_agent, model.load_for_agent] + list(model.shelf_to_stop)[:MAX_GOALS]
+
+    def a_star_cold():
+        model.navigation.path_cache.clear()
+        for robot in robots:
+            for goal in goals:
+                robot.a_star_search(goal)
+
+    def a_star_warm():
+        for robot in robots:
+            for goal in goals:
+                robot.a_star_search(goal)
+
+    def shelf_selection():
+        for robot in robots:
+            robot.find_shelf_or_load_truck()
+            robot.find_shelf_with_package()
+
+    calls = len(robots) * len(goals)
+    return {
+        "a_star_search_cold": {**timed(a_star_cold, repeat), "calls": calls},
+        "a_star_search_warm": {**timed(a_star_warm, repeat), "calls": calls},
+        "shelf_selection": {**timed(shelf_selection, repeat), "calls": 2 * len(robots)},
+    }
+
+
+def bench_export(model, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        model.paths_file = os.path.join(tmp, "robot_paths.json")
+        result = timed(model.export_paths_to_json, repeat)
+        result["bytes"] = os.path.getsize(model.paths_file)
+    model.paths_file = None
+    return result
+
+
+def run_benchmarks(scenarios, seed=0, repeat=5):
+    results = {}
+    for name in scenarios:
+        params = SCENARIOS[name]
+        model, steps = bench_steps(params, seed)
+        results[name] = {
+            "params": params,
+            "step": steps,
+            **bench_queries(model, repeat),
+            "export_paths_to_json": bench_export(model, repeat),
+        }
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current, baseline):
+    # Ratio current/baseline of the headline timing of every benchmark (< 1 is faster)
+    rows = []
+    for scenario, benches in current.items():
+        for bench, result in benches.items():
+            old = baseline.get(scenario, {}).get(bench)
+            if not isinstance(result, dict) or not old or bench == "params":
+                continue
+            key = "mean" if bench == "step" else "min"
+            if old.get(key):
+                rows.append((scenario, bench, old[key], result[key], result[key] / old[key]))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the warehouse simulation core")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default=None, help="JSON file for the results")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scenarios, seed=args.seed, repeat=args.repeat)
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": args.seed,
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for scenario, benches in results.items():
+        step = benches["step"]
+        print(f"{scenario}: {step['steps']} steps, {step['mean'] * 1e3:.3f} ms/step, "
+              f"a* cold {benches['a_star_search_cold']['min'] * 1e3:.2f} ms, "
+              f"warm {benches['a_star_search_warm']['min'] * 1e3:.2f} ms, "
+              f"shelves {benches['shelf_selection']['min'] * 1e6:.1f} us, "
+              f"export {benches['export_paths_to_json']['min'] * 1e3:.2f} ms")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        for scenario, bench, old, new, ratio in compare(results, baseline):
+            print(f"{scenario:>8} {bench:<22} {old:.6f}s -> {new:.6f}s  x{ratio:.2f}")
+
+
+if __name__ == "__main__":
+    main()
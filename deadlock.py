@@ -0,0 +1,211 @@
+from agent import Robot
+from events import MOVEMENT
+
+# Deadlock and livelock detection over a wait-for graph of blocked robots.
+#
+#   WarehouseModel(..., deadlock_policy="yield")   # or "detect" (report only), "off" (default)
+#   model.deadlocks.metrics()   # deadlocks, head-on swaps, ticks lost, yields, livelocks
+#
+# Every robot blocked this tick waits for the robot standing on its next cell; since a robot waits
+# for at most one other, the graph is a set of chains and cycles, found in one pass over the blocked
+# robots at the end of the tick (the rest of the fleet is never looked at). A cycle is a deadlock:
+# nobody in it can move (a 2-cycle is a head-on swap). 'detect' only counts them, the robot-ticks
+# they cost and how long they last; 'yield' also breaks each cycle the tick it appears: the robot
+# with the lowest priority steps onto a free neighbour cell (off the path of the robot waiting for
+# it, towards its own destination if possible) and replans, so the stuck_time > 5 random side step
+# never kicks in for it. In a crowd where no cycle member has a free neighbour, the yielder pushes a
+# short line of travelling robots (push_depth cells at most) one cell along towards a free cell, and
+# they replan too; a cycle nobody can break is left for the next tick (counted as unresolved).
+# Priority, highest first: livelocked robots, robots carrying a package, longer stuck time, lower id.
+# A livelock is a robot that keeps taking random side steps without picking up or delivering
+# anything (livelock_steps of them); it is counted once per episode and gets right of way in cycles.
+
+DEADLOCK_POLICIES = ("off", "detect", "yield")
+
+DEADLOCK_COLUMNS = ["deadlocks", "head_on_swaps", "deadlock_ticks", "deadlock_max_duration", "yields",
+                    "pushed", "unresolved", "livelocks", "livelock_side_steps"]
+
+
+class DeadlockDetector:
+    _COUNTERS = ("deadlocks", "head_on_swaps", "deadlock_ticks", "deadlock_max_duration", "yields", "pushed",
+                 "unresolved", "livelocks", "livelock_side_steps")
+
+    def __init__(self, model, resolve=True, livelock_steps=3, push_depth=3):
+        self.model = model
+        self.resolve_cycles = resolve
+        self.livelock_steps = livelock_steps
+        self.push_depth = push_depth
+        self.waiting = {}  # robot blocked this tick -> (its cell, the cell it wants)
+        self.active = {}   # cycle (frozenset of robot ids) -> tick it appeared
+        self.side_steps = {}  # robot -> [progress marker, side steps since]
+        self.deadlocks = 0
+        self.head_on_swaps = 0
+        self.deadlock_ticks = 0
+        self.deadlock_max_duration = 0
+        self.yields = 0
+        self.pushed = 0
+        self.unresolved = 0
+        self.livelocks = 0
+        self.livelock_side_steps = 0
+
+    def wait(self, robot):
+        # Robot.wait_blocked(): the robot could not enter path[0] this tick
+        self.waiting[robot] = (robot.pos, robot.path[0])
+
+    def side_step(self, robot):
+        # Robot.attempt_alternative_move(): counts side steps until the robot picks up or delivers again
+        marker = (robot.carrying_package, robot.packages_delivered)
+        entry = self.side_steps.get(robot)
+        if entry is None or entry[0] != marker:
+            entry = self.side_steps[robot] = [marker, 0]
+        entry[1] += 1
+        if entry[1] == self.livelock_steps:
+            self.livelocks += 1
+        if entry[1] >= self.livelock_steps:
+            self.livelock_side_steps += 1
+
+    def livelocked(self, robot):
+        entry = self.side_steps.get(robot)
+        return (entry is not None and entry[1] >= self.livelock_steps
+                and entry[0] == (robot.carrying_package, robot.packages_delivered))
+
+    def priority(self, robot):
+        return (self.livelocked(robot), robot.carrying_package is not None, robot.stuck_time, -robot.unique_id)
+
+    def resolve(self):
+        # End of tick: find the cycles among this tick's blocked robots, count them and (policy 'yield') break them
+        cycles = self.cycles()
+        tick = self.model.time_elapsed
+        active = {}
+        for cycle in cycles:
+            key = frozenset(robot.unique_id for robot in cycle)
+            started = self.active.get(key)
+            if started is None:
+                started = tick
+                self.deadlocks += 1
+                self.head_on_swaps += len(cycle) == 2
+            self.deadlock_ticks += len(cycle)
+            self.deadlock_max_duration = max(self.deadlock_max_duration, tick - started + 1)
+            if self.resolve_cycles and self.break_cycle(cycle):
+                continue
+            active[key] = started
+        self.active = active
+        self.waiting = {}
+
+    def cycles(self):
+        # Robots still where they were blocked and still wanting the same cell; each points at the blocked
+        # robot standing on that cell, if any
+        waiting = {robot: wanted for robot, (pos, wanted) in self.waiting.items()
+                   if robot.pos == pos and robot.path[:1] == [wanted]}
+        at = {robot.pos: robot for robot in waiting}
+        done = set()
+        cycles = []
+        for start in waiting:
+            chain = []
+            on_chain = set()
+            robot = start
+            while robot is not None and robot not in done and robot not in on_chain:
+                chain.append(robot)
+                on_chain.add(robot)
+                robot = at.get(waiting[robot])
+            if robot is not None and robot in on_chain:
+                cycles.append(chain[chain.index(robot):])
+            done.update(chain)
+        return cycles
+
+    def break_cycle(self, cycle):
+        # The lowest-priority robot that has somewhere to go steps aside
+        waits_for = {cycle[index]: cycle[index - 1] for index in range(len(cycle))}
+        for robot in sorted(cycle, key=self.priority):
+            chain = self.escape(robot, waits_for[robot], cycle)
+            if chain is not None:
+                self.yields += 1
+                # Pushed robots first, from the free cell backwards
+                movers = [robot] + [self.occupant(cell) for cell in chain[:-1]]
+                for mover, cell in reversed(list(zip(movers, chain))):
+                    self.step_aside(mover, cell)
+                self.pushed += len(chain) - 1
+                return True
+        self.unresolved += 1
+        return False
+
+    def escape(self, robot, behind, cycle):
+        # Shortest run of cells from the robot to a free one, through at most push_depth cells holding a
+        # travelling robot that can be pushed along; first steps off the path of the robot behind and
+        # towards the robot's destination are preferred
+        model = self.model
+        navigation = model.navigation
+        ahead = set(behind.path[:3])
+        first = []
+        for cell in self.neighbours(robot.pos):
+            distance = navigation.distance(cell, robot.destination) if robot.destination is not None else None
+            first.append((cell in ahead, distance is None, distance or 0, cell))
+        frontier = [[option[3]] for option in sorted(first)]
+        seen = {robot.pos} | {chain[0] for chain in frontier}
+        for _ in range(self.push_depth + 1):
+            expand = []
+            for chain in frontier:
+                if not model.occupancy.is_occupied(chain[-1]):
+                    return chain
+                occupant = self.occupant(chain[-1])
+                if occupant is not None and occupant not in cycle:
+                    expand.append(chain)
+            frontier = []
+            for chain in expand:
+                for cell in self.neighbours(chain[-1]):
+                    if cell not in seen:
+                        seen.add(cell)
+                        frontier.append(chain + [cell])
+        return None
+
+    def neighbours(self, pos):
+        navigation = self.model.navigation
+        x, y = pos
+        return [cell for cell in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+                if navigation.in_bounds(cell) and not navigation.is_blocked(cell)]
+
+    def occupant(self, cell):
+        # The robot on a cell if it is travelling (parked robots and ones at their destination stay put)
+        robots = [agent for agent in self.model.grid.get_cell_list_contents([cell]) if isinstance(agent, Robot)]
+        if len(robots) != 1:
+            return None
+        robot = robots[0]
+        return robot if robot.path and robot.pos != robot.destination else None
+
+    def step_aside(self, robot, cell):
+        model = self.model
+        model.events.debug(MOVEMENT, "Robot %s yielding to %s", robot.unique_id, cell)
+        model.grid.move_agent(robot, cell)
+        robot.record_action(cell, "move")
+        robot.movements += 1
+        model.total_movements += 1
+        robot.stuck_time = 0
+        robot.path = robot.plan_path(robot.destination) if robot.destination is not None else []
+
+    def metrics(self):
+        return {name: getattr(self, name) for name in self._COUNTERS}
+
+    def get_state(self):
+        state = self.metrics()
+        state["active"] = [[sorted(key), tick] for key, tick in self.active.items()]
+        state["side_steps"] = [[robot.unique_id, marker[0], marker[1], count]
+                               for robot, (marker, count) in self.side_steps.items()]
+        return state
+
+    def set_state(self, state):
+        for name in self._COUNTERS:
+            setattr(self, name, state[name])
+        self.active = {frozenset(key): tick for key, tick in state["active"]}
+        robots = {agent.unique_id: agent for agent in self.model.schedule.agents}
+        self.side_steps = {robots[robot]: [(carrying, delivered), count]
+                           for robot, carrying, delivered, count in state["side_steps"]}
+
+
+def make_deadlock_detector(name, model):
+    if name == "off":
+        return None
+    if name == "detect":
+        return DeadlockDetector(model, resolve=False)
+    if name == "yield":
+        return DeadlockDetector(model, resolve=True)
+    raise ValueError(f"Unknown deadlock policy {name!r}, expected one of {DEADLOCK_POLICIES}")
@@ -0,0 +1,228 @@
+import numpy as np
+
+DISPATCHERS = ("greedy", "hungarian")
+
+UNASSIGNED_COST = 10 ** 6
+
+
+class GreedyDispatcher:
+    # Original policy: one robot at a time in schedule order, nearest shelf by Manhattan distance
+
+    def __init__(self, model):
+        self.model = model
+
+    def assign(self, robots, steady=()):
+        # steady: robots whose plan is known to stay this tick (FastForward.steady), counted as kept
+        for robot in robots:
+            if robot in steady:
+                self.model.replans_avoided += 1
+                continue
+            if not robot.carrying_package:
+                self.model.assign_pickup_task(robot)
+            else:
+                self.model.assign_delivery_task(robot)
+
+    def keeps_destination(self, robot, pos):
+        # Whether assign() would leave a carrying robot's destination alone with the robot at pos
+        model = self.model
+        if model.delivering_to_load_truck:
+            return robot.destination == model.load_for_agent
+        shelf = model.shelf_index.nearest_with_capacity(pos)
+        stop = model.load_for_agent if shelf is None else model.shelf_index.stop_position(shelf)
+        return stop == robot.destination
+
+    def get_state(self):
+        return {}
+
+    def set_state(self, state):
+        pass
+
+
+class HungarianDispatcher:
+    # Batches every carrying robot that needs a shelf this tick and solves one assignment
+    # problem against the free shelf slots, using true path lengths from the navigation cache.
+    # Robots keep their task while it stays valid, so the batch is usually small.
+    # Robots heading for a truck (idle robots to the unload dock, deliveries to the load truck) are
+    # batched the same way against the dock's free service slots (docks="queued"); the ones left
+    # without a slot queue at the dock in schedule order as usual.
+
+    def __init__(self, model):
+        self.model = model
+        self.batches = 0
+
+    def assign(self, robots, steady=()):
+        model = self.model
+        deliver_to_truck = None
+        batch = []
+        # Dock-bound robots wait for the batch only while the dock has slots to hand out
+        to_dock = {stop: [] for stop in (model.unload_for_agent, model.load_for_agent) if model.docks.free_slots(stop)}
+        for robot in robots:
+            if robot in steady:
+                model.replans_avoided += 1
+                continue
+            if not robot.carrying_package:
+                # Same order as model.assign_pickup_task: open orders, then the unload truck
+                stop = model.workload.pick_stop(robot)
+                if stop is not None:
+                    model.plan_route(robot, stop)
+                elif model.unload_truck.packages:
+                    self.send_to_dock(robot, model.unload_for_agent, to_dock)
+                else:
+                    model.assign_idle_task(robot)
+                continue
+            if deliver_to_truck is None:
+                deliver_to_truck = model.should_deliver_to_load_truck()
+            if deliver_to_truck:
+                self.send_to_dock(robot, model.load_for_agent, to_dock)
+            elif self.has_shelf_task(robot):
+                model.plan_route(robot, robot.destination)
+            else:
+                batch.append(robot)
+        for stop, dock_batch in to_dock.items():
+            if dock_batch:
+                self.assign_slots(stop, dock_batch)
+        if batch:
+            self.assign_shelves(batch, robots)
+
+    def keeps_destination(self, robot, pos):
+        # Shelf tasks do not depend on where the robot is, only on the shelf staying free
+        if self.model.delivering_to_load_truck:
+            return robot.destination == self.model.load_for_agent
+        return self.has_shelf_task(robot)
+
+    def get_state(self):
+        return {"batches": self.batches}
+
+    def set_state(self, state):
+        self.batches = state["batches"]
+
+    def has_shelf_task(self, robot):
+        shelf = self.model.shelf_index.by_pos.get(self.model.shelf_to_stop.get(robot.destination))
+        return shelf is not None and shelf.current_load < shelf.capacity
+
+    def assign_shelves(self, batch, robots):
+        model = self.model
+        index = model.shelf_index
+
+        # Free slots per shelf, minus robots already on their way to it
+        inbound = {}
+        for robot in robots:
+            if robot.carrying_package and robot not in batch:
+                shelf_pos = model.shelf_to_stop.get(robot.destination)
+                if shelf_pos is not None:
+                    inbound[shelf_pos] = inbound.get(shelf_pos, 0) + 1
+
+        columns = []
+        for shelf in index.rank:
+            stop = index.stop_position(shelf)
+            if stop is None or shelf not in index.with_capacity:
+                continue
+            free = shelf.capacity - shelf.current_load - inbound.get(shelf.pos, 0)
+            columns += [stop] * min(free, len(batch))
+
+        if not columns:
+            for robot in batch:
+                model.plan_route(robot, model.load_for_agent)
+            return
+
+        distance = model.navigation.distance
+        cost = np.full((len(batch), max(len(columns), len(batch))), UNASSIGNED_COST, dtype=np.int64)
+        for row, robot in enumerate(batch):
+            for col, stop in enumerate(columns):
+                steps = distance(robot.pos, stop)
+                if steps is not None:
+                    cost[row, col] = steps
+
+        self.batches += 1
+        for row, col in enumerate(solve_assignment(cost)):
+            robot = batch[row]
+            if col < len(columns) and cost[row, col] < UNASSIGNED_COST:
+                model.plan_route(robot, columns[col])
+            else:
+                model.plan_route(robot, model.load_for_agent)
+
+
+    def send_to_dock(self, robot, stop, to_dock):
+        if stop in to_dock:
+            to_dock[stop].append(robot)
+        else:
+            self.model.plan_route(robot, stop)
+
+    def assign_slots(self, stop, batch):
+        # Robots not yet at the dock behind stop against its free slots; cheapest matches are granted
+        # first, in case the truck runs out of packages (or room) before every slot is handed out
+        model = self.model
+        docks = model.docks
+        slots = docks.free_slots(stop)
+        arriving = [robot for robot in batch if not docks.at_dock(robot, stop)]
+        if slots and arriving:
+            distance = model.navigation.distance
+            cost = np.full((len(arriving), max(len(slots), len(arriving))), UNASSIGNED_COST, dtype=np.int64)
+            for row, robot in enumerate(arriving):
+                for col, slot in enumerate(slots):
+                    steps = distance(robot.pos, slot)
+                    if steps is not None:
+                        cost[row, col] = steps
+            self.batches += 1
+            matches = sorted((cost[row, col], row, col) for row, col in enumerate(solve_assignment(cost))
+                             if col < len(slots) and cost[row, col] < UNASSIGNED_COST)
+            for _, row, col in matches:
+                if not docks.grant(arriving[row], stop, slots[col]):
+                    break
+        for robot in batch:
+            model.plan_route(robot, stop)
+
+
+def solve_assignment(cost):
+    # Hungarian algorithm (shortest augmenting paths) for a rows <= columns cost matrix.
+    # Returns the column assigned to every row, minimising the total cost.
+    cost = np.asarray(cost, dtype=np.float64)
+    n, m = cost.shape
+    if n > m:
+        raise ValueError(f"Assignment needs at least as many columns as rows, got {n}x{m}")
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)    # p[j]: row matched to column j (1-based, 0 = free)
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            reduced = np.full(m + 1, np.inf)
+            reduced[1:] = cost[i0 - 1] - u[i0] - v[1:]
+            free = ~used
+            better = free & (reduced < minv)
+            minv[better] = reduced[better]
+            way[better] = j0
+            candidates = np.where(free, minv, np.inf)
+            j1 = int(np.argmin(candidates))
+            delta = candidates[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    assignment = [0] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+def make_dispatcher(name, model):
+    if name == "greedy":
+        return GreedyDispatcher(model)
+    if name == "hungarian":
+        return HungarianDispatcher(model)
+    raise ValueError(f"Unknown dispatcher {name!r}, expected one of {DISPATCHERS}")
@@ -0,0 +1,541 @@
+import bisect
+from abc import ABC, abstractmethod
+from collections import deque
+
+# Dock models: how robots are served at the unload and load trucks.
+#
+#   WarehouseModel(..., docks="queued", dock_options={"slots": 2, "service_time": 1,
+#                                                     "truck_capacity": 50, "arrivals": [[200, 60], [400, 60]]})
+#   model.docks.metrics()   # queue lengths, waiting times, trucks served
+#
+# 'single' is the original behaviour: one stop cell per truck that every robot heads for, the unload
+# truck holds every package from the start and the load truck never fills up.
+# 'queued' gives every truck a bay:
+#   - service slots: the truck's free neighbour cells (the layout stop first), one robot each, busy for
+#     service_time ticks before the pickup/drop happens;
+#   - a queue per bay ('fifo' or 'nearest' first) whose robots wait on assigned waiting cells behind
+#     the slots (kept one cell away so the approach stays free) instead of crowding the stop, and
+#     give way to any robot they block unless it is further back in the queue;
+#   - unload trucks carry at most truck_capacity packages; the initial packages and every scheduled
+#     arrival [tick, packages] become trucks in a yard (at most yard_capacity, the rest are turned
+#     away) that dock one at a time, turnaround ticks after the previous one left empty;
+#   - the load truck leaves when it holds load_capacity packages and an empty one docks turnaround
+#     ticks later.
+# Dispatchers keep routing robots to the stop cells; model.plan_route() asks the docks for the
+# actual slot or waiting cell (the nearest free slot). A batching dispatcher can match arriving robots
+# with free_slots() itself and grant() them first (see HungarianDispatcher.assign_slots).
+
+DOCK_MODELS = ("single", "queued")
+QUEUE_DISCIPLINES = ("fifo", "nearest")
+
+DOCK_COLUMNS = ["unload_served", "unload_wait_mean", "unload_wait_max", "unload_queue_mean", "unload_queue_max",
+                "unload_yields", "unload_trucks_docked", "unload_trucks_turned_away", "unload_packages_turned_away",
+                "unload_yard_max", "unload_yard_wait_mean",
+                "load_served", "load_wait_mean", "load_wait_max", "load_queue_mean", "load_queue_max",
+                "load_yields", "load_trucks_departed", "load_packages_shipped"]
+
+NO_SLOT_COST = 10 ** 6  # queue key / slot cost for a robot with no path to any slot
+
+
+class SingleStopDocks:
+    def __init__(self, model):
+        self.model = model
+
+    def receive(self, packages):
+        for package in packages:
+            self.model.unload_truck.packages.append(package)
+
+    def update(self):
+        pass
+
+    def route(self, robot, destination):
+        return destination
+
+    def manages(self, robot, destination):
+        # Whether route() would do more than hand the destination back (see FastForward.follow)
+        return False
+
+    def free_slots(self, stop):
+        # One stop cell per truck: no slots to hand out
+        return []
+
+    def at_dock(self, robot, stop):
+        return False
+
+    def grant(self, robot, stop, slot):
+        return False
+
+    def leave(self, robot):
+        pass
+
+    def holds(self, robot):
+        return False
+
+    def make_way(self, robot, cell):
+        return False
+
+    def truck_at(self, pos, kind):
+        # Pickups take from the unload truck wherever the robot stops, drops need the load stop
+        if kind == "unload":
+            return self.model.unload_truck
+        return self.model.load_truck if pos == self.model.load_for_agent else None
+
+    def incoming(self):
+        return 0
+
+    def next_event(self, start):
+        return None
+
+    def metrics(self):
+        return {}
+
+    def get_state(self):
+        return {}
+
+    def set_state(self, state):
+        pass
+
+
+class Dock(ABC):
+    # One truck's bay: service slots, waiting cells and the queue of robots waiting for a slot
+    _COUNTERS = ("tickets", "served", "wait_total", "wait_max", "queue_area", "queue_max", "queue_since", "yields")
+
+    def __init__(self, model, truck, slots, waiting, service_time, discipline):
+        self.model = model
+        self.truck = truck
+        self.slots = slots
+        self.waiting = waiting
+        self.service_time = service_time
+        self.discipline = discipline
+        self.queue = []     # sorted (key, ticket, robot)
+        self.cells = {}     # queued robot -> waiting cell, None when every cell is taken (waits where it is)
+        self.joined = {}    # queued robot -> tick it joined the queue
+        self.serving = {}   # robot -> [slot, ticks served]
+        self.tickets = 0
+        self.served = 0
+        self.wait_total = 0
+        self.wait_max = 0
+        self.queue_area = 0  # queue length integrated over ticks
+        self.queue_max = 0
+        self.queue_since = 0
+        self.yields = 0
+
+    @abstractmethod
+    def can_serve(self):
+        # Whether the truck can take or hand over a package right now
+        ...
+
+    def place(self, robot, tick):
+        # Cell the robot should head for: its slot, its waiting cell, or where it stands (queue overflow)
+        serving = self.serving.get(robot)
+        if serving is not None:
+            return serving[0]
+        if robot not in self.joined:
+            if not self.queue and self.can_serve() and self.free_slots():
+                return self.grant(robot, tick)
+            self.join(robot, tick)
+        return self.cells[robot] or robot.pos
+
+    def join(self, robot, tick):
+        self.account(tick)
+        if self.discipline == "nearest":
+            distances = [self.model.navigation.distance(robot.pos, slot) for slot in self.slots]
+            key = min((distance for distance in distances if distance is not None), default=NO_SLOT_COST)
+        else:
+            key = 0
+        self.tickets += 1
+        bisect.insort(self.queue, (key, self.tickets, robot))
+        self.queue_max = max(self.queue_max, len(self.queue))
+        taken = set(self.cells.values())
+        self.cells[robot] = next((cell for cell in self.waiting if cell not in taken), None)
+        self.joined[robot] = tick
+
+    def grant(self, robot, tick, slot=None):
+        # Nearest free slot unless the dispatcher picked one
+        if robot in self.joined:
+            self.remove(robot, tick)
+        if slot is None:
+            distances = [self.model.navigation.distance(robot.pos, slot) for slot in self.free_slots()]
+            slot = min(zip(self.free_slots(), distances), key=lambda option: NO_SLOT_COST if option[1] is None else option[1])[0]
+        self.serving[robot] = [slot, 0]
+        return slot
+
+    def remove(self, robot, tick):
+        # Takes a queued robot out of the queue and hands its waiting cell to the first robot without one
+        self.account(tick)
+        self.queue = [entry for entry in self.queue if entry[2] is not robot]
+        wait = tick - self.joined.pop(robot)
+        cell = self.cells.pop(robot)
+        if cell is not None:
+            for _, _, queued in self.queue:
+                if self.cells[queued] is None:
+                    self.cells[queued] = cell
+                    break
+        return wait
+
+    def ahead(self, robot, other):
+        # Whether robot comes before other in the queue
+        for _, _, queued in self.queue:
+            if queued is robot or queued is other:
+                return queued is robot
+        return False
+
+    def leave(self, robot, tick):
+        self.serving.pop(robot, None)
+        if robot in self.joined:
+            self.remove(robot, tick)
+
+    def pump(self, tick):
+        # Hands free slots to the head of the queue
+        while self.queue and self.can_serve() and self.free_slots():
+            robot = self.queue[0][2]
+            wait = tick - self.joined[robot]
+            self.grant(robot, tick)
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def serve(self, robot):
+        # True while the robot has to keep waiting: queued, or at its slot for less than service_time ticks
+        serving = self.serving.get(robot)
+        if serving is None or robot.pos != serving[0]:
+            return True
+        serving[1] += 1
+        if serving[1] <= self.service_time:
+            return True
+        del self.serving[robot]
+        self.served += 1
+        return False
+
+    def free_slots(self):
+        taken = {serving[0] for serving in self.serving.values()}
+        return [slot for slot in self.slots if slot not in taken]
+
+    def account(self, tick):
+        self.queue_area += len(self.queue) * (tick - self.queue_since)
+        self.queue_since = tick
+
+    def metrics(self, tick):
+        self.account(tick)
+        granted = self.served + len(self.serving)
+        return {"served": self.served,
+                "wait_mean": self.wait_total / granted if granted else 0.0,
+                "wait_max": self.wait_max,
+                "queue_mean": self.queue_area / tick if tick else 0.0,
+                "queue_max": self.queue_max,
+                "yields": self.yields}
+
+    def get_state(self):
+        state = {name: getattr(self, name) for name in self._COUNTERS}
+        state["queue"] = [[key, ticket, robot.unique_id] for key, ticket, robot in self.queue]
+        state["cells"] = [[robot.unique_id, list(cell) if cell else None] for robot, cell in self.cells.items()]
+        state["joined"] = [[robot.unique_id, tick] for robot, tick in self.joined.items()]
+        state["serving"] = [[robot.unique_id, list(slot), ticks] for robot, (slot, ticks) in self.serving.items()]
+        return state
+
+    def set_state(self, state, robots):
+        for name in self._COUNTERS:
+            setattr(self, name, state[name])
+        self.queue = [(key, ticket, robots[robot]) for key, ticket, robot in state["queue"]]
+        self.cells = {robots[robot]: tuple(cell) if cell else None for robot, cell in state["cells"]}
+        self.joined = {robots[robot]: tick for robot, tick in state["joined"]}
+        self.serving = {robots[robot]: [tuple(slot), ticks] for robot, slot, ticks in state["serving"]}
+
+
+class UnloadDock(Dock):
+    _COUNTERS = Dock._COUNTERS + ("docked", "ready_at", "trucks_docked", "trucks_turned_away",
+                                  "packages_turned_away", "yard_wait_total", "yard_max")
+
+    def __init__(self, model, truck, slots, waiting, service_time, discipline, capacity, yard_capacity,
+                 turnaround, arrivals):
+        super().__init__(model, truck, slots, waiting, service_time, discipline)
+        self.capacity = capacity
+        self.yard_capacity = yard_capacity
+        self.turnaround = turnaround
+        self.schedule = deque(sorted((int(tick), int(count)) for tick, count in arrivals or ()))
+        self.yard = deque()  # [arrival tick, package ids] per waiting truck
+        self.docked = False
+        self.ready_at = 0
+        self.trucks_docked = 0
+        self.trucks_turned_away = 0
+        self.packages_turned_away = 0
+        self.yard_wait_total = 0
+        self.yard_max = 0
+
+    def can_serve(self):
+        # Every robot in a slot has a package waiting for it
+        return self.docked and len(self.truck.packages) > len(self.serving)
+
+    def arrive(self, packages, tick):
+        size = self.capacity or max(1, len(packages))
+        for start in range(0, len(packages), size):
+            load = packages[start:start + size]
+            self.dock_next(tick)
+            if self.yard_capacity is not None and len(self.yard) >= self.yard_capacity:
+                self.trucks_turned_away += 1
+                self.packages_turned_away += len(load)
+                continue
+            self.yard.append([tick, load])
+            self.yard_max = max(self.yard_max, len(self.yard))
+        self.dock_next(tick)
+
+    def update(self, tick):
+        while self.schedule and self.schedule[0][0] <= tick:
+            _, count = self.schedule.popleft()
+            self.arrive([self.model.next_id() for _ in range(count)], tick)
+        if self.docked and not self.truck.packages:
+            self.docked = False
+            self.ready_at = tick + self.turnaround
+        self.dock_next(tick)
+
+    def dock_next(self, tick):
+        if self.docked or not self.yard or tick < self.ready_at:
+            return
+        arrived, load = self.yard.popleft()
+        for package in load:
+            self.truck.packages.append(package)
+        self.docked = True
+        self.trucks_docked += 1
+        self.yard_wait_total += tick - arrived
+
+    def incoming(self):
+        return sum(len(load) for _, load in self.yard) + sum(count for _, count in self.schedule)
+
+    def next_event(self, start):
+        ticks = []
+        if self.schedule:
+            ticks.append(self.schedule[0][0])
+        if self.docked and not self.truck.packages:
+            ticks.append(start + 1)
+        if not self.docked and self.yard:
+            ticks.append(max(self.ready_at, start + 1))
+        return min(ticks, default=None)
+
+    def metrics(self, tick):
+        metrics = super().metrics(tick)
+        metrics.update(trucks_docked=self.trucks_docked, trucks_turned_away=self.trucks_turned_away,
+                       packages_turned_away=self.packages_turned_away, yard_max=self.yard_max,
+                       yard_wait_mean=self.yard_wait_total / self.trucks_docked if self.trucks_docked else 0.0)
+        return metrics
+
+    def get_state(self):
+        state = super().get_state()
+        state["schedule"] = [list(arrival) for arrival in self.schedule]
+        state["yard"] = [[arrived, list(load)] for arrived, load in self.yard]
+        return state
+
+    def set_state(self, state, robots):
+        super().set_state(state, robots)
+        self.schedule = deque(tuple(arrival) for arrival in state["schedule"])
+        self.yard = deque([arrived, list(load)] for arrived, load in state["yard"])
+
+
+class LoadDock(Dock):
+    _COUNTERS = Dock._COUNTERS + ("present", "ready_at", "trucks_departed", "packages_shipped")
+
+    def __init__(self, model, truck, slots, waiting, service_time, discipline, capacity, turnaround):
+        super().__init__(model, truck, slots, waiting, service_time, discipline)
+        self.capacity = capacity
+        self.turnaround = turnaround
+        self.present = True
+        self.ready_at = 0
+        self.trucks_departed = 0
+        self.packages_shipped = 0
+
+    def is_full(self):
+        return self.capacity is not None and len(self.truck.packages) >= self.capacity
+
+    def can_serve(self):
+        # Room on the truck for every robot in a slot
+        return self.present and (self.capacity is None or len(self.truck.packages) + len(self.serving) < self.capacity)
+
+    def update(self, tick):
+        if self.present and self.is_full() and not self.serving:
+            self.packages_shipped += len(self.truck.packages)
+            self.truck.packages.clear()
+            self.trucks_departed += 1
+            self.present = False
+            self.ready_at = tick + self.turnaround
+        if not self.present and tick >= self.ready_at:
+            self.present = True
+
+    def next_event(self, start):
+        if self.present:
+            return start + 1 if self.is_full() else None
+        return max(self.ready_at, start + 1)
+
+    def metrics(self, tick):
+        metrics = super().metrics(tick)
+        metrics.update(trucks_departed=self.trucks_departed, packages_shipped=self.packages_shipped)
+        return metrics
+
+
+class QueuedDocks:
+    def __init__(self, model, slots=2, service_time=0, discipline="fifo", queue_cells=8, truck_capacity=None,
+                 yard_capacity=None, load_capacity=None, turnaround=0, arrivals=None):
+        if discipline not in QUEUE_DISCIPLINES:
+            raise ValueError(f"Unknown queue discipline {discipline!r}, expected one of {QUEUE_DISCIPLINES}")
+        self.model = model
+        layout = model.layout
+        reserved = set(layout.shelf_stops) | {layout.unload_stop, layout.load_stop}
+        unload_slots = dock_slots(layout, layout.unload_truck, layout.unload_stop, slots, reserved)
+        reserved |= set(unload_slots)
+        load_slots = dock_slots(layout, layout.load_truck, layout.load_stop, slots, reserved)
+        reserved |= set(load_slots)
+        unload_waiting = waiting_cells(layout, unload_slots, queue_cells, reserved)
+        reserved |= set(unload_waiting)
+        load_waiting = waiting_cells(layout, load_slots, queue_cells, reserved)
+
+        self.unload = UnloadDock(model, model.unload_truck, unload_slots, unload_waiting, service_time, discipline,
+                                 truck_capacity, yard_capacity, turnaround, arrivals)
+        self.load = LoadDock(model, model.load_truck, load_slots, load_waiting, service_time, discipline,
+                             load_capacity, turnaround)
+        self.by_stop = {layout.unload_stop: self.unload, layout.load_stop: self.load}
+        model.navigation.add_goals(unload_slots + load_slots + unload_waiting + load_waiting)
+        self.members = {}  # robot -> dock it is queued at or served by
+
+    def receive(self, packages):
+        tick = self.model.time_elapsed
+        self.unload.arrive(list(packages), tick)
+
+    def update(self):
+        tick = self.model.time_elapsed
+        for dock in (self.unload, self.load):
+            dock.update(tick)
+            dock.pump(tick)
+
+    def route(self, robot, destination):
+        dock = self.by_stop.get(destination)
+        current = self.members.get(robot)
+        if current is not None and current is not dock:
+            self.leave(robot)
+        if dock is None:
+            return destination
+        self.members[robot] = dock
+        return dock.place(robot, self.model.time_elapsed)
+
+    def manages(self, robot, destination):
+        return destination in self.by_stop or robot in self.members
+
+    def free_slots(self, stop):
+        # Slots route() would hand straight to robots arriving at the dock behind stop (none while robots queue)
+        dock = self.by_stop.get(stop)
+        if dock is None or dock.queue or not dock.can_serve():
+            return []
+        return dock.free_slots()
+
+    def at_dock(self, robot, stop):
+        # Whether the robot is already queued at or served by the dock behind stop
+        dock = self.by_stop.get(stop)
+        return dock is not None and self.members.get(robot) is dock
+
+    def grant(self, robot, stop, slot):
+        # Hands one of free_slots(stop) to a robot a dispatcher matched with it; route() then sends the
+        # robot there. False once the dock cannot serve another robot (or the slot was taken meanwhile)
+        dock = self.by_stop[stop]
+        if dock.queue or not dock.can_serve() or slot not in dock.free_slots():
+            return False
+        self.leave(robot)
+        self.members[robot] = dock
+        dock.grant(robot, self.model.time_elapsed, slot)
+        return True
+
+    def leave(self, robot):
+        dock = self.members.pop(robot, None)
+        if dock is not None:
+            dock.leave(robot, self.model.time_elapsed)
+
+    def holds(self, robot):
+        dock = self.members.get(robot)
+        if dock is None:
+            return False
+        if dock.serve(robot):
+            return True
+        del self.members[robot]
+        return False
+
+    def make_way(self, robot, cell):
+        # A queued robot that blocks another robot's next step swaps cells with it and walks back to
+        # its waiting cell afterwards, unless the blocked robot is further back in the same queue.
+        # Robots at work (and the ones being served) always get through, so queues never gridlock an aisle.
+        model = self.model
+        if not model.navigation.in_bounds(cell) or model.occupancy.robots[cell] != 1:
+            return False
+        for queued, dock in self.members.items():
+            if queued.pos == cell and queued in dock.joined:
+                if self.members.get(robot) is dock and robot in dock.joined and not dock.ahead(robot, queued):
+                    return False
+                model.grid.move_agent(queued, robot.pos)
+                queued.path = []
+                queued.record_action(queued.pos, "move")
+                queued.movements += 1
+                model.total_movements += 1
+                dock.yields += 1
+                return True
+        return False
+
+    def truck_at(self, pos, kind):
+        dock = self.unload if kind == "unload" else self.load
+        return dock.truck if pos in dock.slots else None
+
+    def incoming(self):
+        return self.unload.incoming()
+
+    def next_event(self, start):
+        # First tick at which update() changes the docks on its own; fast-forward jumps end before it
+        ticks = [tick for tick in (self.unload.next_event(start), self.load.next_event(start)) if tick is not None]
+        if self.unload.queue or self.load.queue:
+            ticks.append(start + 1)
+        return min(ticks, default=None)
+
+    def metrics(self):
+        tick = self.model.time_elapsed
+        return {f"{name}_{key}": value
+                for name, dock in (("unload", self.unload), ("load", self.load))
+                for key, value in dock.metrics(tick).items()}
+
+    def get_state(self):
+        return {"unload": self.unload.get_state(), "load": self.load.get_state(),
+                "members": [[robot.unique_id, "unload" if dock is self.unload else "load"]
+                            for robot, dock in self.members.items()]}
+
+    def set_state(self, state):
+        robots = {agent.unique_id: agent for agent in self.model.schedule.agents}
+        self.unload.set_state(state["unload"], robots)
+        self.load.set_state(state["load"], robots)
+        self.members = {robots[robot]: self.unload if name == "unload" else self.load
+                        for robot, name in state["members"]}
+
+
+def dock_slots(layout, truck, stop, slots, reserved):
+    # The layout stop, then the truck's other free neighbour cells
+    x, y = truck
+    cells = [stop]
+    for pos in sorted(((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))):
+        if pos != stop and layout.in_bounds(pos) and pos not in layout.obstacles and pos not in reserved:
+            cells.append(pos)
+    return tuple(cells[:max(1, slots)])
+
+
+def waiting_cells(layout, slots, count, reserved):
+    # Free cells closest to the slots (breadth-first), skipping the cells right next to a slot
+    depth = {slot: 0 for slot in slots}
+    queue = deque(slots)
+    cells = []
+    while queue and len(cells) < count:
+        x, y = queue.popleft()
+        for pos in ((x - 1, y), (x, y - 1), (x, y + 1), (x + 1, y)):
+            if pos in depth or not layout.in_bounds(pos) or pos in layout.obstacles:
+                continue
+            depth[pos] = depth[(x, y)] + 1
+            queue.append(pos)
+            if depth[pos] >= 2 and pos not in reserved and len(cells) < count:
+                cells.append(pos)
+    return tuple(cells)
+
+
+def make_docks(name, model, options=None):
+    if name == "single":
+        return SingleStopDocks(model)
+    if name == "queued":
+        return QueuedDocks(model, **(options or {}))
+    raise ValueError(f"Unknown dock model {name!r}, expected one of {DOCK_MODELS}")
@@ -0,0 +1,94 @@
+import json
+import logging
+
+# Event categories used by the model and the agents
+STATUS = "status"          # per-step robot status
+MOVEMENT = "movement"      # moves, alternative steps
+TASK = "task"              # pickups, deliveries, task assignment
+PATHFINDING = "pathfinding"
+SIMULATION = "simulation"  # run start/end, exports
+
+CATEGORIES = (STATUS, MOVEMENT, TASK, PATHFINDING, SIMULATION)
+
+OFF = logging.CRITICAL + 10  # threshold that disables a category completely
+
+
+class EventLog:
+    # Level-gated event log. Messages use lazy %-style arguments, so a disabled
+    # category costs one dict lookup and no string formatting.
+
+    def __init__(self, level=logging.INFO, category_levels=None, sink=None, logger_name="warehouse"):
+        self.thresholds = {}
+        self.loggers = {category: logging.getLogger(f"{logger_name}.{category}") for category in CATEGORIES}
+        self.sink = sink
+        self.tick = 0
+        self.set_level(level)
+        for category, category_level in (category_levels or {}).items():
+            self.set_level(category_level, category)
+
+    def set_level(self, level, category=None):
+        threshold = OFF if level is None else level
+        if category is None:
+            for name in CATEGORIES:
+                self.thresholds[name] = threshold
+        else:
+            self.thresholds[category] = threshold
+
+    def disable(self):
+        self.set_level(None)
+
+    def is_enabled(self, category, level):
+        return level >= self.thresholds[category]
+
+    def log(self, category, level, msg, *args, **fields):
+        if level < self.thresholds[category]:
+            return
+        self.loggers[category].log(level, msg, *args)
+        if self.sink is not None:
+            self.sink.append(self.tick, category, level, msg, args, fields)
+
+    def debug(self, category, msg, *args, **fields):
+        self.log(category, logging.DEBUG, msg, *args, **fields)
+
+    def info(self, category, msg, *args, **fields):
+        self.log(category, logging.INFO, msg, *args, **fields)
+
+    def warning(self, category, msg, *args, **fields):
+        self.log(category, logging.WARNING, msg, *args, **fields)
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.flush()
+
+
+class EventBuffer:
+    # Buffered structured sink: keeps raw records in memory and writes them as
+    # NDJSON once the buffer fills up (or on flush). Messages are only formatted on write.
+
+    def __init__(self, path=None, buffer_size=10000):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.records = []
+        self.written = 0
+
+    def append(self, tick, category, level, msg, args, fields):
+        self.records.append((tick, category, level, msg, args, fields))
+        if self.path and len(self.records) >= self.buffer_size:
+            self.flush()
+
+    def to_dicts(self):
+        return [
+            {"tick": tick, "category": category, "level": logging.getLevelName(level),
+             "message": msg % args if args else msg, **fields}
+            for tick, category, level, msg, args, fields in self.records
+        ]
+
+    def flush(self):
+        if not self.path or not self.records:
+            return
+        with open(self.path, "a") as f:
+            for record in self.to_dicts():
+                f.write(json.dumps(record, default=str))
+                f.write("\n")
+        self.written += len(self.records)
+        self.records.clear()
@@ -0,0 +1,159 @@
+import heapq
+
+import numpy as np
+
+# Goal-rooted distance fields: one reverse BFS per fixed goal (dock stops, shelf stops, dock slots)
+# over the static obstacle mask, stored as an int32 array of steps to the goal (-1 = unreachable).
+# A registered goal's field is computed the first time it is asked for and then shared by every
+# model on the layout (it lives in Layout.navigation_cache with the path cache). Distances are
+# the same as the length of the A* path, so they can replace path-cache lookups anywhere;
+# following a field downhill gives a shortest path with one table read per step.
+
+UNREACHABLE = -1
+_STEPS = ((-1, 0), (0, -1), (0, 1), (1, 0))
+
+
+class DistanceFields:
+    def __init__(self, blocked):
+        self.blocked = blocked
+        self.goals = set()
+        self.fields = {}  # goal -> (width, height) int32 array
+        self.rows = {}    # goal -> the same field as nested lists, for fast scalar lookups
+
+    def __len__(self):
+        return len(self.fields)
+
+    def add_goals(self, goals):
+        self.goals.update(goals)
+
+    def lookup(self, goal):
+        # Nested lists rows[x][y] with the steps to goal, or None if goal is not a registered goal
+        rows = self.rows.get(goal)
+        if rows is None and goal in self.goals:
+            self.store(goal, bfs_field(~self.blocked, goal))
+            rows = self.rows[goal]
+        return rows
+
+    def field(self, goal):
+        return self.fields[goal] if self.lookup(goal) is not None else None
+
+    def store(self, goal, field):
+        self.fields[goal] = field
+        self.rows[goal] = field.tolist()
+
+    def path(self, start, goal, prefer=None):
+        # Downhill walk from start; among equally short next steps the first one `prefer` accepts wins
+        rows = self.lookup(goal)
+        if rows is None:
+            return None
+        steps = rows[start[0]][start[1]]
+        if steps < 0:
+            return None
+        width, height = self.blocked.shape
+        path = []
+        x, y = start
+        while steps:
+            options = [(x + dx, y + dy) for dx, dy in _STEPS
+                       if 0 <= x + dx < width and 0 <= y + dy < height and rows[x + dx][y + dy] == steps - 1]
+            x, y = next((pos for pos in options if prefer is None or prefer(pos)), options[0])
+            path.append((x, y))
+            steps -= 1
+        return path
+
+    def refreshed(self, blocked, changed):
+        # Copy for a new obstacle mask; only the cells whose distance depends on a changed cell are redone
+        fields = DistanceFields(blocked)
+        fields.goals = set(self.goals)
+        for goal, field in self.fields.items():
+            field = field.copy()
+            if blocked[goal]:
+                field[:] = UNREACHABLE
+            elif self.blocked[goal]:
+                field = bfs_field(~blocked, goal)
+            else:
+                _close_cells(field, blocked, [tuple(pos) for pos in changed if blocked[tuple(pos)]])
+                _open_cells(field, blocked, [tuple(pos) for pos in changed if not blocked[tuple(pos)]])
+            fields.store(goal, field)
+        return fields
+
+
+def bfs_field(free, goal):
+    # Wavefront BFS over the whole grid, one array operation per distance ring
+    field = np.full(free.shape, UNREACHABLE, dtype=np.int32)
+    if not free[goal]:
+        return field
+    field[goal] = 0
+    unvisited = free.copy()
+    unvisited[goal] = False
+    frontier = np.zeros_like(free)
+    frontier[goal] = True
+    steps = 0
+    while True:
+        grown = np.zeros_like(free)
+        grown[1:] |= frontier[:-1]
+        grown[:-1] |= frontier[1:]
+        grown[:, 1:] |= frontier[:, :-1]
+        grown[:, :-1] |= frontier[:, 1:]
+        frontier = grown & unvisited
+        if not frontier.any():
+            return field
+        steps += 1
+        field[frontier] = steps
+        unvisited &= ~frontier
+
+
+def _neighbors(field, pos):
+    width, height = field.shape
+    x, y = pos
+    for dx, dy in _STEPS:
+        if 0 <= x + dx < width and 0 <= y + dy < height:
+            yield (x + dx, y + dy)
+
+
+def _close_cells(field, blocked, closed):
+    # Newly blocked cells: drop every cell that has no shortest-path neighbour left (nearest first),
+    # then recompute the dropped cells from the ones that kept their distance
+    heap = [(int(field[pos]), pos) for pos in closed if field[pos] > 0]
+    for pos in closed:
+        field[pos] = UNREACHABLE
+    heapq.heapify(heap)
+    dropped = []
+    while heap:
+        steps, pos = heapq.heappop(heap)
+        for child in _neighbors(field, pos):
+            if field[child] != steps + 1:
+                continue
+            if any(field[parent] == steps for parent in _neighbors(field, child)):
+                continue
+            field[child] = UNREACHABLE
+            dropped.append(child)
+            heapq.heappush(heap, (steps + 1, child))
+    heap = []
+    for pos in dropped:
+        known = [int(field[near]) for near in _neighbors(field, pos) if field[near] >= 0]
+        if known:
+            heap.append((min(known) + 1, pos))
+    heapq.heapify(heap)
+    _relax(field, blocked, heap)
+
+
+def _open_cells(field, blocked, opened):
+    # Newly free cells can only shorten distances: relax outwards from them
+    heap = []
+    for pos in opened:
+        known = [int(field[near]) for near in _neighbors(field, pos) if field[near] >= 0]
+        if known:
+            heap.append((min(known) + 1, pos))
+    heapq.heapify(heap)
+    _relax(field, blocked, heap)
+
+
+def _relax(field, blocked, heap):
+    while heap:
+        steps, pos = heapq.heappop(heap)
+        if 0 <= field[pos] <= steps:
+            continue
+        field[pos] = steps
+        for near in _neighbors(field, pos):
+            if not blocked[near] and (field[near] < 0 or field[near] > steps + 1):
+                heapq.heappush(heap, (steps + 1, near))
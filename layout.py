@@ -0,0 +1,176 @@
+import functools
+import json
+import os
+from collections import deque
+
+# Warehouse layouts: grid size, shelves, shelf stop cells, dock positions and robot spawn points.
+# Layouts are loaded from JSON, generated procedurally, or taken from the built-in default, and
+# cached so that sweeps over the same layout only validate and preprocess it once.
+
+DEFAULT_LAYOUT = {
+    "width": 18,
+    "height": 12,
+    "shelves": [
+        (5, 9), (5, 10), (6, 9), (6, 10), (5, 3), (5, 4), (6, 3), (6, 4),
+        (12, 9), (12, 10), (13, 9), (13, 10), (12, 3), (12, 4), (13, 3), (13, 4),
+    ],
+    # stop cell -> shelf served from it
+    "shelf_stops": {
+        (5, 8): (5, 9), (5, 9): (5, 10), (6, 8): (6, 9), (6, 9): (6, 10),
+        (4, 3): (5, 3), (4, 4): (5, 4), (7, 3): (6, 3), (7, 4): (6, 4),
+        (7, 8): (12, 9), (7, 11): (12, 10), (8, 8): (13, 9), (8, 11): (13, 10),
+        (11, 3): (12, 3), (11, 4): (12, 4), (14, 3): (13, 3), (14, 4): (13, 4),
+    },
+    "unload_truck": (9, 0),
+    "unload_stop": (9, 1),
+    "load_truck": (0, 10),
+    "load_stop": (1, 10),
+    "robot_spawns": [(0, 2), (0, 3), (0, 4), (0, 5), (0, 6), (0, 7), (0, 8)],
+}
+
+
+class Layout:
+    def __init__(self, width, height, shelves, shelf_stops, unload_truck, unload_stop,
+                 load_truck, load_stop, robot_spawns, name=None):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.shelves = tuple(tuple(pos) for pos in shelves)
+        self.shelf_stops = {tuple(stop): tuple(shelf) for stop, shelf in dict(shelf_stops).items()}
+        self.unload_truck = tuple(unload_truck)
+        self.unload_stop = tuple(unload_stop)
+        self.load_truck = tuple(load_truck)
+        self.load_stop = tuple(load_stop)
+        self.robot_spawns = tuple(tuple(pos) for pos in robot_spawns)
+        self.obstacles = frozenset(self.shelves) | {self.unload_truck, self.load_truck}
+        # Shared by every StaticNavigation built on this layout (blocked mask, neighbors, path cache)
+        self.navigation_cache = {}
+        self.validate()
+
+    def in_bounds(self, pos):
+        return 0 <= pos[0] < self.width and 0 <= pos[1] < self.height
+
+    def validate(self):
+        if self.width <= 0 or self.height <= 0:
+            raise ValueError(f"Layout size must be positive, got {self.width}x{self.height}")
+        cells = list(self.shelves) + list(self.shelf_stops) + list(self.shelf_stops.values()) + list(self.robot_spawns)
+        cells += [self.unload_truck, self.unload_stop, self.load_truck, self.load_stop]
+        for pos in cells:
+            if not self.in_bounds(pos):
+                raise ValueError(f"Layout cell {pos} is outside the {self.width}x{self.height} grid")
+        if len(set(self.shelves)) != len(self.shelves):
+            raise ValueError("Layout has duplicated shelf positions")
+        for stop, shelf in self.shelf_stops.items():
+            if shelf not in self.shelves:
+                raise ValueError(f"Stop {stop} points to {shelf}, which is not a shelf")
+        for name in ("unload_truck", "load_truck"):
+            if getattr(self, name) in self.shelves:
+                raise ValueError(f"{name} {getattr(self, name)} overlaps a shelf")
+        for name in ("unload_stop", "load_stop"):
+            if getattr(self, name) in self.obstacles:
+                raise ValueError(f"{name} {getattr(self, name)} is not a free cell")
+        if len(set(self.robot_spawns)) != len(self.robot_spawns):
+            raise ValueError("Layout has duplicated robot spawn points")
+        for pos in self.robot_spawns:
+            if pos in self.obstacles or pos in (self.unload_stop, self.load_stop):
+                raise ValueError(f"Robot spawn {pos} is not a free cell")
+
+        reachable = self.reachable_from(self.unload_stop)
+        for pos in (self.load_stop,) + self.robot_spawns:
+            if pos not in reachable:
+                raise ValueError(f"Cell {pos} cannot reach the unload dock {self.unload_stop}")
+
+    def reachable_from(self, start):
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            x, y = queue.popleft()
+            for pos in ((x - 1, y), (x, y - 1), (x, y + 1), (x + 1, y)):
+                if pos not in seen and self.in_bounds(pos) and pos not in self.obstacles:
+                    seen.add(pos)
+                    queue.append(pos)
+        return seen
+
+    def to_dict(self):
+        return {
+            "width": self.width,
+            "height": self.height,
+            "shelves": [list(pos) for pos in self.shelves],
+            "shelf_stops": [[list(stop), list(shelf)] for stop, shelf in self.shelf_stops.items()],
+            "unload_truck": list(self.unload_truck),
+            "unload_stop": list(self.unload_stop),
+            "load_truck": list(self.load_truck),
+            "load_stop": list(self.load_stop),
+            "robot_spawns": [list(pos) for pos in self.robot_spawns],
+        }
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def from_dict(cls, data, name=None):
+        shelf_stops = data["shelf_stops"]
+        if not isinstance(shelf_stops, dict):
+            # JSON form: [[stop, shelf], ...]
+            shelf_stops = {tuple(stop): tuple(shelf) for stop, shelf in shelf_stops}
+        return cls(data["width"], data["height"], data["shelves"], shelf_stops,
+                   data["unload_truck"], data["unload_stop"], data["load_truck"], data["load_stop"],
+                   data["robot_spawns"], name=name)
+
+
+_FILE_CACHE = {}
+
+
+def load_layout(path):
+    # Cached per file; a changed modification time reloads it
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    cached = _FILE_CACHE.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path) as f:
+            layout = Layout.from_dict(json.load(f), name=os.path.basename(path))
+        _FILE_CACHE[path] = cached = (mtime, layout)
+    return cached[1]
+
+
+@functools.lru_cache(maxsize=None)
+def default_layout(width=18, height=12):
+    return Layout.from_dict({**DEFAULT_LAYOUT, "width": width, "height": height}, name="default")
+
+
+@functools.lru_cache(maxsize=None)
+def generate_layout(width, height, block_height=2, aisle=2, max_robots=256):
+    # Grid of 2 x block_height shelf blocks, each served from stop cells on its left and right side
+    # (like the default layout's blocks). Column 0 holds the load dock and row 0 the
+    # unload dock; robots spawn on the free cells closest to column 0.
+    shelves = []
+    shelf_stops = {}
+    for bx in range(3, width - 4, 4):
+        for by in range(3, height - block_height - 2, block_height + aisle):
+            for dy in range(block_height):
+                left, right = (bx, by + dy), (bx + 1, by + dy)
+                shelves += [left, right]
+                shelf_stops[(bx - 1, by + dy)] = left
+                shelf_stops[(bx + 2, by + dy)] = right
+
+    unload_truck, unload_stop = (width // 2, 0), (width // 2, 1)
+    load_truck, load_stop = (0, height - 2), (1, height - 2)
+    taken = set(shelves) | set(shelf_stops) | {unload_truck, unload_stop, load_truck, load_stop}
+    spawns = [(x, y) for x in range(width) for y in range(1, height) if (x, y) not in taken][:max_robots]
+
+    return Layout(width, height, shelves, shelf_stops, unload_truck, unload_stop,
+                  load_truck, load_stop, spawns, name=f"aisles_{width}x{height}")
+
+
+def resolve_layout(layout, width=None, height=None):
+    # None -> built-in default sized to width x height, "aisles:WxH" -> generated layout,
+    # other str -> JSON file, Layout -> as is
+    if layout is None:
+        return default_layout(width or DEFAULT_LAYOUT["width"], height or DEFAULT_LAYOUT["height"])
+    if isinstance(layout, Layout):
+        return layout
+    if layout.startswith("aisles:"):
+        width, height = (int(value) for value in layout[len("aisles:"):].split("x"))
+        return generate_layout(width, height)
+    return load_layout(layout)
@@ -0,0 +1,255 @@
+# Live view over websockets, decoupled from the simulation loop.
+#
+#   python live.py --layout aisles:60x40 --num-robots 40 --initial-packages 600 --port 8765
+#   open http://localhost:8765/?fps=10
+#
+# The model steps at full speed (or at --tps ticks per second) in a background thread and
+# publishes an immutable Frame (robot cells, shelf loads, KPI counters) at most `publish_rate`
+# times per wall-clock second. Each websocket client runs its own coroutine that wakes up at the
+# client's frame rate and sends only what changed since the last frame it got; a slow client
+# waits for its own socket and simply skips frames, so it never holds back the model or the
+# other clients. Nothing is rendered on the server: the page draws the frames on a canvas.
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+import tornado.web
+import tornado.websocket
+
+from model import KPI_LABELS, WarehouseModel
+
+
+class Frame:
+    __slots__ = ("tick", "robot_ids", "robots", "shelves", "counters", "running")
+
+    def __init__(self, tick, robot_ids, robots, shelves, counters, running):
+        self.tick = tick
+        self.robot_ids = robot_ids
+        self.robots = robots  # x, y, carrying (0/1) per robot slot
+        self.shelves = shelves
+        self.counters = counters
+        self.running = running
+
+    @classmethod
+    def from_model(cls, model):
+        world = model.world
+        robots = np.empty((world.num_robots, 3), dtype=np.int32)
+        robots[:, :2] = world.robot_xy[:world.num_robots]
+        robots[:, 2] = world.robot_carrying[:world.num_robots] >= 0
+        return cls(model.time_elapsed, world.robot_id[:world.num_robots].tolist(), robots,
+                   world.shelf_load[:world.num_shelves].copy(),
+                   dict(zip(KPI_LABELS, (int(value) for value in model.kpi_row()))), model.running)
+
+
+def delta(previous, frame):
+    # JSON-ready message with the robots, shelves and counters that differ from `previous`
+    message = {"type": "delta", "tick": frame.tick, "running": frame.running}
+    if previous is None or previous.robot_ids != frame.robot_ids:
+        message["robot_ids"] = frame.robot_ids
+        changed = np.arange(len(frame.robots))
+    else:
+        changed = np.flatnonzero((previous.robots != frame.robots).any(axis=1))
+    message["robots"] = np.column_stack([changed, frame.robots[changed]]).tolist()
+    if previous is None:
+        changed = np.arange(len(frame.shelves))
+    else:
+        changed = np.flatnonzero(previous.shelves != frame.shelves)
+    message["shelves"] = np.column_stack([changed, frame.shelves[changed]]).tolist()
+    message["counters"] = {label: value for label, value in frame.counters.items()
+                           if previous is None or previous.counters[label] != value}
+    return message
+
+
+def layout_message(layout, labels=KPI_LABELS):
+    return {"type": "layout", "width": layout.width, "height": layout.height,
+            "shelves": [list(pos) for pos in layout.shelves],
+            "trucks": [list(layout.unload_truck), list(layout.load_truck)],
+            "stops": [list(layout.unload_stop), list(layout.load_stop)],
+            "labels": list(labels)}
+
+
+class LiveSimulation:
+    # Runs the model in a daemon thread; `frame` is replaced (never mutated) as the run goes on
+
+    def __init__(self, model, ticks_per_second=None, publish_rate=60):
+        self.model = model
+        self.ticks_per_second = ticks_per_second
+        self.publish_interval = 1 / publish_rate
+        self.frame = Frame.from_model(model)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="simulation", daemon=True)
+
+    def layout_message(self):
+        return layout_message(self.model.layout)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        model = self.model
+        clock = time.perf_counter
+        started = published = clock()
+        while model.running and not self.stopped.is_set():
+            model.step()
+            now = clock()
+            if now - published >= self.publish_interval:
+                self.frame = Frame.from_model(model)
+                published = now
+            if self.ticks_per_second:
+                # Pace against the start so a slow tick is caught up by the next ones
+                delay = started + model.time_elapsed / self.ticks_per_second - now
+                if delay > 0:
+                    self.stopped.wait(delay)
+        self.frame = Frame.from_model(model)
+
+
+class FrameSocket(tornado.websocket.WebSocketHandler):
+    def initialize(self, simulation, default_fps):
+        self.simulation = simulation
+        self.fps = default_fps
+        self.task = None
+
+    def open(self):
+        fps = self.get_argument("fps", None)
+        if fps:
+            self.fps = max(0.1, float(fps))
+        self.task = asyncio.ensure_future(self.stream())
+
+    def on_message(self, message):
+        # {"fps": 5} changes this client's frame rate
+        fps = json.loads(message).get("fps")
+        if fps:
+            self.fps = max(0.1, float(fps))
+
+    def on_close(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    async def stream(self):
+        simulation = self.simulation
+        sent = None
+        try:
+            await self.write_message(json.dumps(simulation.layout_message()))
+            while True:
+                frame = simulation.frame
+                if frame is not sent:
+                    # Waits for this socket only; frames published meanwhile are skipped
+                    await self.write_message(json.dumps(delta(sent, frame)))
+                    sent = frame
+                    if not frame.running:
+                        break
+                await asyncio.sleep(1 / self.fps)
+        except tornado.websocket.WebSocketClosedError:
+            pass
+
+
+class PageHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.write(PAGE)
+
+
+def make_app(simulation, default_fps=10):
+    return tornado.web.Application([
+        (r"/", PageHandler),
+        (r"/ws", FrameSocket, {"simulation": simulation, "default_fps": default_fps}),
+    ])
+
+
+async def serve(simulation, port=8765, default_fps=10):
+    app = make_app(simulation, default_fps)
+    server = app.listen(port)
+    simulation.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        server.stop()
+        simulation.stop()
+
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Warehouse live view</title>
+<style>body{font-family:sans-serif;margin:12px}canvas{border:1px solid #999}#kpis{margin-top:8px}</style>
+</head><body>
+<canvas id="grid"></canvas><div id="kpis"></div>
+<script>
+const canvas = document.getElementById("grid"), ctx = canvas.getContext("2d");
+const colors = ["Red", "Blue", "Olive", "Black", "Green", "Purple", "Orange", "Pink", "Gold", "Brown", "Cyan", "Magenta"];
+let layout = null, cell = 20, robots = [], ids = [], shelves = [], counters = {}, tick = 0, running = true;
+const socket = new WebSocket(`ws://${location.host}/ws${location.search}`);
+socket.onmessage = (event) => {
+  const msg = JSON.parse(event.data);
+  if (msg.type === "layout") {
+    layout = msg;
+    cell = Math.max(4, Math.min(32, Math.floor(900 / Math.max(layout.width, layout.height))));
+    canvas.width = layout.width * cell; canvas.height = layout.height * cell;
+    return;
+  }
+  tick = msg.tick; running = msg.running;
+  if (msg.robot_ids) { ids = msg.robot_ids; robots.length = ids.length; }
+  for (const [i, x, y, carrying] of msg.robots) robots[i] = [x, y, carrying];
+  for (const [i, load] of msg.shelves) shelves[i] = load;
+  Object.assign(counters, msg.counters);
+  requestAnimationFrame(draw);
+};
+function cellRect(x, y, color, inset) {
+  ctx.fillStyle = color;
+  ctx.fillRect(x * cell + inset, (layout.height - 1 - y) * cell + inset, cell - 2 * inset, cell - 2 * inset);
+}
+function draw() {
+  ctx.clearRect(0, 0, canvas.width, canvas.height);
+  layout.stops.forEach(([x, y]) => cellRect(x, y, "#e8f0ff", 1));
+  layout.trucks.forEach(([x, y]) => cellRect(x, y, "#888", 1));
+  layout.shelves.forEach(([x, y], i) => cellRect(x, y, `rgba(140,100,60,${0.2 + 0.08 * (shelves[i] || 0)})`, 1));
+  robots.forEach(([x, y, carrying], i) => {
+    ctx.fillStyle = colors[(ids[i] - 1) % colors.length];
+    ctx.beginPath();
+    ctx.arc((x + 0.5) * cell, (layout.height - y - 0.5) * cell, cell * 0.4, 0, 2 * Math.PI);
+    ctx.fill();
+    if (carrying) { ctx.strokeStyle = "#c60"; ctx.lineWidth = 3; ctx.stroke(); }
+  });
+  document.getElementById("kpis").textContent = `tick ${tick}${running ? "" : " (finished)"} | ` +
+    layout.labels.map((label) => `${label}: ${counters[label]}`).join(" | ");
+}
+</script></body></html>
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a live view of one warehouse run")
+    parser.add_argument("--width", type=int, default=18)
+    parser.add_argument("--height", type=int, default=12)
+    parser.add_argument("--num-robots", type=int, default=5)
+    parser.add_argument("--initial-packages", type=int, default=100)
+    parser.add_argument("--max-time", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--layout", default=None)
+    parser.add_argument("--planner", default="greedy")
+    parser.add_argument("--dispatcher", default="greedy")
+    parser.add_argument("--step-mode", default="tick")
+    parser.add_argument("--docks", default="single")
+    parser.add_argument("--movement", default="sequential")
+    parser.add_argument("--deadlock-policy", default="off")
+    parser.add_argument("--tps", type=float, default=None, help="ticks per second (full speed if omitted)")
+    parser.add_argument("--fps", type=float, default=10, help="frame rate of clients that do not ask for one")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    model = WarehouseModel(args.width, args.height, args.num_robots, args.initial_packages, args.max_time, args.k,
+                           seed=args.seed, layout=args.layout, planner=args.planner, dispatcher=args.dispatcher,
+                           step_mode=args.step_mode, docks=args.docks,
+                           movement=args.movement, deadlock_policy=args.deadlock_policy, paths_file=None, log_level=None)
+    print(f"Live view on http://localhost:{args.port}/?fps={args.fps:g}")
+    asyncio.run(serve(LiveSimulation(model, ticks_per_second=args.tps), args.port, args.fps))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,33 @@
 from mesa.model import Model
 
 from agent import Package, Shelf, Truck, Robot, VisualTruck
+from navigation import StaticNavigation
+from events import EventLog, SIMULATION, TASK
+from shelf_index import ShelfIndex
+from trajectory import TrajectoryRecorder
+from state import WorldState
+from planning import make_planner
+from layout import resolve_layout
+from occupancy import OccupancyRaster
+from dispatch import make_dispatcher
+from timeseries import TimeSeriesCollector
+from stepping import STEP_MODES, FastForward
+from profiling import Profiler
+from docks import make_docks
+from movement import make_movement
+from workload import make_workload
+from deadlock import make_deadlock_detector
 
 from mesa.time import RandomActivation
 from mesa.space import MultiGrid
-from mesa.datacollection import DataCollector
 
 import random
-import json
+import logging
+
+import numpy as np
+
+KPI_LABELS = ["Packages in Unload Truck", "Packages in Load Truck", "Packages in Shelves",
+              "Total Movements", "Total Packages Delivered"]
 
 class WarehouseModel(Model):
     UNLOAD_TRUCK_POSITION = (9, 0)
@@ -17,52 +37,71 @@ class WarehouseModel(Model):
     LOAD_TRUCK_POSITION = (0, 10)
     load_for_agent = (1,10)
 
-    def __init__(self, width, height, num_robots, initial_packages, max_time, k):
+    def __init__(self, width, height, num_robots, initial_packages, max_time, k,
+                 phase_size=10, seed=None, paths_file='robot_paths.json',
+                 log_level=logging.INFO, log_levels=None, event_sink=None, debug=False,
+                 trajectory_file=None, trajectory_format='bin', planner='greedy', layout=None,
+                 dispatcher='greedy', collect_interval=1, collect_capacity=None, collect_path=None,
+                 step_mode='tick', profile=False, stop_when_empty=True, docks='single', dock_options=None,
+                 movement='sequential', workload='batch', workload_options=None, deadlock_policy='off'):
+        # Constructor arguments, kept so snapshots can rebuild the model (see snapshot.py)
+        self.params = {name: value for name, value in locals().items() if name not in ('self', '__class__')}
         super().__init__()
+        # log_level=None switches every event category off (headless runs)
+        self.events = EventLog(log_level, category_levels=log_levels, sink=event_sink)
+        if seed is None:
+            seed = random.random()  # drawn here so the workload streams and snapshots know it
+        self.reset_randomizer(seed)
+        self.params["seed"] = seed
+        self.paths_file = paths_file  # None disables the JSON export at the end of the run
+        # trajectory_file streams the compact trajectory to disk during the run
+        self.trajectory = TrajectoryRecorder(trajectory_file, trajectory_format)
         self.current_id = 0
+        self.world = WorldState()
+        # layout: None (built-in layout on a width x height grid), a JSON file path or a Layout
+        self.layout = resolve_layout(layout, width, height)
+        if num_robots > len(self.layout.robot_spawns):
+            raise ValueError(f"Layout {self.layout.name} has {len(self.layout.robot_spawns)} robot spawn points, "
+                             f"{num_robots} robots requested")
+        width, height = self.layout.width, self.layout.height
+        self.UNLOAD_TRUCK_POSITION = self.layout.unload_truck
+        self.unload_for_agent = self.layout.unload_stop
+        self.LOAD_TRUCK_POSITION = self.layout.load_truck
+        self.load_for_agent = self.layout.load_stop
         self.grid = MultiGrid(width, height, False)
+        # Robot occupancy raster, updated on every move through Robot.pos
+        self.occupancy = OccupancyRaster(width, height)
+        # Only robots are scheduled: shelves and trucks have nothing to do on a step
         self.schedule = RandomActivation(self)
         self.max_time = max_time
         self.time_elapsed = 0
         self.total_movements = 0
         self.total_packages_stored = 0
         self.total_packages_delivered = 0
+        self.robots_carrying = 0
+        # KPI counters are updated by the agents as events happen; debug=True re-checks them every step
+        self.debug = debug
+        self.replans_performed = 0
+        self.replans_avoided = 0
+        self.wait_ticks = 0
+        self.conflicts = 0
+        self.alternative_moves = 0
+        self.assignments = 0
+        self.assignment_cost = 0  # path length to every newly assigned destination
 
 
 
 
 
         # Add shelves
-        shelf_positions = [
-            (5, 9), (5, 10),  (6, 9), (6, 10), (5, 3), (5, 4),  (6, 3), (6, 4),(12,9), (12,10), (13,9),(13,10), (12, 3),(12, 4), (13, 3),(13, 4),
-        ]
-        self.shelf_to_stop = {
-            (5, 8): (5, 9), 
-            (5, 9): (5,10),  
-            (6, 8): (6, 9), 
-            (6, 9): (6, 10),
-
-            (4, 3): (5, 3), 
-            (4, 4): (5, 4),  
-            (7, 3): (6, 3), 
-            (7, 4): (6, 4),
-
-            (7,8): (12,9),
-            (7,11):(12,10),
-            (8,8): (13,9),
-            (8,11):(13,10),
-
-            (11, 3): (12, 3),
-            (11, 4): (12, 4),
-            (14, 3): (13, 3),
-            (14, 4): (13, 4),
-
-        }
+        shelf_positions = self.layout.shelves
+        self.shelf_to_stop = dict(self.layout.shelf_stops)
+        self.shelf_index = ShelfIndex(width, height, self.shelf_to_stop)
         shelves = []
         for pos in shelf_positions:
             shelf = Shelf(self.next_id(), self)
             self.grid.place_agent(shelf, pos)
-            self.schedule.add(shelf)
+            self.shelf_index.add(shelf)
             shelves.append(shelf)
 
 
@@ -70,138 +109,317 @@ class WarehouseModel(Model):
         # Add trucks at fixed positions
         self.unload_truckVISUAL = VisualTruck(self.next_id(), self, "unload")
         self.grid.place_agent(self.unload_truckVISUAL, self.UNLOAD_TRUCK_POSITION)
-        self.schedule.add(self.unload_truckVISUAL)
 
         self.load_truckVISUAL = VisualTruck(self.next_id(), self, "load")
         self.grid.place_agent(self.load_truckVISUAL, self.LOAD_TRUCK_POSITION)
-        self.schedule.add(self.load_truckVISUAL)
 
         self.unload_truck = Truck(self.next_id(), self, "unload")
         self.grid.place_agent(self.unload_truck, self.unload_for_agent)
-        self.schedule.add(self.unload_truck)
 
         self.load_truck = Truck(self.next_id(), self, "load")
         self.grid.place_agent(self.load_truck, self.load_for_agent)
-        self.schedule.add(self.load_truck)
+
+        # Static obstacles are fixed from here on: build the navigation layer once
+        self.navigation = StaticNavigation(self.grid, shared=self.layout.navigation_cache)
+        self.navigation.add_goals([self.unload_for_agent, self.load_for_agent, *self.shelf_to_stop])
+        # 'greedy' (static shortest paths, reactive waiting) or 'cooperative' (space-time reservations)
+        self.planner = make_planner(planner, self)
+        # 'greedy' (robot by robot, nearest shelf) or 'hungarian' (batched optimal shelf assignment)
+        self.dispatcher = make_dispatcher(dispatcher, self)
+        # 'tick' (one tick per step()) or 'event' (step() first jumps over ticks where robots only follow their plans)
+        if step_mode not in STEP_MODES:
+            raise ValueError(f"Unknown step mode {step_mode!r}, expected one of {STEP_MODES}")
+        self.fast_forward = FastForward(self) if step_mode == 'event' else None
+        # 'sequential' (robots move during their own step) or 'sync' (all moves resolved at once; see movement.py)
+        self.movement = make_movement(movement, self)
+        # 'off', 'detect' (count wait-for cycles) or 'yield' (also break them by priority; see deadlock.py)
+        self.deadlocks = make_deadlock_detector(deadlock_policy, self)
+        # profile=True times every phase of step(); the summary is logged when the run ends
+        self.profiler = Profiler() if profile else None
+        # False keeps running with an empty unload truck, for runs that receive packages later (zones.py)
+        self.stop_when_empty = stop_when_empty
+        # 'single' (one stop cell per truck) or 'queued' (service slots, waiting queues, truck arrivals; see docks.py)
+        self.docks = make_docks(docks, self, dock_options)
+        # 'batch' (everything up front, phase toggle) or a stream of inbound packages and orders (see workload.py)
+        self.workload = make_workload(workload, self, workload_options)
 
         # Initialize counters and state flags
         self.packages_delivered_in_phase = 0
         self.delivering_to_load_truck = False
-        self.phase_size = 10  # Number of packages after which to switch tasks
+        self.phase_size = phase_size  # Number of packages after which to switch tasks
         
         # # Add remaining packages to unload truck
-        for _ in range(initial_packages - min(k * len(shelves), initial_packages)):
-            package = Package(self.next_id(), self)
-            self.unload_truck.packages.append(package)
+        self.docks.receive([self.next_id() for _ in range(initial_packages - min(k * len(shelves), initial_packages))])
+
+        # Robots off the schedule: parked where they stand, or gone from the run (see park, remove_robot)
+        self.parked = set()
+        self.removed_robots = []
 
         # Predefined positions for LGVs
-        robots_positions = [(0, 2), (0, 3), (0, 4), (0, 5), (0, 6),(0,7),(0,8)]
-        for i in range(min(num_robots, len(robots_positions))):
+        robots_positions = self.layout.robot_spawns
+        for i in range(num_robots):
             pos = robots_positions[i]
             role = 'storage' if i < num_robots // 2 else 'loading'
-            lgv = Robot(self.next_id(), self, role=role)
-            self.schedule.add(lgv)
-            self.grid.place_agent(lgv, pos)
-
-        self.datacollector = DataCollector(
-            model_reporters={
-                "Packages in Unload Truck": lambda m: len(m.unload_truck.packages),
-                "Packages in Load Truck": lambda m: len(m.load_truck.packages),
-                "Packages in Shelves": lambda m: m.total_packages_stored,
-                "Total Movements": lambda m: m.total_movements,
-                "Total Packages Delivered": lambda m: m.total_packages_delivered
-            },
-        )
+            self.add_robot(pos, role)
+
+        # Same labels as the ChartModules in server.py; one row function instead of a lambda per series
+        self.datacollector = TimeSeriesCollector(KPI_LABELS, WarehouseModel.kpi_row, interval=collect_interval,
+                                                 capacity=collect_capacity, path=collect_path)
 
     def next_id(self):
         self.current_id += 1
         return self.current_id
 
 
+    def add_robot(self, pos, role='storage'):
+        lgv = Robot(self.next_id(), self, role=role)
+        self.schedule.add(lgv)
+        self.grid.place_agent(lgv, pos)
+        return lgv
+
+
+    def park(self, robot):
+        # Takes a robot off the schedule where it stands: it keeps its cell but no longer steps or gets
+        # tasks (zones.py parks robots waiting to cross a border)
+        self.docks.leave(robot)
+        self.workload.leave(robot)
+        self.planner.release(robot)
+        self.schedule.remove(robot)
+        self.parked.add(robot)
+
+
+    def remove_robot(self, robot):
+        # Takes a robot (and any package it carries) out of the run; the last robot's world slot fills
+        # the gap. Its movements and deliveries stay in the totals (see check_counters)
+        if robot in self.parked:
+            self.parked.remove(robot)
+        else:
+            self.docks.leave(robot)
+            self.workload.leave(robot)
+            self.planner.release(robot)
+            self.schedule.remove(robot)
+        if robot.carrying_package is not None:
+            self.robots_carrying -= 1
+        if self.fast_forward is not None:
+            self.fast_forward.windows.pop(robot, None)
+        if self.deadlocks is not None:
+            self.deadlocks.side_steps.pop(robot, None)
+        self.grid.remove_agent(robot)
+        moved = self.world.remove_robot(robot.slot)
+        if moved != robot.slot:
+            for agent in [*self.schedule.agents, *self.parked]:
+                if isinstance(agent, Robot) and agent.slot == moved:
+                    agent.slot = robot.slot
+        robot.remove()
+        self.removed_robots.append(robot)
+
+
     def step(self):
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.ticks += 1
+            started = profiler.clock()
+
+        if self.fast_forward is not None:
+            self.fast_forward.advance()
+            if profiler is not None:
+                started = profiler.lap("fast_forward", started)
+
         self.time_elapsed += 1
+        self.events.tick = self.time_elapsed
 
         # Stop the simulation if time limit is reached or other conditions
-        if self.time_elapsed >= self.max_time or not self.unload_truck.packages and all(not agent.carrying_package for agent in self.schedule.agents if isinstance(agent, Robot)):
+        if (self.time_elapsed >= self.max_time
+                or self.stop_when_empty and not self.unload_truck.packages and not self.docks.incoming()
+                and not self.workload.pending() and self.robots_carrying == 0):
             self.running = False
-            self.export_paths_to_json()  # Export the paths after the simulation ends
-
-            print(f"Simulation ended. Total movements: {self.total_movements}, "
-                f"Packages stored: {self.total_packages_stored}, "
-                f"Packages delivered: {self.total_packages_delivered}")
+            self.trajectory.flush()
+            if self.paths_file:
+                self.export_paths_to_json()  # Export the paths after the simulation ends
+
+            self.events.info(SIMULATION, "Simulation ended. Total movements: %s, Packages stored: %s, Packages delivered: %s",
+                             self.total_movements, self.total_packages_stored, self.total_packages_delivered)
+            dock_metrics = self.docks.metrics()
+            if dock_metrics:
+                self.events.info(SIMULATION, "Docks: %s", dock_metrics)
+            workload_metrics = self.workload.metrics()
+            if workload_metrics:
+                self.events.info(SIMULATION, "Workload: %s", workload_metrics)
+            self.workload.close()
+            if self.deadlocks is not None:
+                self.events.info(SIMULATION, "Deadlocks: %s", self.deadlocks.metrics())
+            self.datacollector.flush()
+            if profiler is not None:
+                profiler.lap("finish", started)
+                self.events.info(SIMULATION, "Profile:\n%s", profiler.format_report(self))
+            self.events.close()
             return
 
+        # Packages and orders arriving this tick
+        self.workload.update()
+        if profiler is not None:
+            started = profiler.lap("workload", started)
+
+        # Truck arrivals and departures, free slots handed to the dock queues
+        self.docks.update()
+        if profiler is not None:
+            started = profiler.lap("docks", started)
+
         # Central system logic
-        for agent in self.schedule.agents:
-            if isinstance(agent, Robot):
-                if not agent.carrying_package:
-                    self.assign_pickup_task(agent)
-                else:
-                    self.assign_delivery_task(agent)
+        robots = [agent for agent in self.schedule.agents if isinstance(agent, Robot)]
+        if self.fast_forward is not None:
+            steady = self.fast_forward.steady(robots)
+            self.dispatcher.assign(robots, steady)
+            self.fast_forward.follow(robots, steady)
+        else:
+            self.dispatcher.assign(robots)
+        if profiler is not None:
+            started = profiler.lap("assign", started)
+
+        self.occupancy.update_clearance(self.world.robot_positions())
+        if profiler is not None:
+            started = profiler.lap("clearance", started)
 
         self.schedule.step()
+        if profiler is not None:
+            started = profiler.lap("agents", started)
+
+        if self.movement is not None:
+            self.movement.resolve()
+            if profiler is not None:
+                started = profiler.lap("movement", started)
 
-        self.total_movements = sum(agent.movements for agent in self.schedule.agents if isinstance(agent, Robot))
-        self.total_packages_delivered = sum(agent.packages_delivered for agent in self.schedule.agents if isinstance(agent, Robot))
-        self.total_packages_stored = sum(len(shelf.packages) for shelf in self.schedule.agents if isinstance(shelf, Shelf))
+        if self.deadlocks is not None:
+            self.deadlocks.resolve()
+            if profiler is not None:
+                started = profiler.lap("deadlocks", started)
+
+        if self.debug:
+            self.check_counters()
+            if profiler is not None:
+                started = profiler.lap("checks", started)
 
         self.datacollector.collect(self)
+        if profiler is not None:
+            profiler.lap("collect", started)
+
+
+    def check_counters(self):
+        # Full recount (agents and world arrays), only used in debug mode
+        robots = [agent for agent in self.schedule.agents if isinstance(agent, Robot)]
+        robots += [*self.parked, *self.removed_robots]
+        expected = {
+            "total_movements": sum(robot.movements for robot in robots),
+            "total_packages_delivered": sum(robot.packages_delivered for robot in robots),
+            "total_packages_stored": self.world.packages_stored(),
+            "robots_carrying": self.world.robots_carrying(),
+        }
+        for name, value in expected.items():
+            if getattr(self, name) != value:
+                raise AssertionError(f"Counter {name} is {getattr(self, name)}, recount gives {value} (step {self.time_elapsed})")
+        raster = np.zeros_like(self.occupancy.robots)
+        np.add.at(raster, tuple(self.world.robot_positions().T), 1)
+        if not np.array_equal(raster, self.occupancy.robots):
+            raise AssertionError(f"Occupancy raster out of sync with robot positions (step {self.time_elapsed})")
 
 
     def assign_pickup_task(self, robot):
-        if self.unload_truck.packages:
-            robot.destination = self.unload_for_agent
-            robot.path = robot.a_star_search(robot.destination)
+        # Open outbound orders are picked from the shelves first (streaming workloads only)
+        stop = self.workload.pick_stop(robot)
+        if stop is not None:
+            self.plan_route(robot, stop)
+        elif self.unload_truck.packages:
+            self.plan_route(robot, self.unload_for_agent)
         else:
             self.assign_idle_task(robot)
 
 
     def assign_delivery_task(self, robot):
+        destination = robot.destination
         if self.should_deliver_to_load_truck():
             # Deliver to load truck
-            robot.destination = self.load_for_agent
-            print(f"Robot {robot.unique_id} assigned to deliver to load truck")
+            destination = self.load_for_agent
+            self.events.debug(TASK, "Robot %s assigned to deliver to load truck", robot.unique_id)
         else:
             # Deliver to shelves
-            shelves = [agent for agent in self.schedule.agents if isinstance(agent, Shelf) and agent.current_load < agent.capacity]
-            if shelves:
-                nearest_shelf = min(shelves, key=lambda shelf: self.manhattan_distance(robot.pos, shelf.pos))
-                stop_position = None
-                for stop_pos, shelf_pos in self.shelf_to_stop.items():
-                    if shelf_pos == nearest_shelf.pos:
-                        stop_position = stop_pos
-                        break
+            nearest_shelf = self.shelf_index.nearest_with_capacity(robot.pos)
+            if nearest_shelf is not None:
+                stop_position = self.shelf_index.stop_position(nearest_shelf)
                 if stop_position:
-                    robot.destination = stop_position
-                    print(f"Robot {robot.unique_id} assigned to stop position {stop_position} for shelf at {nearest_shelf.pos}")
+                    destination = stop_position
+                    self.events.debug(TASK, "Robot %s assigned to stop position %s for shelf at %s", robot.unique_id, stop_position, nearest_shelf.pos)
                 else:
-                    print(f"Error: No stop position found for shelf at {nearest_shelf.pos}")
+                    self.events.warning(TASK, "Error: No stop position found for shelf at %s", nearest_shelf.pos)
             else:
-                robot.destination = self.load_for_agent
-        robot.path = robot.a_star_search(robot.destination)
+                destination = self.load_for_agent
+        self.plan_route(robot, destination)
+
+
+    def plan_route(self, robot, destination):
+        # Keep the current plan unless the destination changed, the plan no longer starts next to
+        # the robot (it was blocked and stepped aside) or the static layout was rebuilt.
+        # Dock stops are mapped to the robot's slot or waiting cell first.
+        destination = self.docks.route(robot, destination)
+        if (destination == robot.destination
+                and robot.plan_version == self.navigation.version
+                and self.is_plan_valid(robot)
+                and self.planner.is_current(robot)):
+            self.replans_avoided += 1
+            return
+        if destination != robot.destination:
+            self.assignments += 1
+            self.assignment_cost += self.navigation.distance(robot.pos, destination) or 0
+        robot.destination = destination
+        robot.path = self.planner.plan(robot, destination, self.time_elapsed)
+        robot.plan_version = self.navigation.version
+        self.replans_performed += 1
+
+
+    def is_plan_valid(self, robot):
+        if robot.pos == robot.destination:
+            return True
+        if not robot.path or robot.path[-1] != robot.destination:
+            return False
+        next_pos = robot.path[0]
+        # A distance of 0 is a planned wait from the cooperative planner
+        if self.manhattan_distance(robot.pos, next_pos) > 1:
+            return False
+        return not self.navigation.is_blocked(next_pos)
+
+
+    def kpi_row(self):
+        return (len(self.unload_truck.packages), len(self.load_truck.packages), self.total_packages_stored,
+                self.total_movements, self.total_packages_delivered)
+
+
+    def throughput(self):
+        # Packages delivered (to shelves or the load truck) per tick
+        return self.total_packages_delivered / self.time_elapsed if self.time_elapsed else 0.0
 
 
-    
     def manhattan_distance(self, pos1, pos2):
         return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
 
 
 
     def assign_idle_task(self, robot):
+        self.docks.leave(robot)
         possible_positions = self.grid.get_neighborhood(robot.pos, moore=True, include_center=False)
         if not possible_positions:
-            print(f"Robot {robot.unique_id} has no valid positions to move to. Staying in place.")
+            self.events.info(TASK, "Robot %s has no valid positions to move to. Staying in place.", robot.unique_id)
             return
         robot.destination = self.random.choice(possible_positions)
-        robot.path = robot.a_star_search(robot.destination)
+        robot.path = self.planner.plan(robot, robot.destination, self.time_elapsed)
 
         if not robot.path:
-            print(f"Robot {robot.unique_id} could not find a valid path. Staying in place.")
+            self.events.info(TASK, "Robot %s could not find a valid path. Staying in place.", robot.unique_id)
             # Handle what the robot should do if no valid path is found, e.g., stay in place or find a new task
             robot.destination = None
 
 
     def should_deliver_to_load_truck(self):
+        if self.workload.orders is not None:
+            return self.delivering_to_load_truck  # set from the open orders by the workload
         if self.packages_delivered_in_phase >= self.phase_size:
             # Switch tasks after delivering phase_size packages
             self.delivering_to_load_truck = not self.delivering_to_load_truck
@@ -211,17 +429,9 @@ class WarehouseModel(Model):
     
 
     def export_paths_to_json(self):
-        robots_data = []
-        for agent in self.schedule.agents:
-            if isinstance(agent, Robot):
-                robot_data = {
-                    "id": agent.unique_id,
-                    "path": agent.path_taken  # Include the path taken with actions
-                }
-                robots_data.append(robot_data)
-
-        # Save to a JSON file
-        with open('robot_paths.json', 'w') as f:
-            json.dump(robots_data, f, indent=4)
-
-        print("Paths have been saved to robot_paths.json") 
\ No newline at end of file
+        robot_ids = [agent.unique_id for agent in self.schedule.agents if isinstance(agent, Robot)]
+
+        # Save to a JSON file (same schema as before, built from the trajectory recorder)
+        self.trajectory.export_json(self.paths_file, robot_ids)
+
+        self.events.info(SIMULATION, "Paths have been saved to %s", self.paths_file) 
\ No newline at end of file
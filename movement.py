@@ -0,0 +1,100 @@
+import numpy as np
+
+# How robots move within a tick.
+#
+#   WarehouseModel(..., movement="sequential")  # default: each robot moves during its own step
+#   WarehouseModel(..., movement="sync")        # every robot's next cell is resolved at once
+#
+# 'sequential' is the original behaviour: a robot moves as soon as it is activated, so whether it
+# can enter a cell depends on who was activated before it. 'sync' keeps the agent steps (pickups,
+# deliveries, replans) but Robot.move_along_path only proposes its next cell; after the schedule
+# step MovementKernel resolves all proposals against the occupancy raster with array operations:
+#   - static obstacles and the grid edge block a move,
+#   - several robots heading for the same cell: the first one in activation order gets it,
+#   - two robots trading cells (a swap) both stay,
+#   - a robot may follow one that leaves its cell this tick (chains and rotations move together),
+#     but not into a cell whose robot stays.
+# The winners then move in activation order and the others are blocked, with the same accounting
+# as a sequential step (trajectory "move" records, movements, conflicts, stuck time, side steps and
+# dock queue yields). Activation order still comes from the seeded schedule shuffle, so runs are
+# reproducible.
+
+MOVEMENT_MODES = ("sequential", "sync")
+
+
+class MovementKernel:
+    def __init__(self, model):
+        self.model = model
+        self.robots = []
+        self.targets = []
+        self.resolutions = 0
+        self.rounds = 0
+
+    def propose(self, robot, next_pos):
+        # Called from Robot.move_along_path, in activation order
+        self.robots.append(robot)
+        self.targets.append(next_pos)
+
+    def resolve(self):
+        robots, targets = self.robots, self.targets
+        self.robots, self.targets = [], []
+        if not robots:
+            return
+        moves = self.winners(robots, targets)
+        for robot, next_pos, wins in zip(robots, targets, moves.tolist()):
+            if wins:
+                robot.advance(next_pos)
+        # Losers in activation order, after every winner moved: a queued robot may still give way
+        docks = self.model.docks
+        for robot, next_pos, wins in zip(robots, targets, moves.tolist()):
+            if wins:
+                continue
+            if robot.path[:1] != [next_pos]:
+                continue  # swapped aside by an earlier robot's queue yield, which dropped its plan
+            if docks.make_way(robot, next_pos):
+                robot.advance(next_pos)
+            else:
+                robot.wait_blocked()
+
+    def winners(self, robots, targets):
+        # Boolean mask over the proposals (activation order) of the robots that move this tick
+        model = self.model
+        width, height = model.occupancy.width, model.occupancy.height
+        source = model.world.robot_xy[[robot.slot for robot in robots]]
+        target = np.array(targets, dtype=np.int32).reshape(-1, 2)
+        source_cell = source[:, 0] * height + source[:, 1]
+        inside = (target[:, 0] >= 0) & (target[:, 0] < width) & (target[:, 1] >= 0) & (target[:, 1] < height)
+        target_cell = np.where(inside, target[:, 0] * height + target[:, 1], 0)
+        moves = inside & ~model.navigation.blocked.ravel()[target_cell]
+
+        # One claim per cell: np.unique keeps the first (earliest activated) proposal
+        valid = np.flatnonzero(moves)
+        claims = np.zeros(len(robots), dtype=bool)
+        claims[valid[np.unique(target_cell[valid], return_index=True)[1]]] = True
+        moves &= claims
+
+        # Swaps: the robot standing on my target wants my cell
+        proposer = np.full(width * height, -1, dtype=np.int64)
+        proposer[source_cell] = np.arange(len(robots))
+        partner = np.where(inside, proposer[target_cell], -1)
+        partner_target = np.where(inside, target_cell, -1)[np.maximum(partner, 0)]
+        moves &= ~((partner >= 0) & (partner_target == source_cell))
+
+        # A target stays occupied unless all its robots leave; drop blocked moves until nothing changes
+        robots_at = model.occupancy.robots.ravel()
+        self.resolutions += 1
+        while True:
+            self.rounds += 1
+            staying = robots_at - np.bincount(source_cell[moves], minlength=width * height)
+            blocked = moves & (staying[target_cell] > 0)
+            if not blocked.any():
+                return moves
+            moves &= ~blocked
+
+
+def make_movement(name, model):
+    if name == "sequential":
+        return None
+    if name == "sync":
+        return MovementKernel(model)
+    raise ValueError(f"Unknown movement mode {name!r}, expected one of {MOVEMENT_MODES}")
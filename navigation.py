@@ -0,0 +1,168 @@
+import heapq
+
+import numpy as np
+
+from agent import Shelf, VisualTruck
+from fields import DistanceFields
+
+
+class StaticNavigation:
+    # Static navigation layer: shelves and the visual trucks never move,
+    # so the obstacle map, the neighbours and the routes are computed only once.
+    # set_blocked() closes or reopens cells during a run (a spill, maintenance): the distance fields
+    # are only redone around them and every plan made before is replanned (version bump).
+    OBSTACLE_TYPES = (Shelf, VisualTruck)
+
+    def __init__(self, grid, shared=None):
+        # `shared` is a per-layout dict (Layout.navigation_cache): models built on the same
+        # layout reuse its obstacle mask, adjacency and path cache instead of recomputing them
+        self.grid = grid
+        self.width = grid.width
+        self.height = grid.height
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.nodes_expanded = 0
+        self.version = 0
+        self.blocked = None
+        self.closed = set()  # cells closed with set_blocked(), kept across rebuilds
+        if shared:
+            self.blocked = shared["blocked"]
+            self.neighbors = shared["neighbors"]
+            self.path_cache = shared["path_cache"]
+            self.fields = shared["fields"]
+            self.version += 1
+        else:
+            self.rebuild()
+            if shared is not None:
+                shared.update(blocked=self.blocked, neighbors=self.neighbors, path_cache=self.path_cache,
+                              fields=self.fields)
+
+    def rebuild(self):
+        # Fresh containers, so a rebuild never touches structures shared with other models
+        previous = self.blocked
+        self.blocked = np.zeros((self.width, self.height), dtype=bool)
+        for x in range(self.width):
+            for y in range(self.height):
+                if (x, y) in self.closed or self._has_obstacle((x, y)):
+                    self.blocked[x, y] = True
+        # Distance fields are only redone around the cells that changed
+        if previous is None:
+            self.fields = DistanceFields(self.blocked)
+        else:
+            self.fields = self.fields.refreshed(self.blocked, np.argwhere(previous != self.blocked))
+
+        self.neighbors = {}
+        for x in range(self.width):
+            for y in range(self.height):
+                self.neighbors[(x, y)] = self._open_neighbors((x, y))
+        self.path_cache = {}
+        self.version += 1
+
+    def set_blocked(self, cells, blocked=True):
+        # Closes cells for routing (blocked=True) or reopens cells closed before; shelves and trucks
+        # stay blocked. Fresh containers again, so other models on the layout keep theirs
+        cells = {tuple(cell) for cell in cells}
+        if blocked:
+            self.closed |= cells
+        else:
+            self.closed -= cells
+        previous = self.blocked
+        self.blocked = previous.copy()
+        for cell in cells:
+            self.blocked[cell] = cell in self.closed or self._has_obstacle(cell)
+        changed = np.argwhere(previous != self.blocked)
+        if not len(changed):
+            return
+        self.fields = self.fields.refreshed(self.blocked, changed)
+        self.neighbors = dict(self.neighbors)
+        for cell in map(tuple, changed.tolist()):
+            for pos in self.grid.get_neighborhood(cell, moore=False, include_center=False):
+                self.neighbors[pos] = self._open_neighbors(pos)
+        self.path_cache = {}
+        self.version += 1
+
+    def _has_obstacle(self, pos):
+        return any(isinstance(agent, self.OBSTACLE_TYPES) for agent in self.grid.get_cell_list_contents([pos]))
+
+    def _open_neighbors(self, pos):
+        # Same neighbor order as grid.get_neighborhood, so searches break ties exactly like before
+        return tuple(near for near in self.grid.get_neighborhood(pos, moore=False, include_center=False)
+                     if not self.blocked[near])
+
+    def in_bounds(self, pos):
+        x, y = pos
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_blocked(self, pos):
+        return self.in_bounds(pos) and bool(self.blocked[pos])
+
+    def shortest_path(self, start, goal):
+        # Returns a fresh list (robots pop from it) or None if the goal is unreachable
+        path = self._cached_path(start, goal)
+        return None if path is None else list(path)
+
+    def add_goals(self, goals):
+        # Fixed goals (docks, shelf stops) get a distance field: distance() to them is a table read
+        self.fields.add_goals(goals)
+
+    def distance(self, start, goal):
+        rows = self.fields.lookup(goal)
+        if rows is not None:
+            steps = rows[start[0]][start[1]]
+            if steps >= 0:
+                return steps
+            if not self.blocked[start]:
+                return None
+        path = self._cached_path(start, goal)
+        return None if path is None else len(path)
+
+    def heuristic(self, goal):
+        # Steps to goal as nested lists rows[x][y] (-1 = unreachable), or None if goal has no field
+        return self.fields.lookup(goal)
+
+    def field_path(self, start, goal, prefer=None):
+        return self.fields.path(start, goal, prefer)
+
+    def _cached_path(self, start, goal):
+        key = (start, goal)
+        path = self.path_cache.get(key)
+        if path is None and key not in self.path_cache:
+            self.cache_misses += 1
+            path = self._a_star(start, goal)
+            self.path_cache[key] = path
+        else:
+            self.cache_hits += 1
+        return path
+
+    def _a_star(self, start, goal):
+        frontier = [(0, start)]
+        came_from = {start: None}
+        cost_so_far = {start: 0}
+        neighbors = self.neighbors
+
+        current = start
+        expanded = 0
+        while frontier:
+            current = heapq.heappop(frontier)[1]
+            if current == goal:
+                break
+            expanded += 1
+
+            new_cost = cost_so_far[current] + 1
+            for next_pos in neighbors[current]:
+                if next_pos not in cost_so_far or new_cost < cost_so_far[next_pos]:
+                    cost_so_far[next_pos] = new_cost
+                    priority = new_cost + abs(goal[0] - next_pos[0]) + abs(goal[1] - next_pos[1])
+                    heapq.heappush(frontier, (priority, next_pos))
+                    came_from[next_pos] = current
+
+        self.nodes_expanded += expanded
+        if current != goal:
+            return None
+
+        path = []
+        while current != start:
+            path.append(current)
+            current = came_from[current]
+        path.reverse()
+        return tuple(path)
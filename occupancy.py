@@ -0,0 +1,62 @@
+import numpy as np
+
+# Headings as (dx, dy); index order is the column order of OccupancyRaster.clearance
+HEADINGS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+HEADING_INDEX = {heading: index for index, heading in enumerate(HEADINGS)}
+_HEADING_ARRAY = np.array(HEADINGS, dtype=np.int32)
+
+
+class OccupancyRaster:
+    # Robot counts per cell, kept up to date as robots move (Robot.pos writes through here),
+    # plus the obstacle-free distance of every robot along the four headings, computed for
+    # all robots at once once per tick. Robots that move during the tick (sequential movement)
+    # make the table stale: clearance_of() rescans a robot's row when anything moved since its
+    # row was computed, so every robot reads the raster as it is when it is activated.
+
+    def __init__(self, width, height, max_distance=5):
+        self.width = width
+        self.height = height
+        self.max_distance = max_distance
+        self.robots = np.zeros((width, height), dtype=np.int16)
+        self.clearance = np.zeros((0, len(HEADINGS)), dtype=np.int8)
+        self.version = 0  # bumped by every move
+        self.stamps = np.zeros(0, dtype=np.int64)  # per row: version it was computed at
+        self._steps = np.arange(1, max_distance + 1, dtype=np.int32)
+
+    def move(self, old_pos, new_pos):
+        self.version += 1
+        if old_pos is not None:
+            self.robots[old_pos] -= 1
+        if new_pos is not None:
+            self.robots[new_pos] += 1
+
+    def is_occupied(self, pos):
+        x, y = pos
+        return 0 <= x < self.width and 0 <= y < self.height and self.robots[x, y] > 0
+
+    def update_clearance(self, positions):
+        # positions: (robots, 2). Cells probed: (robots, headings, distance)
+        cells = positions[:, None, None, :] + _HEADING_ARRAY[None, :, None, :] * self._steps[None, None, :, None]
+        x, y = cells[..., 0], cells[..., 1]
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        blocked = ~inside
+        blocked[inside] = self.robots[x[inside], y[inside]] > 0
+        # Index of the first blocked cell is the number of free cells before it
+        self.clearance = np.where(blocked.any(axis=2), blocked.argmax(axis=2), self.max_distance).astype(np.int8)
+        self.stamps = np.full(len(positions), self.version, dtype=np.int64)
+        return self.clearance
+
+    def clearance_of(self, slot, pos, heading):
+        # One robot's clearance along a heading index, against the raster as it is now
+        if self.stamps[slot] != self.version:
+            x, y = pos
+            for index, (dx, dy) in enumerate(HEADINGS):
+                distance = 0
+                while distance < self.max_distance:
+                    cx, cy = x + dx * (distance + 1), y + dy * (distance + 1)
+                    if not (0 <= cx < self.width and 0 <= cy < self.height) or self.robots[cx, cy] > 0:
+                        break
+                    distance += 1
+                self.clearance[slot, index] = distance
+            self.stamps[slot] = self.version
+        return int(self.clearance[slot, heading])
@@ -0,0 +1,203 @@
+import heapq
+
+PLANNERS = ("greedy", "cooperative", "flow")
+
+
+class GreedyPlanner:
+    # Original behaviour: every robot follows its static shortest path and collisions
+    # are handled reactively in Robot.move_along_path.
+    keeps_plans_when_stuck = True
+
+    def __init__(self, model):
+        self.model = model
+
+    def plan(self, robot, goal, start_tick):
+        if goal is None:
+            return []
+        return robot.a_star_search(goal)
+
+    def is_current(self, robot):
+        return True
+
+    def current_until(self, robot):
+        # Plans never expire
+        return None
+
+    def release(self, robot):
+        pass
+
+    def get_state(self):
+        return {}
+
+    def set_state(self, state):
+        pass
+
+
+class FlowFieldPlanner(GreedyPlanner):
+    # Greedy, but paths to fixed goals walk down the goal's distance field instead of A*:
+    # among equally short next steps, a cell nobody stands on right now is preferred.
+    def plan(self, robot, goal, start_tick):
+        if goal is None:
+            return []
+        occupancy = self.model.occupancy
+        path = self.model.navigation.field_path(robot.pos, goal, prefer=lambda pos: not occupancy.is_occupied(pos))
+        return robot.a_star_search(goal) if path is None else path
+
+
+class CooperativePlanner:
+    # Windowed cooperative A* (WHCA*): each robot searches in space-time against a shared
+    # reservation table of (cell, tick) -> robot id, for `window` ticks ahead, and then
+    # follows its static shortest path. Paths may contain waits (the same cell twice in a row).
+    keeps_plans_when_stuck = False
+
+    def __init__(self, model, window=16, max_expansions=512):
+        self.model = model
+        self.navigation = model.navigation
+        self.window = window
+        self.max_expansions = max_expansions
+        self.reservations = {}
+        self.owned = {}
+        self.expires = {}
+        self.planned_waits = 0
+        self.partial_plans = 0
+        self.nodes_expanded = 0
+
+    def is_current(self, robot):
+        # Replan once half the window has been used or when the robot fell behind its schedule
+        expires = self.expires.get(robot.unique_id)
+        return expires is not None and self.model.time_elapsed < expires and robot.stuck_time == 0
+
+    def current_until(self, robot):
+        # First tick at which is_current() turns False if the robot stays on schedule
+        return self.expires.get(robot.unique_id, self.model.time_elapsed)
+
+    def get_state(self):
+        # JSON-friendly copy of the reservation table, for snapshots
+        return {
+            "reservations": [[pos[0], pos[1], tick, owner] for (pos, tick), owner in self.reservations.items()],
+            "expires": [[robot_id, tick] for robot_id, tick in self.expires.items()],
+            "planned_waits": self.planned_waits,
+            "partial_plans": self.partial_plans,
+            "nodes_expanded": self.nodes_expanded,
+        }
+
+    def set_state(self, state):
+        self.reservations = {((x, y), tick): owner for x, y, tick, owner in state["reservations"]}
+        self.owned = {}
+        for key, owner in self.reservations.items():
+            self.owned.setdefault(owner, []).append(key)
+        self.expires = {robot_id: tick for robot_id, tick in state["expires"]}
+        self.planned_waits = state["planned_waits"]
+        self.partial_plans = state["partial_plans"]
+        self.nodes_expanded = state["nodes_expanded"]
+
+    def release(self, robot):
+        for key in self.owned.pop(robot.unique_id, ()):
+            if self.reservations.get(key) == robot.unique_id:
+                del self.reservations[key]
+        self.expires.pop(robot.unique_id, None)
+
+    def plan(self, robot, goal, start_tick):
+        # start_tick is the tick at which path[0] will be executed; the robot is at robot.pos before it
+        self.release(robot)
+        start = robot.pos
+        if goal is None or start == goal:
+            return []
+        if self.navigation.distance(start, goal) is None:
+            return robot.a_star_search(goal)
+
+        path = self._search(robot.unique_id, start, goal, start_tick)
+        self._reserve(robot.unique_id, start, path, start_tick)
+        self.expires[robot.unique_id] = start_tick + max(1, self.window // 2)
+        self.planned_waits += sum(1 for a, b in zip([start] + path, path) if a == b)
+        return path
+
+    def _free(self, robot_id, pos, tick):
+        owner = self.reservations.get((pos, tick))
+        return owner is None or owner == robot_id
+
+    def _search(self, robot_id, start, goal, start_tick):
+        distance = self.navigation.distance
+        # Registered goals have a distance field: read the heuristic straight from it
+        rows = self.navigation.heuristic(goal)
+        window = self.window
+        neighbors = self.navigation.neighbors
+
+        # Nodes are (cell, k): the robot is in `cell` at tick start_tick - 1 + k
+        frontier = [(distance(start, goal), 0, start)]
+        came_from = {(start, 0): None}
+        best = None
+        expansions = 0
+
+        while frontier:
+            f, k, pos = heapq.heappop(frontier)
+            # Closest node to the goal seen so far (latest tick on ties), used if the goal can't be reached
+            if best is None or (f - k, -k) < best[0]:
+                best = ((f - k, -k), (pos, k))
+            if pos == goal and self._goal_free(robot_id, goal, start_tick - 1 + k, start_tick - 1 + window):
+                return self._reconstruct(came_from, (pos, k))
+            if k == window:
+                continue
+            expansions += 1
+            if expansions > self.max_expansions:
+                break
+            self.nodes_expanded += 1
+
+            tick = start_tick + k
+            for next_pos in neighbors[pos] + (pos,):
+                node = (next_pos, k + 1)
+                if node in came_from or not self._free(robot_id, next_pos, tick):
+                    continue
+                # Don't follow into a cell another robot leaves this same tick (this also rules out swaps)
+                if next_pos != pos and not self._free(robot_id, next_pos, tick - 1):
+                    continue
+                if rows is not None:
+                    h = rows[next_pos[0]][next_pos[1]]
+                    if h < 0:
+                        continue
+                else:
+                    h = distance(next_pos, goal)
+                    if h is None:
+                        continue
+                came_from[node] = (pos, k)
+                heapq.heappush(frontier, (k + 1 + h, k + 1, next_pos))
+
+        # Goal not reachable inside the window: go as close as possible, then follow the static path
+        self.partial_plans += 1
+        pos, k = best[1]
+        return self._reconstruct(came_from, (pos, k)) + self.navigation.shortest_path(pos, goal)
+
+    def _goal_free(self, robot_id, goal, arrival_tick, until_tick):
+        # The robot stays on its goal after arriving, so nobody else may hold it later in the window
+        return all(self._free(robot_id, goal, tick) for tick in range(arrival_tick, until_tick + 1))
+
+    @staticmethod
+    def _reconstruct(came_from, node):
+        path = []
+        while came_from[node] is not None:
+            path.append(node[0])
+            node = came_from[node]
+        path.reverse()
+        return path
+
+    def _reserve(self, robot_id, start, path, start_tick):
+        keys = [(start, start_tick - 1)]
+        for offset, pos in enumerate(path[:self.window]):
+            keys.append((pos, start_tick + offset))
+        # Keep the last reserved cell for the rest of the window (the robot parks there)
+        last_pos, last_tick = keys[-1][0], keys[-1][1]
+        for tick in range(last_tick + 1, start_tick + self.window):
+            keys.append((last_pos, tick))
+        for key in keys:
+            self.reservations.setdefault(key, robot_id)
+        self.owned[robot_id] = keys
+
+
+def make_planner(name, model):
+    if name == "greedy":
+        return GreedyPlanner(model)
+    if name == "cooperative":
+        return CooperativePlanner(model)
+    if name == "flow":
+        return FlowFieldPlanner(model)
+    raise ValueError(f"Unknown planner {name!r}, expected one of {PLANNERS}")
@@ -0,0 +1,147 @@
+# Where does a tick go? Per-phase timers and hot-path counters for WarehouseModel.
+#
+#   model = WarehouseModel(..., profile=True)   # phase timers on; off (None) by default
+#   ...run...
+#   print(model.profiler.format_report(model))
+#
+#   python profiling.py --layout aisles:60x40 --num-robots 40 --cprofile 200
+#
+# Counters that are cheap enough to keep always (A* expansions, cache hits, replans, blocked
+# ticks, alternative moves) live on the model and its navigation/planner; the profiler only
+# adds timers, so a model without one pays a few `is None` checks per tick.
+
+import argparse
+import cProfile
+import io
+import pstats
+import time
+
+PHASES = ("fast_forward", "workload", "docks", "assign", "clearance", "agents", "movement", "deadlocks", "checks", "collect", "finish")
+
+
+class Profiler:
+    def __init__(self):
+        self.clock = time.perf_counter
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.ticks = 0
+
+    def lap(self, phase, started):
+        # Adds the time since `started` to phase and returns the new start
+        now = self.clock()
+        self.totals[phase] += now - started
+        self.calls[phase] += 1
+        return now
+
+    def counters(self, model):
+        navigation = model.navigation
+        lookups = navigation.cache_hits + navigation.cache_misses
+        counters = {
+            "ticks": model.time_elapsed,
+            "a_star_searches": navigation.cache_misses,
+            "a_star_nodes_expanded": navigation.nodes_expanded,
+            "path_cache_hits": navigation.cache_hits,
+            "path_cache_hit_rate": navigation.cache_hits / lookups if lookups else 0.0,
+            "distance_fields": len(navigation.fields),
+            "replans_performed": model.replans_performed,
+            "replans_avoided": model.replans_avoided,
+            "blocked_ticks": model.conflicts,
+            "wait_ticks": model.wait_ticks,
+            "alternative_moves": model.alternative_moves,
+        }
+        planner = model.planner
+        if hasattr(planner, "nodes_expanded"):
+            counters["space_time_nodes_expanded"] = planner.nodes_expanded
+            counters["partial_plans"] = planner.partial_plans
+        if model.fast_forward is not None:
+            counters["ticks_fast_forwarded"] = model.fast_forward.ticks_skipped
+            counters["dispatches_skipped"] = model.fast_forward.dispatches_skipped
+        if model.movement is not None:
+            counters["movement_resolutions"] = model.movement.resolutions
+            counters["movement_rounds"] = model.movement.rounds
+        if model.deadlocks is not None:
+            counters.update(model.deadlocks.metrics())
+        return counters
+
+    def report(self, model):
+        total = sum(self.totals.values())
+        phases = {phase: {"seconds": self.totals[phase], "calls": self.calls[phase],
+                          "share": self.totals[phase] / total if total else 0.0}
+                  for phase in PHASES if self.calls[phase]}
+        return {"steps": self.ticks, "seconds": total, "phases": phases, "counters": self.counters(model)}
+
+    def format_report(self, model):
+        report = self.report(model)
+        lines = [f"{report['steps']} steps in {report['seconds']:.3f}s"]
+        for phase, row in report["phases"].items():
+            lines.append(f"  {phase:<13} {row['seconds'] * 1e3:10.2f} ms {row['share']:6.1%}"
+                         f"  ({row['seconds'] / row['calls'] * 1e6:.1f} us/call)")
+        for name, value in report["counters"].items():
+            lines.append(f"  {name:<27} {value:.3f}" if isinstance(value, float) else f"  {name:<27} {value}")
+        return "\n".join(lines)
+
+
+def profile_ticks(model, ticks, backend="cprofile", sort="cumulative", limit=25):
+    # Runs the next `ticks` steps under cProfile (or pyinstrument, if installed) and returns the text report
+    if backend == "pyinstrument":
+        try:
+            from pyinstrument import Profiler as Sampler
+        except ImportError:
+            raise ImportError("backend='pyinstrument' needs the pyinstrument package") from None
+        sampler = Sampler()
+        sampler.start()
+        _run(model, ticks)
+        sampler.stop()
+        return sampler.output_text()
+    if backend != "cprofile":
+        raise ValueError(f"Unknown profiling backend {backend!r}, expected 'cprofile' or 'pyinstrument'")
+    profile = cProfile.Profile()
+    profile.enable()
+    _run(model, ticks)
+    profile.disable()
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def _run(model, ticks):
+    for _ in range(ticks):
+        if not model.running:
+            break
+        model.step()
+
+
+def main(argv=None):
+    from model import WarehouseModel
+
+    parser = argparse.ArgumentParser(description="Profile one warehouse run")
+    parser.add_argument("--width", type=int, default=18)
+    parser.add_argument("--height", type=int, default=12)
+    parser.add_argument("--num-robots", type=int, default=5)
+    parser.add_argument("--initial-packages", type=int, default=100)
+    parser.add_argument("--max-time", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--layout", default=None)
+    parser.add_argument("--planner", default="greedy")
+    parser.add_argument("--dispatcher", default="greedy")
+    parser.add_argument("--step-mode", default="tick")
+    parser.add_argument("--movement", default="sequential")
+    parser.add_argument("--deadlock-policy", default="off")
+    parser.add_argument("--cprofile", type=int, default=0, metavar="TICKS",
+                        help="run the first TICKS steps under cProfile and print the top functions")
+    parser.add_argument("--pyinstrument", action="store_true", help="use pyinstrument instead of cProfile")
+    args = parser.parse_args(argv)
+
+    model = WarehouseModel(args.width, args.height, args.num_robots, args.initial_packages, args.max_time, args.k,
+                           seed=args.seed, layout=args.layout, planner=args.planner, dispatcher=args.dispatcher,
+                           step_mode=args.step_mode, movement=args.movement, deadlock_policy=args.deadlock_policy, paths_file=None, log_level=None,
+                           profile=True)
+    if args.cprofile:
+        print(profile_ticks(model, args.cprofile, backend="pyinstrument" if args.pyinstrument else "cprofile"))
+    _run(model, args.max_time + 1)
+    print(model.profiler.format_report(model))
+
+
+if __name__ == "__main__":
+    main()
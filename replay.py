@@ -0,0 +1,470 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from layout import resolve_layout
+from live import KPI_LABELS, Frame, layout_message, serve
+from trajectory import ACTION_CODES, RECORD_DTYPE, read_trajectory
+
+# Replays and analytics over recorded trajectories, without running the model.
+#
+#   python replay.py analyze run.bin --layout aisles:60x40 --top 10 --out run_stats.npz
+#   python replay.py play run.bin --layout aisles:60x40 --initial-packages 600 --tps 50 --port 8765
+#
+#   stats = analyze("run.bin", layout="aisles:60x40")
+#   stats.occupancy, stats.visits, stats.waits   # (width, height) heatmaps
+#   stats.hot_spots(10), stats.robot_table(), stats.cycle_times(), stats.summary()
+#
+# Recordings are the trajectory_file exports ("bin", memory-mapped, or "ndjson", read line by line)
+# or robot_paths.json. They are processed in chunks of records in tick order; each robot's last record
+# is carried to the next chunk, so memory depends on the chunk size and the fleet, not the run length.
+# Trajectories only record events (moves, pickups, deliveries): a robot is where its last record put
+# it until the next one (side steps of stuck robots are not recorded: the robot shows up on its next
+# recorded cell). Time before a robot's first record is not counted. robot_paths.json has no
+# ticks, so its records are numbered per robot and "ticks" there count records.
+#
+# The playback drives the live view (live.py) from a recording at any speed; robots that have not
+# moved yet are drawn on the layout's spawn points (robots take them in id order, like the model).
+
+MOVE = ACTION_CODES["move"]
+PICKUPS = (ACTION_CODES["pickup"], ACTION_CODES["pickup_from_shelf"])
+DELIVERIES = (ACTION_CODES["deliver_load"], ACTION_CODES["deliver_shelf"])
+
+
+def read_records(path, fmt=None, chunk_size=1 << 20):
+    # RECORD_DTYPE chunks in tick order
+    fmt = fmt or _format(path)
+    if fmt == "bin":
+        records = read_trajectory(path)
+        for start in range(0, len(records), chunk_size):
+            yield records[start:start + chunk_size]
+    elif fmt == "ndjson":
+        with open(path) as f:
+            f.readline()  # header
+            rows = []
+            for line in f:
+                if line.strip():
+                    rows.append(tuple(json.loads(line)))
+                if len(rows) == chunk_size:
+                    yield np.array(rows, dtype=RECORD_DTYPE)
+                    rows = []
+            if rows:
+                yield np.array(rows, dtype=RECORD_DTYPE)
+    elif fmt == "json":
+        yield paths_to_records(path)
+    else:
+        raise ValueError(f"Unknown recording format {fmt!r}, expected bin, ndjson or json")
+
+
+def load_records(path, fmt=None):
+    # The whole recording as one array (a memory map for "bin" files)
+    fmt = fmt or _format(path)
+    if fmt == "bin":
+        return read_trajectory(path)
+    chunks = list(read_records(path, fmt))
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=RECORD_DTYPE)
+
+
+def paths_to_records(path):
+    # robot_paths.json -> records numbered 1, 2, ... per robot, merged in that order
+    with open(path) as f:
+        robots = json.load(f)
+    sizes = [len(robot["path"]) for robot in robots]
+    records = np.empty(sum(sizes), dtype=RECORD_DTYPE)
+    offset = 0
+    for robot, size in zip(robots, sizes):
+        part = records[offset:offset + size]
+        part["tick"] = np.arange(1, size + 1)
+        part["robot"] = robot["id"]
+        positions = np.array([step["position"] for step in robot["path"]], dtype=np.int16).reshape(-1, 2)
+        part["x"] = positions[:, 0]
+        part["y"] = positions[:, 1]
+        part["action"] = [ACTION_CODES[step["action"]] for step in robot["path"]]
+        offset += size
+    return records[np.argsort(records["tick"], kind="stable")]
+
+
+class TrajectoryStats:
+    _ROBOT_FIELDS = ("first_tick", "last_tick", "moves", "loaded_moves", "pickups", "deliveries", "loaded_ticks",
+                     "carrying", "last_event_tick", "last_event", "last_pickup_tick")
+
+    def __init__(self, width=1, height=1):
+        self.width = width
+        self.height = height
+        self.occupancy = np.zeros((width, height), dtype=np.int64)  # robot-ticks spent on each cell
+        self.visits = np.zeros((width, height), dtype=np.int64)     # moves into each cell
+        self.waits = np.zeros((width, height), dtype=np.int64)      # ticks held up on a cell between two moves
+        # Per robot, in the order of robot_ids (sorted ids seen so far; zone runs use sparse ids)
+        self.robot_ids = np.empty(0, dtype=np.int64)
+        self.first_tick = np.full(0, -1, dtype=np.int64)
+        self.last_tick = np.full(0, -1, dtype=np.int64)
+        self.moves = np.zeros(0, dtype=np.int64)
+        self.loaded_moves = np.zeros(0, dtype=np.int64)
+        self.pickups = np.zeros(0, dtype=np.int64)
+        self.deliveries = np.zeros(0, dtype=np.int64)
+        self.loaded_ticks = np.zeros(0, dtype=np.int64)
+        self.carrying = np.zeros(0, dtype=np.int8)         # after the robot's last record so far
+        self.last_event_tick = np.full(0, -1, dtype=np.int64)
+        self.last_event = np.full(0, -1, dtype=np.int8)    # 1 pickup, 0 delivery, -1 none yet
+        self.last_pickup_tick = np.full(0, -1, dtype=np.int64)
+        self.legs = {"pickup_to_delivery": [], "delivery_to_pickup": [], "pickup_to_pickup": []}
+        self.pending = np.empty(0, dtype=RECORD_DTYPE)      # each robot's last record, stay not known yet
+        self.records = 0
+        self.end_tick = None
+
+    def add(self, chunk):
+        chunk = np.asarray(chunk)
+        if not len(chunk):
+            return
+        self.records += len(chunk)
+        self._fit(int(chunk["x"].max()) + 1, int(chunk["y"].max()) + 1, np.unique(chunk["robot"]))
+        data = np.concatenate([self.pending, chunk])
+        new = np.ones(len(data), dtype=bool)
+        new[:len(self.pending)] = False
+        order = np.argsort(data["robot"], kind="stable")
+        data, new = data[order], new[order]
+
+        ids, inverse = np.unique(data["robot"], return_inverse=True)
+        robot = np.searchsorted(self.robot_ids, ids)[inverse]  # dense index into the per-robot arrays
+        tick = data["tick"].astype(np.int64)
+        action = data["action"]
+        cell = data["x"].astype(np.int64) * self.height + data["y"]
+        first = np.r_[True, robot[1:] != robot[:-1]]
+        last = np.r_[robot[1:] != robot[:-1], True]
+        size = self.width * self.height
+
+        # Loaded after each record: pickups set it, deliveries clear it, anything else keeps it
+        pickup = new & np.isin(action, PICKUPS)
+        delivery = new & np.isin(action, DELIVERIES)
+        mark = np.full(len(data), -1, dtype=np.int8)
+        mark[pickup] = 1
+        mark[delivery] = 0
+        starts = first & (mark < 0)
+        mark[starts] = self.carrying[robot[starts]]
+        filled = np.where(mark >= 0, np.arange(len(data)), 0)
+        np.maximum.accumulate(filled, out=filled)
+        loaded = mark[filled] == 1
+        loaded_before = np.r_[False, loaded[:-1]]
+        loaded_before[first] = self.carrying[robot[first]] == 1
+
+        # A record's stay lasts until the robot's next record
+        done = ~last
+        dwell = np.r_[tick[1:] - tick[:-1], 0]
+        self.occupancy += np.bincount(cell[done], weights=dwell[done], minlength=size).astype(np.int64).reshape(self.width, self.height)
+        move = new & (action == MOVE)
+        self.visits += np.bincount(cell[move], minlength=size).reshape(self.width, self.height)
+        held = done & (action == MOVE) & (np.r_[action[1:], 0] == MOVE) & (dwell > 1)
+        self.waits += np.bincount(cell[held], weights=dwell[held] - 1, minlength=size).astype(np.int64).reshape(self.width, self.height)
+
+        robots = len(self.moves)
+        self.moves += np.bincount(robot[move], minlength=robots)
+        self.loaded_moves += np.bincount(robot[move & loaded_before], minlength=robots)
+        self.pickups += np.bincount(robot[pickup], minlength=robots)
+        self.deliveries += np.bincount(robot[delivery], minlength=robots)
+        carried = done & loaded
+        self.loaded_ticks += np.bincount(robot[carried], weights=dwell[carried], minlength=robots).astype(np.int64)
+        seen = first & new & (self.first_tick[robot] < 0)
+        self.first_tick[robot[seen]] = tick[seen]
+        self.last_tick[robot[last]] = tick[last]
+        self.carrying[robot[last]] = loaded[last]
+        self.pending = data[last]
+
+        self._legs(robot, tick, pickup, delivery)
+
+    def _legs(self, robot, tick, pickup, delivery):
+        # Loaded legs, empty legs and whole cycles, in ticks
+        events = pickup | delivery
+        event_robot, event_tick, kind = robot[events], tick[events], pickup[events].astype(np.int8)
+        if not len(event_robot):
+            return
+        first = np.r_[True, event_robot[1:] != event_robot[:-1]]
+        last = np.r_[event_robot[1:] != event_robot[:-1], True]
+        previous_tick = np.r_[0, event_tick[:-1]]
+        previous_kind = np.r_[-1, kind[:-1]].astype(np.int8)
+        previous_tick[first] = self.last_event_tick[event_robot[first]]
+        previous_kind[first] = self.last_event[event_robot[first]]
+        self.legs["pickup_to_delivery"].append((event_tick - previous_tick)[(previous_kind == 1) & (kind == 0)])
+        self.legs["delivery_to_pickup"].append((event_tick - previous_tick)[(previous_kind == 0) & (kind == 1)])
+        self.last_event_tick[event_robot[last]] = event_tick[last]
+        self.last_event[event_robot[last]] = kind[last]
+
+        picks = kind == 1
+        pick_robot, pick_tick = event_robot[picks], event_tick[picks]
+        if len(pick_robot):
+            first = np.r_[True, pick_robot[1:] != pick_robot[:-1]]
+            last = np.r_[pick_robot[1:] != pick_robot[:-1], True]
+            previous = np.r_[0, pick_tick[:-1]]
+            previous[first] = self.last_pickup_tick[pick_robot[first]]
+            self.legs["pickup_to_pickup"].append((pick_tick - previous)[previous >= 0])
+            self.last_pickup_tick[pick_robot[last]] = pick_tick[last]
+
+    def finish(self, end_tick=None):
+        # Closes every robot's last stay at end_tick (default: the last recorded tick)
+        pending = self.pending
+        if end_tick is None:
+            end_tick = int(pending["tick"].max()) if len(pending) else 0
+        self.end_tick = end_tick
+        if len(pending):
+            robot = np.searchsorted(self.robot_ids, pending["robot"])
+            dwell = np.maximum(end_tick - pending["tick"].astype(np.int64), 0)
+            cell = pending["x"].astype(np.int64) * self.height + pending["y"]
+            np.add.at(self.occupancy.reshape(-1), cell, dwell)
+            carried = self.carrying[robot] == 1
+            np.add.at(self.loaded_ticks, robot[carried], dwell[carried])
+            self.pending = np.empty(0, dtype=RECORD_DTYPE)
+        return self
+
+    def cycle_times(self):
+        return {name: np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+                for name, parts in self.legs.items()}
+
+    def hot_spots(self, top=10):
+        # Cells where robots were held up the longest: [(x, y, wait ticks, visits)]
+        flat = self.waits.reshape(-1)
+        cells = np.argsort(flat, kind="stable")[::-1][:top]
+        cells = cells[flat[cells] > 0]
+        return [(int(cell // self.height), int(cell % self.height), int(flat[cell]), int(self.visits.reshape(-1)[cell]))
+                for cell in cells]
+
+    def robot_table(self):
+        # One row per robot that has records
+        ids = np.flatnonzero(self.first_tick >= 0)
+        span = max(self.end_tick or 0, 1)
+        return {
+            "robot": self.robot_ids[ids],
+            "moves": self.moves[ids],
+            "loaded_distance": self.loaded_moves[ids],
+            "empty_distance": self.moves[ids] - self.loaded_moves[ids],
+            "pickups": self.pickups[ids],
+            "deliveries": self.deliveries[ids],
+            "utilization": self.moves[ids] / span,
+            "loaded_share": self.loaded_ticks[ids] / span,
+        }
+
+    def summary(self):
+        legs = self.cycle_times()
+        table = self.robot_table()
+        moves = int(self.moves.sum())
+        return {
+            "records": self.records,
+            "end_tick": self.end_tick,
+            "robots": len(table["robot"]),
+            "moves": moves,
+            "loaded_distance": int(self.loaded_moves.sum()),
+            "empty_distance": moves - int(self.loaded_moves.sum()),
+            "pickups": int(self.pickups.sum()),
+            "deliveries": int(self.deliveries.sum()),
+            "utilization_mean": float(table["utilization"].mean()) if len(table["robot"]) else 0.0,
+            "wait_ticks": int(self.waits.sum()),
+            **{f"{name}_mean": float(values.mean()) if len(values) else 0.0 for name, values in legs.items()},
+            **{f"{name}_p95": float(np.percentile(values, 95)) if len(values) else 0.0 for name, values in legs.items()},
+        }
+
+    def save(self, path):
+        np.savez_compressed(path, occupancy=self.occupancy, visits=self.visits, waits=self.waits,
+                            **{f"robot_{name}": values for name, values in self.robot_table().items()},
+                            **{f"{name}_legs": values for name, values in self.cycle_times().items()})
+
+    def _fit(self, width, height, robot_ids):
+        if width > self.width or height > self.height:
+            width, height = max(width, self.width), max(height, self.height)
+            for name in ("occupancy", "visits", "waits"):
+                grid = getattr(self, name)
+                setattr(self, name, np.pad(grid, ((0, width - self.width), (0, height - self.height))))
+            # Cell indices of the carried records change with the height; they are recomputed per chunk
+            self.width, self.height = width, height
+        merged = np.union1d(self.robot_ids, robot_ids).astype(np.int64)
+        if len(merged) > len(self.robot_ids):
+            # New robots take their place in id order; the known ones keep their values
+            known = np.searchsorted(merged, self.robot_ids)
+            for name in self._ROBOT_FIELDS:
+                values = getattr(self, name)
+                fill = -1 if name in ("first_tick", "last_tick", "last_event_tick", "last_event", "last_pickup_tick") else 0
+                grown = np.full(len(merged), fill, dtype=values.dtype)
+                grown[known] = values
+                setattr(self, name, grown)
+            self.robot_ids = merged
+
+
+def analyze(path, layout=None, width=None, height=None, end_tick=None, fmt=None, chunk_size=1 << 20):
+    # width/height (or a layout) fix the heatmap size; otherwise it grows to the cells seen
+    if layout is not None:
+        layout = resolve_layout(layout, width, height)
+        width, height = layout.width, layout.height
+    stats = TrajectoryStats(width or 1, height or 1)
+    for chunk in read_records(path, fmt, chunk_size):
+        stats.add(chunk)
+    return stats.finish(end_tick)
+
+
+class RecordingPlayback:
+    # Same interface as live.LiveSimulation (frame, layout_message, start, stop), fed from a recording.
+    # initial_packages (unload truck at tick 0) and shelf_loads (per shelf, layout order) are not in the
+    # recording; the counters that need them are left out when they are not given.
+
+    def __init__(self, records, layout, ticks_per_second=10, publish_rate=30, start_tick=0, end_tick=None,
+                 initial_packages=None, shelf_loads=None):
+        self.records = records
+        self.ticks = records["tick"]
+        self.layout = layout
+        self.ticks_per_second = ticks_per_second
+        self.publish_interval = 1 / publish_rate
+        self.end_tick = int(self.ticks[-1]) if end_tick is None and len(records) else (end_tick or 0)
+        self.initial_packages = initial_packages
+        self.initial_shelves = np.zeros(len(layout.shelves), dtype=np.int32) if shelf_loads is None \
+            else np.asarray(shelf_loads, dtype=np.int32)
+        self.robot_ids = np.unique(records["robot"]) if len(records) else np.empty(0, dtype=np.uint32)
+        # stop cell -> index of the shelf served from it
+        shelf_index = {pos: index for index, pos in enumerate(layout.shelves)}
+        self.stop_shelf = np.full((layout.width, layout.height), -1, dtype=np.int32)
+        for stop, shelf in layout.shelf_stops.items():
+            self.stop_shelf[stop] = shelf_index.get(shelf, -1)
+        self.labels = [label for label in KPI_LABELS
+                       if initial_packages is not None or label != "Packages in Unload Truck"]
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="playback", daemon=True)
+        self.reset()
+        self.seek(start_tick)
+
+    def layout_message(self):
+        return layout_message(self.layout, self.labels)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def reset(self):
+        self.cursor = 0
+        self.tick = 0
+        spawns = np.array(self.layout.robot_spawns, dtype=np.int32).reshape(-1, 2)
+        self.robots = np.full((len(self.robot_ids), 3), -1, dtype=np.int32)
+        count = min(len(spawns), len(self.robots))
+        self.robots[:count, :2] = spawns[:count]
+        self.robots[:, 2] = 0
+        self.shelves = self.initial_shelves.copy()
+        self.counts = dict.fromkeys(("moves", "pickups", "deliver_load", "deliver_shelf"), 0)
+
+    def seek(self, tick):
+        # State at the end of `tick`; seeking backwards replays from the start
+        if tick < self.tick:
+            self.reset()
+        self.advance(tick)
+        self.publish()
+
+    def advance(self, tick):
+        end = int(np.searchsorted(self.ticks, tick, side="right"))
+        if end <= self.cursor:
+            self.tick = max(self.tick, tick)
+            return
+        chunk = np.asarray(self.records[self.cursor:end])
+        self.cursor, self.tick = end, tick
+        slots = np.searchsorted(self.robot_ids, chunk["robot"])
+        action = chunk["action"]
+
+        # Last record per robot gives its cell, last pickup/delivery its load
+        last = _last_index(slots)
+        self.robots[slots[last], 0] = chunk["x"][last]
+        self.robots[slots[last], 1] = chunk["y"][last]
+        events = np.flatnonzero(np.isin(action, PICKUPS + DELIVERIES))
+        if len(events):
+            last = events[_last_index(slots[events])]
+            self.robots[slots[last], 2] = np.isin(action[last], PICKUPS)
+
+        shelf = self.stop_shelf[chunk["x"], chunk["y"]]
+        stored = (action == ACTION_CODES["deliver_shelf"]) & (shelf >= 0)
+        taken = (action == ACTION_CODES["pickup_from_shelf"]) & (shelf >= 0)
+        np.add.at(self.shelves, shelf[stored], 1)
+        np.subtract.at(self.shelves, shelf[taken], 1)
+        self.counts["moves"] += int(np.count_nonzero(action == MOVE))
+        self.counts["pickups"] += int(np.count_nonzero(action == ACTION_CODES["pickup"]))
+        self.counts["deliver_load"] += int(np.count_nonzero(action == ACTION_CODES["deliver_load"]))
+        self.counts["deliver_shelf"] += int(np.count_nonzero(action == ACTION_CODES["deliver_shelf"]))
+
+    def publish(self, running=None):
+        counts = self.counts
+        values = {"Packages in Load Truck": counts["deliver_load"],
+                  "Packages in Shelves": int(self.shelves.sum()),
+                  "Total Movements": counts["moves"],
+                  "Total Packages Delivered": counts["deliver_load"] + counts["deliver_shelf"]}
+        if self.initial_packages is not None:
+            values["Packages in Unload Truck"] = max(0, self.initial_packages - counts["pickups"])
+        self.frame = Frame(self.tick, self.robot_ids.tolist(), self.robots.copy(), self.shelves.copy(),
+                           {label: values[label] for label in self.labels},
+                           self.tick < self.end_tick if running is None else running)
+
+    def run(self):
+        # Plays from the current tick at ticks_per_second (everything at once if None)
+        clock = time.perf_counter
+        started, first_tick = clock(), self.tick
+        while self.tick < self.end_tick and not self.stopped.is_set():
+            if self.ticks_per_second:
+                target = min(self.end_tick, first_tick + int((clock() - started) * self.ticks_per_second))
+            else:
+                target = self.end_tick
+            if target > self.tick:
+                self.advance(target)
+                self.publish()
+            self.stopped.wait(self.publish_interval)
+        self.publish(running=False)
+
+
+def _last_index(keys):
+    # Index of the last occurrence of every distinct key
+    reverse = keys[::-1]
+    _, first = np.unique(reverse, return_index=True)
+    return len(keys) - 1 - first
+
+
+def _format(path):
+    extension = os.path.splitext(path)[1].lower()
+    return {".bin": "bin", ".ndjson": "ndjson", ".json": "json"}.get(extension, "bin")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze or play back a recorded warehouse run")
+    parser.add_argument("command", choices=("analyze", "play"))
+    parser.add_argument("path", help="trajectory_file export (.bin / .ndjson) or robot_paths.json")
+    parser.add_argument("--format", default=None, choices=("bin", "ndjson", "json"))
+    parser.add_argument("--layout", default=None, help="layout the run used (built-in layout if omitted)")
+    parser.add_argument("--width", type=int, default=18)
+    parser.add_argument("--height", type=int, default=12)
+    parser.add_argument("--end-tick", type=int, default=None, help="last tick of the run (last record if omitted)")
+    parser.add_argument("--top", type=int, default=10, help="congestion hot spots to list")
+    parser.add_argument("--out", default=None, help=".npz file for the heatmaps, robot table and cycle times")
+    parser.add_argument("--initial-packages", type=int, default=None)
+    parser.add_argument("--tps", type=float, default=10, help="playback ticks per second")
+    parser.add_argument("--fps", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+    layout = resolve_layout(args.layout, args.width, args.height)
+
+    if args.command == "play":
+        playback = RecordingPlayback(load_records(args.path, args.format), layout, ticks_per_second=args.tps,
+                                     end_tick=args.end_tick, initial_packages=args.initial_packages)
+        print(f"Playing {args.path} on http://localhost:{args.port}/?fps={args.fps:g}")
+        asyncio.run(serve(playback, args.port, args.fps))
+        return
+
+    stats = analyze(args.path, layout=layout, end_tick=args.end_tick, fmt=args.format)
+    for name, value in stats.summary().items():
+        print(f"  {name:<26}{value:.3f}" if isinstance(value, float) else f"  {name:<26}{value}")
+    print("Congestion hot spots (x, y, wait ticks, visits):")
+    for spot in stats.hot_spots(args.top):
+        print(f"  {spot}")
+    import pandas as pd
+    print(pd.DataFrame(stats.robot_table()).to_string(index=False))
+    if args.out:
+        stats.save(args.out)
+        print(f"Saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@
 # the user sets a maximum simutlation time
 
 
+import logging
+
 import mesa
 from mesa.visualization.modules import CanvasGrid, ChartModule
 from model import WarehouseModel, Robot, Shelf, Truck, Package, VisualTruck
@@ -85,6 +87,9 @@ model_params = {
     "k": 0
 }
 
+# Robot events go through the "warehouse" loggers; show pickups/deliveries on the console
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+
 # Create and launch the server
 server = mesa.visualization.ModularServer(
     WarehouseModel,
@@ -0,0 +1,99 @@
+class BucketGrid:
+    # Shelves bucketed into size x size blocks; nearest queries scan rings of blocks
+    # outward from the query and stop as soon as no farther block can hold a closer shelf.
+
+    def __init__(self, width, height, bucket_size=4):
+        self.size = bucket_size
+        self.max_ring = max(width, height) // bucket_size + 1
+        self.buckets = {}
+        self.members = {}
+
+    def __len__(self):
+        return len(self.members)
+
+    def __contains__(self, shelf):
+        return shelf in self.members
+
+    def add(self, shelf, pos):
+        if shelf in self.members:
+            return
+        key = (pos[0] // self.size, pos[1] // self.size)
+        self.buckets.setdefault(key, {})[shelf] = pos
+        self.members[shelf] = key
+
+    def discard(self, shelf):
+        key = self.members.pop(shelf, None)
+        if key is None:
+            return
+        bucket = self.buckets[key]
+        del bucket[shelf]
+        if not bucket:
+            del self.buckets[key]
+
+    def nearest(self, pos, rank):
+        if not self.members:
+            return None
+        bx, by = pos[0] // self.size, pos[1] // self.size
+        best = None
+        best_shelf = None
+        for ring in range(self.max_ring + 1):
+            for key in self._ring(bx, by, ring):
+                for shelf, shelf_pos in self.buckets.get(key, {}).items():
+                    candidate = (abs(pos[0] - shelf_pos[0]) + abs(pos[1] - shelf_pos[1]), rank[shelf])
+                    if best is None or candidate < best:
+                        best = candidate
+                        best_shelf = shelf
+            # Every shelf in ring + 1 or beyond is at least ring * size + 1 cells away
+            if best is not None and best[0] <= ring * self.size:
+                break
+        return best_shelf
+
+    @staticmethod
+    def _ring(bx, by, ring):
+        if ring == 0:
+            yield (bx, by)
+            return
+        for dx in range(-ring, ring + 1):
+            yield (bx + dx, by - ring)
+            yield (bx + dx, by + ring)
+        for dy in range(-ring + 1, ring):
+            yield (bx - ring, by + dy)
+            yield (bx + ring, by + dy)
+
+
+class ShelfIndex:
+    # Shelves split by load state ("has free capacity" / "has packages") plus the
+    # reverse map shelf -> stop cell. Shelves call update() whenever their load changes.
+
+    def __init__(self, width, height, shelf_to_stop, bucket_size=4):
+        self.with_capacity = BucketGrid(width, height, bucket_size)
+        self.with_packages = BucketGrid(width, height, bucket_size)
+        self.rank = {}  # layout order, used to break distance ties deterministically
+        self.by_pos = {}
+        self.stop_for_shelf = {}
+        for stop_pos, shelf_pos in shelf_to_stop.items():
+            self.stop_for_shelf.setdefault(shelf_pos, stop_pos)
+
+    def add(self, shelf):
+        self.rank[shelf] = len(self.rank)
+        self.by_pos[shelf.pos] = shelf
+        self.update(shelf)
+
+    def update(self, shelf):
+        if shelf.current_load < shelf.capacity:
+            self.with_capacity.add(shelf, shelf.pos)
+        else:
+            self.with_capacity.discard(shelf)
+        if shelf.current_load > 0:
+            self.with_packages.add(shelf, shelf.pos)
+        else:
+            self.with_packages.discard(shelf)
+
+    def nearest_with_capacity(self, pos):
+        return self.with_capacity.nearest(pos, self.rank)
+
+    def nearest_with_packages(self, pos):
+        return self.with_packages.nearest(pos, self.rank)
+
+    def stop_position(self, shelf):
+        return self.stop_for_shelf.get(shelf.pos)
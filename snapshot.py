@@ -0,0 +1,241 @@
+import json
+
+import numpy as np
+
+from agent import Robot
+from layout import Layout
+from model import WarehouseModel
+from trajectory import RECORD_DTYPE
+
+# Checkpoints of a running WarehouseModel.
+#
+#   snap = take_snapshot(model)                    # at tick N
+#   branch = restore(snap, dispatcher="hungarian")  # same warehouse from tick N, another policy
+#   branch = fork(model, num_robots=8)              # both in one go, two extra robots
+#   save_snapshot(snap, "tick_500.npz"); snap = load_snapshot("tick_500.npz")
+#
+# A snapshot is a handful of NumPy arrays (world state, package stacks, robot paths, trajectory,
+# KPI series, RNG) plus a small JSON-friendly dict (constructor arguments, counters, planner state).
+# The layout, its navigation cache and the recorded trajectory/KPI chunks are shared read-only
+# between a model and its forks; everything mutable is copied.
+
+# Restored models never write to the original run's output files unless asked to
+_DETACHED = {"paths_file": None, "trajectory_file": None, "collect_path": None, "event_sink": None}
+
+_COUNTERS = ("time_elapsed", "current_id", "running", "total_movements", "total_packages_stored",
+             "total_packages_delivered", "robots_carrying", "replans_performed", "replans_avoided",
+             "wait_ticks", "conflicts", "alternative_moves", "assignments", "assignment_cost",
+             "packages_delivered_in_phase", "delivering_to_load_truck")
+
+
+class Snapshot:
+    def __init__(self, meta, arrays, layout):
+        self.meta = meta
+        self.arrays = arrays
+        self.layout = layout
+
+    @property
+    def time_elapsed(self):
+        return self.meta["counters"]["time_elapsed"]
+
+    def __getstate__(self):
+        # Send the layout as plain data to worker processes, not its navigation cache
+        return {"meta": self.meta, "arrays": self.arrays, "layout": self.layout.to_dict()}
+
+    def __setstate__(self, state):
+        self.meta = state["meta"]
+        self.arrays = state["arrays"]
+        self.layout = Layout.from_dict(state["layout"], name=state["meta"]["layout_name"])
+
+
+def take_snapshot(model):
+    if model.parked or model.removed_robots:
+        raise ValueError("Snapshots need every robot of the run on the schedule (none parked or removed)")
+    robots = _robots(model)
+    world = model.world
+    params = {name: value for name, value in model.params.items() if name not in _DETACHED and name != "layout"}
+
+    paths = [robot.path for robot in robots]
+    path_offsets = np.zeros(len(robots) + 1, dtype=np.int64)
+    path_offsets[1:] = np.cumsum([len(path) for path in paths])
+    path_cells = np.array([cell for path in paths for cell in path], dtype=np.int32).reshape(-1, 2)
+
+    shelves = sorted(model.shelf_index.rank, key=lambda shelf: shelf.slot)
+    trucks = (model.unload_truck, model.load_truck)
+    rng_version, rng_internal, rng_gauss = model.random.getstate()
+    kpi_ticks, kpi_values = model.datacollector.arrays()
+
+    arrays = {
+        "robot_role": world.robot_role[:world.num_robots].copy(),
+        "robot_carrying": world.robot_carrying[:world.num_robots].copy(),
+        "robot_xy": np.array([robot.pos for robot in robots], dtype=np.int32).reshape(-1, 2),
+        "robot_heading": np.array([robot.heading for robot in robots], dtype=np.int8).reshape(-1, 2),
+        "robot_destination": np.array([robot.destination or (-1, -1) for robot in robots], dtype=np.int32).reshape(-1, 2),
+        "robot_stuck": np.array([robot.stuck_time for robot in robots], dtype=np.int32),
+        "robot_movements": np.array([robot.movements for robot in robots], dtype=np.int64),
+        "robot_delivered": np.array([robot.packages_delivered for robot in robots], dtype=np.int64),
+        "robot_plan_current": np.array([robot.plan_version == model.navigation.version for robot in robots]),
+        # Schedule (activation) order as indices into the robot arrays, which are in slot order
+        "schedule_order": np.array([robot.slot for robot in model.schedule.agents if isinstance(robot, Robot)],
+                                   dtype=np.int32),
+        "path_cells": path_cells,
+        "path_offsets": path_offsets,
+        "shelf_load": world.shelf_load[:world.num_shelves].copy(),
+        "shelf_packages": _stack_ids([shelf.packages for shelf in shelves]),
+        "truck_load": np.array([len(truck.packages) for truck in trucks], dtype=np.int32),
+        "truck_packages": _stack_ids([truck.packages for truck in trucks]),
+        "rng_state": np.array(rng_internal, dtype=np.uint32),
+        "trajectory": _read_only(model.trajectory.records()),
+        "kpi_ticks": _read_only(kpi_ticks),
+        "kpi_values": _read_only(kpi_values),
+    }
+    meta = {
+        "params": params,
+        "layout_name": model.layout.name,
+        "robot_ids": [robot.unique_id for robot in robots],
+        "counters": {name: getattr(model, name) for name in _COUNTERS},
+        "schedule": [model.schedule.steps, model.schedule.time],
+        "rng": [rng_version, rng_gauss],
+        "collector": [model.datacollector.calls, model.datacollector.collected],
+        "planner": model.planner.get_state(),
+        "dispatcher": model.dispatcher.get_state(),
+        "fast_forward": model.fast_forward.get_state() if model.fast_forward is not None else None,
+        "docks": model.docks.get_state(),
+        "workload": model.workload.get_state(),
+        "deadlocks": model.deadlocks.get_state() if model.deadlocks is not None else None,
+        "closed_cells": sorted(model.navigation.closed),
+    }
+    return Snapshot(meta, arrays, model.layout)
+
+
+def restore(snapshot, **overrides):
+    # New model in the snapshot's state. Overrides replace constructor arguments (planner,
+    # dispatcher, step_mode, max_time, phase_size, ...; not the dock model or workload); num_robots may only grow, new robots
+    # start idle on free spawn points; seed reseeds the RNG after the state is restored.
+    meta, arrays = snapshot.meta, snapshot.arrays
+    num_robots = len(meta["robot_ids"])
+    extra_robots = overrides.pop("num_robots", num_robots) - num_robots
+    if extra_robots < 0:
+        raise ValueError(f"Snapshot has {num_robots} robots, a restored model can only add robots")
+    seed = overrides.pop("seed", None)
+    for name in ("docks", "dock_options", "workload", "workload_options"):
+        if name in overrides and overrides[name] != meta["params"].get(name):
+            raise ValueError(f"A snapshot continues with the {name} it was taken with")
+    params = {**meta["params"], **_DETACHED, "layout": snapshot.layout, **overrides}
+    params["num_robots"] = num_robots
+    params["seed"] = None
+    model = WarehouseModel(**params)
+    robots = _robots(model)
+    if [robot.unique_id for robot in robots] != meta["robot_ids"]:
+        raise ValueError("Snapshot robots do not match the rebuilt model (different layout or initial packages?)")
+
+    counters = meta["counters"]
+    for name, value in counters.items():
+        setattr(model, name, value)
+    model.events.tick = model.time_elapsed
+    model.schedule.steps, model.schedule.time = meta["schedule"]
+    rng_version, rng_gauss = meta["rng"]
+    model.random.setstate((rng_version, tuple(arrays["rng_state"].tolist()), rng_gauss))
+
+    world = model.world
+    world.robot_role[:num_robots] = arrays["robot_role"]
+    world.robot_carrying[:num_robots] = arrays["robot_carrying"]
+    shelves = sorted(model.shelf_index.rank, key=lambda shelf: shelf.slot)
+    _load_stacks([shelf.packages for shelf in shelves], arrays["shelf_load"], arrays["shelf_packages"])
+    _load_stacks([model.unload_truck.packages, model.load_truck.packages], arrays["truck_load"], arrays["truck_packages"])
+    for shelf in shelves:
+        model.shelf_index.update(shelf)
+
+    if meta.get("closed_cells"):
+        model.navigation.set_blocked(meta["closed_cells"])
+    path_cells = [tuple(cell) for cell in arrays["path_cells"].tolist()]
+    offsets = arrays["path_offsets"].tolist()
+    for index, robot in enumerate(robots):
+        model.grid.move_agent(robot, tuple(arrays["robot_xy"][index].tolist()))
+        robot.heading = tuple(arrays["robot_heading"][index].tolist())
+        destination = tuple(arrays["robot_destination"][index].tolist())
+        robot.destination = None if destination == (-1, -1) else destination
+        robot.path = path_cells[offsets[index]:offsets[index + 1]]
+        robot.plan_version = model.navigation.version if arrays["robot_plan_current"][index] else None
+        robot.stuck_time = int(arrays["robot_stuck"][index])
+        robot.movements = int(arrays["robot_movements"][index])
+        robot.packages_delivered = int(arrays["robot_delivered"][index])
+
+    # Activation order: re-add the robots in the order the schedule had them
+    for robot in robots:
+        model.schedule.remove(robot)
+    for slot in arrays["schedule_order"].tolist():
+        model.schedule.add(robots[slot])
+
+    # Policy state only carries over to the same policy; a new one starts fresh and replans as needed
+    if params["planner"] == meta["params"]["planner"]:
+        model.planner.set_state(meta["planner"])
+    if params["dispatcher"] == meta["params"]["dispatcher"]:
+        model.dispatcher.set_state(meta["dispatcher"])
+    if model.fast_forward is not None and meta["fast_forward"] is not None:
+        model.fast_forward.set_state(meta["fast_forward"])
+    model.docks.set_state(meta["docks"])
+    model.workload.set_state(meta.get("workload", {}))
+    if model.deadlocks is not None and meta.get("deadlocks") is not None:
+        model.deadlocks.set_state(meta["deadlocks"])
+
+    # Recorded history is shared with the snapshot (or written to the new files); new rows go after it
+    model.trajectory.extend(arrays["trajectory"])
+    model.datacollector.extend(arrays["kpi_ticks"], arrays["kpi_values"])
+    model.datacollector.calls, model.datacollector.collected = meta["collector"]
+
+    free_spawns = [pos for pos in model.layout.robot_spawns if not model.occupancy.is_occupied(pos)]
+    if extra_robots > len(free_spawns):
+        raise ValueError(f"Only {len(free_spawns)} free spawn points for {extra_robots} extra robots")
+    for pos in free_spawns[:extra_robots]:
+        model.add_robot(pos, 'storage')
+
+    if seed is not None:
+        model.reset_randomizer(seed)
+    return model
+
+
+def fork(model, **overrides):
+    return restore(take_snapshot(model), **overrides)
+
+
+def save_snapshot(snapshot, path):
+    # One compressed .npz: the arrays as they are, meta and layout as a JSON string
+    meta = {**snapshot.meta, "layout": snapshot.layout.to_dict()}
+    np.savez_compressed(path, meta=np.array(json.dumps(meta)), **snapshot.arrays)
+
+
+def load_snapshot(path):
+    with np.load(path) as data:
+        meta = json.loads(data["meta"].item())
+        arrays = {name: _read_only(data[name]) for name in data.files if name != "meta"}
+    layout = Layout.from_dict(meta.pop("layout"), name=meta["layout_name"])
+    arrays["trajectory"] = _read_only(arrays["trajectory"].astype(RECORD_DTYPE, copy=False))
+    return Snapshot(meta, arrays, layout)
+
+
+def _robots(model):
+    # Robots in world slot order (creation order), independent of the schedule shuffle
+    return sorted((agent for agent in model.schedule.agents if isinstance(agent, Robot)), key=lambda robot: robot.slot)
+
+
+def _stack_ids(stacks):
+    ids = [list(stack) for stack in stacks]
+    return np.array([package for stack in ids for package in stack], dtype=np.int64)
+
+
+def _load_stacks(stacks, sizes, ids):
+    offset = 0
+    for stack, size in zip(stacks, sizes.tolist()):
+        stack.clear()
+        for package in ids[offset:offset + size].tolist():
+            stack.append(package)
+        offset += size
+
+
+def _read_only(array):
+    array = np.asarray(array)
+    if array.flags.writeable:
+        array = array.view()
+        array.flags.writeable = False
+    return array
@@ -0,0 +1,123 @@
+import numpy as np
+
+ROLES = ("storage", "loading")
+ROLE_CODES = {name: code for code, name in enumerate(ROLES)}
+NO_PACKAGE = -1
+
+
+class WorldState:
+    # Struct-of-arrays store for the mutable state of robots, shelves and trucks.
+    # Agents keep a slot index and read/write their fields here; packages are plain
+    # integer ids (taken from model.next_id, so they are never 0).
+
+    def __init__(self, capacity=16):
+        self.num_robots = 0
+        self.robot_id = np.zeros(capacity, dtype=np.int32)
+        self.robot_xy = np.full((capacity, 2), -1, dtype=np.int32)
+        self.robot_role = np.zeros(capacity, dtype=np.uint8)
+        self.robot_carrying = np.full(capacity, NO_PACKAGE, dtype=np.int64)
+
+        self.num_shelves = 0
+        self.shelf_load = np.zeros(capacity, dtype=np.int32)
+        self.shelf_capacity = np.zeros(capacity, dtype=np.int32)
+
+        self.num_trucks = 0
+        self.truck_load = np.zeros(capacity, dtype=np.int32)
+
+    def add_robot(self, unique_id, role):
+        slot = self.num_robots
+        if slot == len(self.robot_id):
+            self.robot_id = _grow(self.robot_id)
+            self.robot_xy = _grow(self.robot_xy, fill=-1)
+            self.robot_role = _grow(self.robot_role)
+            self.robot_carrying = _grow(self.robot_carrying, fill=NO_PACKAGE)
+        self.robot_id[slot] = unique_id
+        self.robot_role[slot] = ROLE_CODES[role]
+        self.num_robots += 1
+        return slot
+
+    def remove_robot(self, slot):
+        # Frees a robot slot by moving the last robot into it; returns the slot that robot had
+        last = self.num_robots - 1
+        for array in (self.robot_id, self.robot_xy, self.robot_role, self.robot_carrying):
+            array[slot] = array[last]
+        self.robot_xy[last] = -1
+        self.robot_carrying[last] = NO_PACKAGE
+        self.num_robots -= 1
+        return last
+
+    def add_shelf(self, capacity):
+        slot = self.num_shelves
+        if slot == len(self.shelf_load):
+            self.shelf_load = _grow(self.shelf_load)
+            self.shelf_capacity = _grow(self.shelf_capacity)
+        self.shelf_capacity[slot] = capacity
+        self.num_shelves += 1
+        return slot
+
+    def add_truck(self):
+        slot = self.num_trucks
+        if slot == len(self.truck_load):
+            self.truck_load = _grow(self.truck_load)
+        self.num_trucks += 1
+        return slot
+
+    # Vectorized aggregates over the live slots
+
+    def robots_carrying(self):
+        return int(np.count_nonzero(self.robot_carrying[:self.num_robots] != NO_PACKAGE))
+
+    def packages_stored(self):
+        return int(self.shelf_load[:self.num_shelves].sum())
+
+    def shelves_with_capacity(self):
+        return np.flatnonzero(self.shelf_load[:self.num_shelves] < self.shelf_capacity[:self.num_shelves])
+
+    def shelves_with_packages(self):
+        return np.flatnonzero(self.shelf_load[:self.num_shelves] > 0)
+
+    def robot_positions(self):
+        return self.robot_xy[:self.num_robots]
+
+
+class PackageStack:
+    # List-like stack of package ids backed by a NumPy array. Its size lives in
+    # state.<field>[slot] so loads can be aggregated without touching the agents.
+
+    def __init__(self, state, field, slot, capacity=16):
+        self.state = state
+        self.field = field
+        self.slot = slot
+        self.ids = np.zeros(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return int(getattr(self.state, self.field)[self.slot])
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        return iter(self.ids[:len(self)].tolist())
+
+    def append(self, package_id):
+        size = len(self)
+        if size == len(self.ids):
+            self.ids = _grow(self.ids)
+        self.ids[size] = package_id
+        getattr(self.state, self.field)[self.slot] = size + 1
+
+    def clear(self):
+        getattr(self.state, self.field)[self.slot] = 0
+
+    def pop(self):
+        size = len(self)
+        if not size:
+            raise IndexError("pop from empty package stack")
+        getattr(self.state, self.field)[self.slot] = size - 1
+        return int(self.ids[size - 1])
+
+
+def _grow(array, fill=0):
+    grown = np.full((max(1, len(array)) * 2,) + array.shape[1:], fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
@@ -0,0 +1,257 @@
+import logging
+
+from agent import Robot
+from events import TASK
+
+STEP_MODES = ("tick", "event")
+
+
+class FastForward:
+    # Discrete-event stepping. While every robot is only following its plan (nothing to pick up
+    # or deliver, no phase switch, replan or possible conflict coming up) the dispatcher, the
+    # clearance table and the agent steps would not change anything, so the next ticks are applied
+    # as whole path segments: robots move once on the grid at the end of the jump. Skipped ticks
+    # still shuffle the schedule, record moves in activation order and collect KPIs, so counters,
+    # trajectory and RNG state are the same as stepping tick by tick.
+    # A whole tick can only be skipped while every robot is steady. Between jumps each robot also has
+    # its own next event: after the dispatcher hands a robot a plan, follow() works out the last tick
+    # through which the dispatcher would keep that plan (the robot cannot reach its destination
+    # earlier, the plan does not expire); until then steady() leaves the robot out of the dispatcher,
+    # so busy robots elsewhere no longer make every robot pay for a full dispatch. A window closes
+    # early when the robot's plan is replaced (side step, queue yield, deadlock yield), when it gets
+    # stuck under a planner that replans stuck robots, when a carrying robot's dispatcher would pick
+    # another stop from where it stands, or when something every robot depends on changes (static
+    # layout, unload truck emptied or refilled, delivery phase).
+
+    def __init__(self, model, min_ticks=2, max_backoff=16):
+        self.model = model
+        self.min_ticks = min_ticks
+        self.max_backoff = max_backoff
+        self.backoff = 1
+        self.next_attempt = 0
+        self.jumps = 0
+        self.ticks_skipped = 0
+        self.windows = {}  # robot -> (last tick its plan is known to stay, the path it follows)
+        self.stamp = None
+        self.dispatches_skipped = 0
+
+    def advance(self):
+        # Busy stretches (robots blocking each other, pickups and deliveries every few ticks) rarely
+        # allow a jump, so failed attempts back off for a few ticks before trying again
+        if self.model.time_elapsed < self.next_attempt:
+            return 0
+        robots = [agent for agent in self.model.schedule.agents if isinstance(agent, Robot)]
+        horizon, outcomes = self.horizon(robots)
+        if horizon < self.min_ticks:
+            self.next_attempt = self.model.time_elapsed + self.backoff
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            return 0
+        self.apply(outcomes, horizon)
+        self.backoff = 1
+        self.jumps += 1
+        self.ticks_skipped += horizon
+        return horizon
+
+    def get_state(self):
+        return {"backoff": self.backoff, "next_attempt": self.next_attempt,
+                "jumps": self.jumps, "ticks_skipped": self.ticks_skipped, "dispatches_skipped": self.dispatches_skipped}
+
+    def set_state(self, state):
+        self.backoff = state["backoff"]
+        self.next_attempt = state["next_attempt"]
+        self.jumps = state["jumps"]
+        self.ticks_skipped = state["ticks_skipped"]
+        self.dispatches_skipped = state.get("dispatches_skipped", 0)
+
+    def steady(self, robots):
+        # Robots whose dispatch this tick would keep their plan
+        model = self.model
+        stamp = self.inputs()
+        if stamp != self.stamp or model.packages_delivered_in_phase >= model.phase_size:
+            # The first carrying robot dispatched toggles the delivery phase
+            self.windows = {}
+            return set()
+        tick = model.time_elapsed
+        replans_stuck = not model.planner.keeps_plans_when_stuck
+        keeps_destination = model.dispatcher.keeps_destination
+        steady = set()
+        for robot in robots:
+            window = self.windows.get(robot)
+            if window is None:
+                continue
+            until, path = window
+            if (tick > until or robot.path is not path or robot.pos == robot.destination
+                    or robot.stuck_time and replans_stuck
+                    or robot.carrying_package is not None and not keeps_destination(robot, robot.pos)):
+                del self.windows[robot]
+                continue
+            steady.add(robot)
+        self.dispatches_skipped += len(steady)
+        return steady
+
+    def follow(self, robots, steady):
+        # After the dispatch: open a window for every robot that was dispatched and keeps a steady plan
+        model = self.model
+        self.stamp = self.inputs()
+        if model.events.is_enabled(TASK, logging.DEBUG):
+            return  # dispatch messages are logged every tick
+        tick = model.time_elapsed
+        for robot in robots:
+            if robot in steady:
+                continue
+            self.windows.pop(robot, None)
+            if robot.carrying_package is None and (model.workload.orders is not None
+                                                   or not model.unload_truck.packages):
+                continue  # open orders and idle tasks are handed out tick by tick
+            if robot.destination is None or model.docks.manages(robot, robot.destination):
+                continue
+            ticks = self.steady_ticks(robot, tick, len(robot.path))
+            if ticks > 1:
+                self.windows[robot] = (tick + ticks - 1, robot.path)
+
+    def inputs(self):
+        # What every robot's dispatch depends on besides its own plan
+        model = self.model
+        return model.navigation.version, bool(model.unload_truck.packages), model.delivering_to_load_truck
+
+    def horizon(self, robots):
+        # (ticks, outcomes): how many upcoming ticks can be skipped and what every robot does in them
+        model = self.model
+        start = model.time_elapsed
+        limit = model.max_time - start - 1
+        if limit < self.min_ticks or model.packages_delivered_in_phase >= model.phase_size:
+            return 0, None
+        if not model.unload_truck.packages and any(robot.carrying_package is None for robot in robots):
+            return 0, None  # idle robots wander randomly
+        dock_event = model.docks.next_event(start)
+        if dock_event is not None:
+            limit = min(limit, dock_event - start - 1)
+            if limit < self.min_ticks:
+                return 0, None  # truck arrivals, departures or dock queues to serve
+        workload_event = model.workload.next_event(start)
+        if workload_event is not None:
+            limit = min(limit, workload_event - start - 1)
+            if limit < self.min_ticks:
+                return 0, None  # packages or orders arriving
+        for robot in robots:
+            limit = min(limit, self.steady_ticks(robot, start, limit))
+            if limit < self.min_ticks:
+                return 0, None
+        return self.simulate(robots, limit)
+
+    def steady_ticks(self, robot, start, limit):
+        # Ticks for which the robot keeps its current plan
+        model = self.model
+        if (robot.destination is None or robot.pos == robot.destination
+                or robot.plan_version != model.navigation.version or not model.is_plan_valid(robot)
+                or not model.planner.is_current(robot)):
+            return 0
+        # Robots act as soon as they stand on their destination, even mid-path (cooperative detours)
+        ticks = min(limit, robot.path.index(robot.destination) + 1)
+        expires = model.planner.current_until(robot)
+        if expires is not None:
+            ticks = min(ticks, expires - start - 1)
+        if robot.carrying_package is None and robot.destination != model.unload_for_agent:
+            return 0
+        return ticks
+
+    def simulate(self, robots, limit):
+        # Replays move_along_path tick by tick on plain positions. Stops before the first tick whose
+        # result would depend on the activation order (two robots entering the same cell, a robot
+        # entering a cell vacated during the tick), where a robot would step aside after being stuck
+        # too long, or where the dispatcher or the planner would hand out a new plan.
+        model = self.model
+        pos = {robot: robot.pos for robot in robots}
+        consumed = {robot: 0 for robot in robots}
+        stuck = {robot: robot.stuck_time for robot in robots}
+        outcomes = {robot: [] for robot in robots}
+        keeps = {}
+        parked = {robot.pos: robot for robot in model.parked}  # never move, block like a waiting robot
+        for tick in range(limit):
+            occupied = {**parked, **{cell: robot for robot, cell in pos.items()}}
+            movers = {}
+            blocked = []
+            for robot in robots:
+                if stuck[robot] and not model.planner.keeps_plans_when_stuck:
+                    return tick, outcomes
+                if robot.carrying_package is not None:
+                    # The dispatcher re-checks carrying robots every tick from where they stand
+                    key = (robot, pos[robot])
+                    if key not in keeps:
+                        keeps[key] = model.dispatcher.keeps_destination(robot, pos[robot])
+                    if not keeps[key]:
+                        return tick, outcomes
+                next_pos = robot.path[consumed[robot]]
+                if next_pos == pos[robot]:
+                    continue
+                if next_pos in occupied:
+                    blocked.append((robot, occupied[next_pos]))
+                elif next_pos in movers:
+                    return tick, outcomes
+                else:
+                    movers[next_pos] = robot
+            moving = set(movers.values())
+            waiting = {robot for robot, _ in blocked} if model.deadlocks is not None else ()
+            for robot, holder in blocked:
+                if holder in moving or stuck[robot] + 1 > 5:
+                    return tick, outcomes
+                if holder in waiting:
+                    return tick, outcomes  # a wait-for chain, possibly a cycle the deadlock detector has to see
+            for robot in robots:
+                if robot in moving:
+                    pos[robot] = robot.path[consumed[robot]]
+                    consumed[robot] += 1
+                    stuck[robot] = 0
+                    outcomes[robot].append(("move", pos[robot]))
+                elif robot.path[consumed[robot]] == pos[robot]:
+                    consumed[robot] += 1
+                    outcomes[robot].append(("wait", pos[robot]))
+                else:
+                    stuck[robot] += 1
+                    outcomes[robot].append(("blocked", pos[robot]))
+        return limit, outcomes
+
+    def apply(self, outcomes, horizon):
+        model = self.model
+        for tick in range(horizon):
+            model.time_elapsed += 1
+            model.events.tick = model.time_elapsed
+            # Every robot's plan_route() would have kept its plan
+            model.replans_avoided += len(outcomes)
+            # The same call RandomActivation.step makes: same draws and activation order
+            model.schedule.do_each(lambda agent: self.replay(agent, outcomes, tick), shuffle=True)
+            model.schedule.steps += 1
+            model.schedule.time += 1
+            model.datacollector.collect(model)
+
+        # Robots reach the end of their segment in one grid move
+        for robot, robot_outcomes in outcomes.items():
+            previous, heading = robot.pos, None
+            for action, cell in robot_outcomes[:horizon]:
+                if action == "move":
+                    heading = (cell[0] - previous[0], cell[1] - previous[1])
+                    robot.stuck_time = 0
+                elif action == "blocked":
+                    robot.stuck_time += 1
+                if action != "blocked":
+                    robot.path.pop(0)
+                previous = cell
+            if heading is not None:
+                model.grid.move_agent(robot, previous)
+                robot.heading = heading
+
+    def replay(self, agent, outcomes, tick):
+        # One robot's part of a skipped tick, in activation order
+        robot_outcomes = outcomes.get(agent)
+        if robot_outcomes is None:
+            return
+        model = self.model
+        action, cell = robot_outcomes[tick]
+        if action == "move":
+            agent.record_action(cell, "move")
+            agent.movements += 1
+            model.total_movements += 1
+            return
+        model.wait_ticks += 1
+        if action == "blocked":
+            model.conflicts += 1
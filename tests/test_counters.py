@@ -0,0 +1,36 @@
+import pytest
+
+from agent import Robot
+from model import WarehouseModel
+
+CASES = [
+    dict(),
+    dict(step_mode="event"),
+    dict(movement="sync", deadlock_policy="yield"),
+    dict(docks="queued", workload="poisson", workload_options={"order_rate": 0.1}),
+]
+
+
+def recount(model):
+    # The baseline's per-step aggregation over the agents (shelves are no longer on the schedule)
+    robots = [agent for agent in model.schedule.agents if isinstance(agent, Robot)]
+    return {
+        "total_packages_stored": sum(len(shelf.packages) for shelf in model.shelf_index.rank),
+        "total_movements": sum(robot.movements for robot in robots),
+        "total_packages_delivered": sum(robot.packages_delivered for robot in robots),
+        "robots_carrying": sum(robot.carrying_package is not None for robot in robots),
+    }
+
+
+@pytest.mark.parametrize("options", CASES)
+def test_incremental_counters_match_a_recount(options):
+    model = WarehouseModel(width=18, height=12, num_robots=6, initial_packages=80, max_time=400, k=1, seed=4,
+                           paths_file=None, log_level=None, **options)
+    while model.running:
+        model.step()
+        for name, value in recount(model).items():
+            assert getattr(model, name) == value, name
+        unload, load, stored, movements, delivered = model.kpi_row()
+        assert (unload, load) == (len(model.unload_truck.packages), len(model.load_truck.packages))
+        assert (stored, movements, delivered) == (model.total_packages_stored, model.total_movements,
+                                                   model.total_packages_delivered)
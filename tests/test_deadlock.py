@@ -0,0 +1,125 @@
+import pytest
+
+from agent import Robot
+from deadlock import DeadlockDetector, make_deadlock_detector
+from model import WarehouseModel
+
+
+def make_model(**options):
+    params = dict(width=18, height=12, num_robots=6, initial_packages=80, max_time=300, k=1, seed=5)
+    params.update(options)
+    return WarehouseModel(paths_file=None, log_level=None, **params)
+
+
+def free(model, cell):
+    return (model.navigation.in_bounds(cell) and not model.navigation.is_blocked(cell)
+            and not model.occupancy.is_occupied(cell))
+
+
+def head_on(model):
+    # Two robots facing each other on free cells, each wanting the other's cell; the first one has a free
+    # neighbour off their shared row to step onto
+    robots = [agent for agent in model.schedule.agents if isinstance(agent, Robot)][:2]
+    for x in range(1, model.grid.width - 2):
+        for y in range(1, model.grid.height - 1):
+            a, b = (x, y), (x + 1, y)
+            if free(model, a) and free(model, b) and (free(model, (x, y + 1)) or free(model, (x, y - 1))):
+                model.grid.move_agent(robots[0], a)
+                model.grid.move_agent(robots[1], b)
+                robots[0].path, robots[0].destination = [b], b
+                robots[1].path, robots[1].destination = [a], a
+                return robots
+    raise AssertionError("no free pair of cells")
+
+
+def test_head_on_swap_is_a_cycle():
+    model = make_model()
+    detector = DeadlockDetector(model, resolve=False)
+    first, second = head_on(model)
+    detector.wait(first)
+    detector.wait(second)
+    assert [set(cycle) for cycle in detector.cycles()] == [{first, second}]
+    detector.resolve()
+    assert (detector.deadlocks, detector.head_on_swaps, detector.deadlock_ticks) == (1, 1, 2)
+    assert not detector.waiting
+
+
+def test_a_chain_is_not_a_cycle():
+    model = make_model()
+    detector = DeadlockDetector(model, resolve=False)
+    first, second = head_on(model)
+    second.path = []  # parked: the first robot waits for it, but it waits for nobody
+    detector.wait(first)
+    assert detector.cycles() == []
+    detector.resolve()
+    assert detector.deadlocks == 0
+
+
+def test_detect_counts_a_lasting_deadlock_once():
+    model = make_model()
+    detector = make_deadlock_detector("detect", model)
+    first, second = head_on(model)
+    positions = (first.pos, second.pos)
+    for tick in range(3):
+        model.time_elapsed = tick
+        detector.wait(first)
+        detector.wait(second)
+        detector.resolve()
+    assert (first.pos, second.pos) == positions
+    assert (detector.deadlocks, detector.deadlock_ticks, detector.deadlock_max_duration) == (1, 6, 3)
+    assert detector.yields == 0 and len(detector.active) == 1
+
+
+def test_yield_moves_the_lowest_priority_robot_aside():
+    model = make_model()
+    detector = make_deadlock_detector("yield", model)
+    first, second = head_on(model)
+    second.stuck_time = 3
+    assert detector.priority(first) < detector.priority(second)
+    cell, other = first.pos, second.pos
+    movements = model.total_movements
+    detector.wait(first)
+    detector.wait(second)
+    detector.resolve()
+    assert second.pos == other and first.pos not in (cell, other)
+    assert abs(first.pos[0] - cell[0]) + abs(first.pos[1] - cell[1]) == 1
+    assert first.stuck_time == 0 and model.total_movements == movements + 1
+    assert (detector.deadlocks, detector.yields, detector.unresolved) == (1, 1, 0)
+    assert not detector.active
+
+
+def test_state_round_trip():
+    model = make_model()
+    detector = make_deadlock_detector("detect", model)
+    first, second = head_on(model)
+    detector.wait(first)
+    detector.wait(second)
+    detector.resolve()
+    for _ in range(3):
+        detector.side_step(first)
+    assert detector.livelocked(first) and detector.livelocks == 1
+    state = detector.get_state()
+    restored = make_deadlock_detector("detect", model)
+    restored.set_state(state)
+    assert restored.metrics() == detector.metrics()
+    assert restored.active == detector.active
+    assert restored.livelocked(first) and not restored.livelocked(second)
+
+
+def test_policy_names():
+    model = make_model()
+    assert make_deadlock_detector("off", model) is None
+    with pytest.raises(ValueError):
+        make_deadlock_detector("retry", model)
+
+
+def test_yield_run_keeps_the_raster_consistent():
+    model = make_model(movement="sync", deadlock_policy="yield", num_robots=7, debug=True)
+    while model.running:
+        model.step()
+    metrics = model.deadlocks.metrics()
+    # debug=True checks the raster against the grid every tick, so the yields moved robots consistently
+    assert metrics["deadlocks"] > 0
+    # Every cycle was broken the tick it appeared
+    assert metrics["unresolved"] == 0
+    assert metrics["yields"] == metrics["deadlocks"] and metrics["deadlock_max_duration"] == 1
@@ -0,0 +1,64 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from agent import Robot
+from dispatch import solve_assignment
+from model import WarehouseModel
+
+
+def brute_force(cost):
+    rows, columns = cost.shape
+    return min(sum(cost[row, col] for row, col in enumerate(cols))
+               for cols in itertools.permutations(range(columns), rows))
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (3, 3), (4, 6), (5, 5), (2, 7)])
+def test_solve_assignment_matches_brute_force(shape):
+    rng = np.random.default_rng(sum(shape))
+    for _ in range(40):
+        cost = rng.integers(0, 20, size=shape)
+        assignment = solve_assignment(cost)
+        assert len(set(assignment)) == shape[0]
+        assert sum(cost[row, col] for row, col in enumerate(assignment)) == brute_force(cost)
+
+
+def test_solve_assignment_needs_enough_columns():
+    with pytest.raises(ValueError):
+        solve_assignment(np.zeros((3, 2)))
+
+
+def make_model(**options):
+    params = dict(width=18, height=12, num_robots=6, initial_packages=80, max_time=800, k=1, seed=5,
+                  dispatcher="hungarian", docks="queued", dock_options={"slots": 3})
+    params.update(options)
+    return WarehouseModel(paths_file=None, log_level=None, **params)
+
+
+def test_idle_robots_are_matched_to_dock_slots():
+    model = make_model()
+    robots = [agent for agent in model.schedule.agents if isinstance(agent, Robot)]
+    slots = model.docks.free_slots(model.unload_for_agent)
+    distance = model.navigation.distance
+    best = min(sum(distance(robot.pos, slot) for robot, slot in zip(chosen, order))
+               for chosen in itertools.combinations(robots, len(slots))
+               for order in itertools.permutations(slots))
+
+    model.docks.update()
+    model.dispatcher.assign(robots)
+    serving = model.docks.unload.serving
+    assert len(serving) == len(slots)
+    assert sum(distance(robot.pos, slot) for robot, (slot, _) in serving.items()) == best
+    assert all(robot.destination == serving[robot][0] for robot in serving)
+    # The rest queue at the dock
+    assert {queued for _, _, queued in model.docks.unload.queue} == set(robots) - set(serving)
+
+
+def test_dock_batches_keep_the_run_consistent():
+    model = make_model(layout="aisles:30x20", num_robots=16, initial_packages=100, workload="poisson",
+                       workload_options={"order_rate": 0.1}, debug=True)
+    while model.running:
+        model.step()
+    assert model.dispatcher.batches > 0
+    assert model.total_packages_delivered > 0
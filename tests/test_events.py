@@ -0,0 +1,65 @@
+import json
+import logging
+
+from events import CATEGORIES, MOVEMENT, SIMULATION, STATUS, TASK, EventBuffer, EventLog
+from model import WarehouseModel
+
+
+class Unformattable:
+    # Fails the test if a message argument is ever formatted
+    def __str__(self):
+        raise AssertionError("disabled message was formatted")
+
+    __repr__ = __str__
+
+
+def test_thresholds_gate_each_category():
+    sink = EventBuffer()
+    events = EventLog(logging.WARNING, category_levels={TASK: logging.DEBUG, STATUS: None}, sink=sink)
+    assert events.is_enabled(TASK, logging.DEBUG)
+    assert not events.is_enabled(MOVEMENT, logging.INFO) and events.is_enabled(MOVEMENT, logging.WARNING)
+    assert not events.is_enabled(STATUS, logging.CRITICAL)
+
+    events.debug(TASK, "task %s", 1)
+    events.info(MOVEMENT, "dropped %s", Unformattable())
+    events.warning(MOVEMENT, "kept %s", 2)
+    events.warning(STATUS, "dropped %s", Unformattable())
+    assert [(record["category"], record["message"]) for record in sink.to_dicts()] == [(TASK, "task 1"), (MOVEMENT, "kept 2")]
+
+
+def test_set_level_and_disable():
+    events = EventLog(logging.INFO)
+    events.set_level(logging.DEBUG, MOVEMENT)
+    assert events.is_enabled(MOVEMENT, logging.DEBUG) and not events.is_enabled(TASK, logging.DEBUG)
+    events.disable()
+    assert not any(events.is_enabled(category, logging.CRITICAL) for category in CATEGORIES)
+
+
+def test_buffer_writes_ndjson_with_fields(tmp_path):
+    path = tmp_path / "events.ndjson"
+    sink = EventBuffer(str(path), buffer_size=2)
+    events = EventLog(logging.INFO, sink=sink)
+    events.tick = 7
+    events.info(TASK, "Robot %s picked up", 3, robot=3, action="pickup")
+    events.info(SIMULATION, "done")
+    assert sink.written == 2 and not sink.records
+    events.info(SIMULATION, "tail")
+    events.close()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines[0] == {"tick": 7, "category": TASK, "level": "INFO", "message": "Robot 3 picked up",
+                        "robot": 3, "action": "pickup"}
+    assert [line["message"] for line in lines] == ["Robot 3 picked up", "done", "tail"]
+
+
+def test_headless_model_logs_nothing():
+    sink = EventBuffer()
+    model = WarehouseModel(width=18, height=12, num_robots=5, initial_packages=40, max_time=200, k=1, seed=2,
+                           paths_file=None, log_level=None, event_sink=sink)
+    while model.running:
+        model.step()
+    assert not sink.records
+    model = WarehouseModel(width=18, height=12, num_robots=5, initial_packages=40, max_time=200, k=1, seed=2,
+                           paths_file=None, log_level=None, log_levels={TASK: logging.INFO}, event_sink=sink)
+    while model.running:
+        model.step()
+    assert sink.records and {category for _, category, *_ in sink.records} == {TASK}
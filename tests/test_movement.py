@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from movement import MovementKernel
+from occupancy import OccupancyRaster
+
+
+def make_kernel(positions, width=4, height=4, obstacles=()):
+    # Stub model: only what MovementKernel.winners reads
+    occupancy = OccupancyRaster(width, height)
+    for pos in positions:
+        occupancy.move(None, pos)
+    blocked = np.zeros((width, height), dtype=bool)
+    for cell in obstacles:
+        blocked[cell] = True
+    model = SimpleNamespace(occupancy=occupancy, navigation=SimpleNamespace(blocked=blocked),
+                            world=SimpleNamespace(robot_xy=np.array(positions, dtype=np.int32)))
+    return MovementKernel(model)
+
+
+def winners(positions, proposals, **kwargs):
+    # proposals: (slot, target) in activation order
+    kernel = make_kernel(positions, **kwargs)
+    robots = [SimpleNamespace(slot=slot) for slot, _ in proposals]
+    return kernel.winners(robots, [target for _, target in proposals]).tolist()
+
+
+def test_chain_follows_its_leader_in_any_order():
+    positions = [(0, 0), (1, 0), (2, 0)]
+    forward = [(0, (1, 0)), (1, (2, 0)), (2, (3, 0))]
+    assert winners(positions, forward) == [True, True, True]
+    assert winners(positions, forward[::-1]) == [True, True, True]
+
+
+def test_chain_stays_behind_a_blocked_leader():
+    positions = [(0, 0), (1, 0), (2, 0)]
+    proposals = [(0, (1, 0)), (1, (2, 0)), (2, (3, 0))]
+    assert winners(positions, proposals, obstacles=[(3, 0)]) == [False, False, False]
+
+
+def test_rotation_moves_together():
+    positions = [(0, 0), (1, 0), (1, 1), (0, 1)]
+    proposals = [(0, (1, 0)), (1, (1, 1)), (2, (0, 1)), (3, (0, 0))]
+    assert winners(positions, proposals) == [True, True, True, True]
+
+
+def test_swap_is_blocked():
+    positions = [(0, 0), (1, 0)]
+    assert winners(positions, [(0, (1, 0)), (1, (0, 0))]) == [False, False]
+
+
+def test_swap_does_not_block_the_rest_of_a_chain():
+    # 0 and 1 trade cells; 2 follows 3 into a free cell
+    positions = [(0, 0), (1, 0), (0, 2), (1, 2)]
+    proposals = [(0, (1, 0)), (1, (0, 0)), (2, (1, 2)), (3, (2, 2))]
+    assert winners(positions, proposals) == [False, False, True, True]
+
+
+def test_first_proposal_wins_a_contested_cell():
+    positions = [(0, 1), (2, 1)]
+    assert winners(positions, [(1, (1, 1)), (0, (1, 1))]) == [True, False]
+
+
+def test_staying_robot_blocks_its_cell():
+    positions = [(0, 0), (1, 0)]
+    assert winners(positions, [(0, (1, 0))]) == [False]
+
+
+def test_grid_edge_and_obstacles_block():
+    positions = [(0, 0), (3, 3)]
+    assert winners(positions, [(0, (-1, 0)), (1, (3, 2))], obstacles=[(3, 2)]) == [False, False]
+
+
+def test_out_of_bounds_move_does_not_claim_a_cell():
+    # An off-grid target must not be mistaken for cell (0, 0) or for a swap with its robot
+    positions = [(1, 0), (0, 0)]
+    assert winners(positions, [(0, (1, -1)), (1, (1, 0))]) == [False, False]
+    assert winners([(0, 1), (3, 3)], [(1, (4, 3)), (0, (0, 0))]) == [False, True]
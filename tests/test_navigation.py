@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+
+from agent import Robot
+from fields import bfs_field
+from model import WarehouseModel
+from snapshot import restore, take_snapshot
+
+
+def make_model(**options):
+    params = dict(width=18, height=12, num_robots=6, initial_packages=80, max_time=300, k=1, seed=5)
+    params.update(options)
+    return WarehouseModel(paths_file=None, log_level=None, **params)
+
+
+def open_cells(navigation):
+    return [tuple(cell) for cell in np.argwhere(~navigation.blocked).tolist()]
+
+
+def test_set_blocked_matches_a_full_rebuild():
+    model = make_model(layout="aisles:30x20")
+    navigation = model.navigation
+    goals = [model.unload_for_agent, model.load_for_agent, *list(model.shelf_to_stop)[:6]]
+    for goal in goals:
+        navigation.fields.lookup(goal)
+    original = {goal: navigation.fields.field(goal).copy() for goal in goals}
+    rng = random.Random(1)
+    cells = rng.sample([cell for cell in open_cells(navigation) if cell not in goals], 12)
+    version = navigation.version
+
+    navigation.set_blocked(cells)
+    assert navigation.version == version + 1
+    assert all(navigation.is_blocked(cell) for cell in cells)
+    for goal in goals:
+        assert np.array_equal(navigation.fields.field(goal), bfs_field(~navigation.blocked, goal))
+    expected = {pos: tuple(near for near in model.grid.get_neighborhood(pos, moore=False, include_center=False)
+                           if not navigation.blocked[near])
+                for pos in navigation.neighbors}
+    assert navigation.neighbors == expected
+    start = open_cells(navigation)[0]
+    path = navigation.shortest_path(start, goals[0])
+    assert path is None or not any(navigation.is_blocked(cell) for cell in path)
+
+    navigation.set_blocked(cells, blocked=False)
+    for goal in goals:
+        assert np.array_equal(navigation.fields.field(goal), original[goal])
+
+
+def test_closing_cells_leaves_other_models_on_the_layout_alone():
+    model = make_model(layout="aisles:30x20")
+    other = make_model(layout=model.layout)
+    cell = open_cells(model.navigation)[5]
+    model.navigation.set_blocked([cell])
+    assert model.navigation.is_blocked(cell)
+    assert not other.navigation.is_blocked(cell)
+
+
+def test_robots_route_around_cells_closed_mid_run():
+    model = make_model(debug=True)
+    while model.time_elapsed < 40:
+        model.step()
+    occupied = {agent.pos for agent in model.schedule.agents}
+    closed = [cell for cell in open_cells(model.navigation)
+              if cell not in occupied and cell not in (model.unload_for_agent, model.load_for_agent)
+              and cell not in model.shelf_to_stop][:4]
+    model.navigation.set_blocked(closed)
+    fork = restore(take_snapshot(model))
+    assert fork.navigation.closed == set(closed)
+    while model.running:
+        model.step()
+        assert not any(robot.pos in closed for robot in model.schedule.agents if isinstance(robot, Robot))
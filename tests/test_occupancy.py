@@ -0,0 +1,44 @@
+import numpy as np
+
+from agent import Robot
+from model import WarehouseModel
+from occupancy import HEADING_INDEX, OccupancyRaster
+
+
+def live_scan(model, pos, heading):
+    # The baseline's scan: free cells ahead until the grid edge or a robot, at most 5
+    for distance in range(1, 6):
+        cell = (pos[0] + heading[0] * distance, pos[1] + heading[1] * distance)
+        if model.grid.out_of_bounds(cell) or model.occupancy.is_occupied(cell):
+            return distance - 1
+    return 5
+
+
+def test_clearance_row_is_rescanned_after_a_move():
+    raster = OccupancyRaster(10, 3)
+    for pos in ((0, 1), (4, 1)):
+        raster.move(None, pos)
+    raster.update_clearance(np.array([(0, 1), (4, 1)]))
+    east = HEADING_INDEX[(1, 0)]
+    assert raster.clearance_of(0, (0, 1), east) == 3
+    raster.move((4, 1), (2, 1))
+    assert raster.clearance_of(0, (0, 1), east) == 1
+    assert raster.clearance_of(1, (2, 1), east) == 5
+
+
+def test_robots_read_live_clearance(monkeypatch):
+    checked = []
+    read = Robot.calculate_obstacle_free_distance
+
+    def checked_read(robot):
+        value = read(robot)
+        assert value == live_scan(robot.model, robot.pos, robot.current_heading())
+        checked.append(value)
+        return value
+
+    monkeypatch.setattr(Robot, "calculate_obstacle_free_distance", checked_read)
+    model = WarehouseModel(width=18, height=12, num_robots=7, initial_packages=60, max_time=150, k=1, seed=3,
+                           paths_file=None, log_level=None)
+    while model.running:
+        model.step()
+    assert len(checked) > 100
@@ -0,0 +1,56 @@
+from agent import Robot
+from model import WarehouseModel
+
+
+def make_model(**options):
+    params = dict(width=18, height=12, num_robots=6, initial_packages=80, max_time=300, k=1, seed=5,
+                  planner="cooperative")
+    params.update(options)
+    return WarehouseModel(paths_file=None, log_level=None, **params)
+
+
+def timeline(start, path, ticks):
+    # Cell at each tick from start_tick - 1 on; the robot stays on its last cell
+    cells = [start] + list(path)
+    return [cells[min(tick, len(cells) - 1)] for tick in range(ticks)]
+
+
+def test_cooperative_plans_share_no_cell_and_never_swap():
+    model = make_model()
+    planner = model.planner
+    robots = [agent for agent in model.schedule.agents if isinstance(agent, Robot)][:3]
+    goals = [model.unload_for_agent, model.unload_for_agent, robots[0].pos]
+    plans = [timeline(robot.pos, planner.plan(robot, goal, 1), planner.window) for robot, goal in zip(robots, goals)]
+    assert planner.planned_waits > 0  # somebody had to wait for the others
+    for tick in range(planner.window):
+        cells = [plan[tick] for plan in plans]
+        assert len(set(cells)) == len(cells)
+        if tick:
+            moves = {(plan[tick - 1], plan[tick]) for plan in plans}
+            assert not any((after, before) in moves for before, after in moves if before != after)
+
+
+def test_reservations_follow_the_plan_and_are_released():
+    model = make_model()
+    planner = model.planner
+    robot = next(agent for agent in model.schedule.agents if isinstance(agent, Robot))
+    path = planner.plan(robot, model.load_for_agent, 5)
+    for offset, cell in enumerate(timeline(robot.pos, path, planner.window)):
+        assert planner.reservations[(cell, 4 + offset)] == robot.unique_id
+    assert planner.current_until(robot) == 5 + planner.window // 2
+    planner.release(robot)
+    assert robot.unique_id not in planner.reservations.values()
+    assert planner.current_until(robot) == model.time_elapsed
+
+
+def test_reservation_table_survives_get_and_set_state():
+    model = make_model(debug=True)
+    for _ in range(30):
+        model.step()
+    state = model.planner.get_state()
+    other = make_model()
+    other.planner.set_state(state)
+    assert other.planner.reservations == model.planner.reservations
+    assert other.planner.expires == model.planner.expires
+    owned = {key for keys in other.planner.owned.values() for key in keys}
+    assert owned == set(model.planner.reservations)
@@ -0,0 +1,69 @@
+from agent import Robot
+from model import WarehouseModel
+
+
+def make_model(**options):
+    params = dict(width=18, height=12, num_robots=6, initial_packages=80, max_time=300, k=1, seed=5)
+    params.update(options)
+    return WarehouseModel(paths_file=None, log_level=None, **params)
+
+
+def planned_robot(model):
+    robot = next(agent for agent in model.schedule.agents if isinstance(agent, Robot))
+    model.plan_route(robot, model.load_for_agent)
+    return robot
+
+
+def test_plan_is_kept_while_it_stays_valid():
+    model = make_model()
+    robot = planned_robot(model)
+    path = robot.path
+    performed, avoided = model.replans_performed, model.replans_avoided
+    model.plan_route(robot, model.load_for_agent)
+    assert robot.path is path
+    assert (model.replans_performed, model.replans_avoided) == (performed, avoided + 1)
+
+
+def test_new_destination_replans():
+    model = make_model()
+    robot = planned_robot(model)
+    performed = model.replans_performed
+    model.plan_route(robot, model.unload_for_agent)
+    assert model.replans_performed == performed + 1
+    assert robot.destination == model.unload_for_agent and robot.path[-1] == model.unload_for_agent
+
+
+def test_plan_that_no_longer_starts_next_to_the_robot_replans():
+    model = make_model()
+    robot = planned_robot(model)
+    # Stepped aside: the plan now starts two cells away
+    robot.path = robot.path[2:]
+    performed = model.replans_performed
+    model.plan_route(robot, model.load_for_agent)
+    assert model.replans_performed == performed + 1
+    assert abs(robot.path[0][0] - robot.pos[0]) + abs(robot.path[0][1] - robot.pos[1]) == 1
+
+
+def test_layout_change_replans_and_clears_the_path_cache():
+    model = make_model()
+    robot = planned_robot(model)
+    navigation = model.navigation
+    assert navigation.path_cache
+    navigation.set_blocked([robot.path[len(robot.path) // 2]])
+    assert not navigation.path_cache
+    performed = model.replans_performed
+    model.plan_route(robot, model.load_for_agent)
+    assert model.replans_performed == performed + 1
+    assert not any(navigation.is_blocked(cell) for cell in robot.path)
+
+
+def test_cached_paths_are_copied_for_robots():
+    model = make_model()
+    navigation = model.navigation
+    start, goal = model.unload_for_agent, model.load_for_agent
+    first = navigation.shortest_path(start, goal)
+    misses = navigation.cache_misses
+    first.pop(0)
+    second = navigation.shortest_path(start, goal)
+    assert navigation.cache_misses == misses
+    assert len(second) == len(first) + 1
@@ -0,0 +1,36 @@
+import numpy as np
+
+from model import WarehouseModel
+from replay import TrajectoryStats
+
+
+def recorded_run():
+    model = WarehouseModel(width=18, height=12, num_robots=6, initial_packages=80, max_time=400, k=1, seed=5,
+                           paths_file=None, log_level=None)
+    while model.running:
+        model.step()
+    return model.trajectory.records()
+
+
+def analyze(records, chunk_size):
+    stats = TrajectoryStats(18, 12)
+    for start in range(0, len(records), chunk_size):
+        stats.add(records[start:start + chunk_size])
+    return stats.finish()
+
+
+def test_sparse_robot_ids_keep_dense_per_robot_arrays():
+    records = recorded_run()
+    dense = analyze(records, 1 << 20)
+    # Zone runs number robots zone * ROBOT_ID_STRIDE + id
+    sparse_records = records.copy()
+    sparse_records["robot"] += (sparse_records["robot"] % 3) * 10 ** 6
+    sparse = analyze(sparse_records, 97)
+    assert len(sparse.moves) == len(np.unique(records["robot"]))
+    assert sparse.summary() == dense.summary()
+    assert np.array_equal(sparse.waits, dense.waits)
+    table, expected = sparse.robot_table(), dense.robot_table()
+    order = np.argsort(table["robot"] % 10 ** 6)
+    assert np.array_equal(table["robot"][order] % 10 ** 6, expected["robot"])
+    for name in ("moves", "pickups", "deliveries", "loaded_distance"):
+        assert np.array_equal(table[name][order], expected[name])
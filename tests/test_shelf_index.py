@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from model import WarehouseModel
+from shelf_index import BucketGrid
+
+
+def baseline_nearest(pos, shelves):
+    # The original query: min() over the shelves in layout order, so ties go to the lowest rank
+    if not shelves:
+        return None
+    return min(shelves, key=lambda shelf: abs(pos[0] - shelf[1][0]) + abs(pos[1] - shelf[1][1]))[0]
+
+
+@pytest.mark.parametrize("bucket_size", [1, 3, 4, 7])
+def test_ring_search_matches_min_with_rank_ties(bucket_size):
+    rng = random.Random(bucket_size)
+    width, height = 40, 25
+    cells = rng.sample([(x, y) for x in range(width) for y in range(height)], 60)
+    shelves = [(f"shelf{index}", pos) for index, pos in enumerate(cells)]
+    rank = {name: index for index, (name, _) in enumerate(shelves)}
+    grid = BucketGrid(width, height, bucket_size)
+    for name, pos in shelves:
+        grid.add(name, pos)
+    present = {name for name, _ in shelves}
+    for _ in range(300):
+        # Shelves fill up and empty out: one leaves or comes back between queries
+        name, pos = rng.choice(shelves)
+        if name in present:
+            grid.discard(name)
+            present.discard(name)
+        else:
+            grid.add(name, pos)
+            present.add(name)
+        pos = (rng.randrange(width), rng.randrange(height))
+        assert grid.nearest(pos, rank) == baseline_nearest(pos, [shelf for shelf in shelves if shelf[0] in present])
+    assert len(grid) == len(present)
+
+
+def test_equidistant_shelves_go_to_the_lower_rank():
+    grid = BucketGrid(20, 20, 4)
+    rank = {"late": 1, "early": 0}
+    grid.add("late", (2, 10))
+    grid.add("early", (18, 10))
+    assert grid.nearest((10, 10), rank) == "early"
+    grid.discard("early")
+    assert grid.nearest((10, 10), rank) == "late"
+    grid.discard("late")
+    assert grid.nearest((10, 10), rank) is None
+
+
+def test_shelf_index_follows_shelf_loads():
+    model = WarehouseModel(width=18, height=12, num_robots=6, initial_packages=80, max_time=300, k=1, seed=5,
+                           paths_file=None, log_level=None)
+    shelves = sorted(model.shelf_index.rank, key=model.shelf_index.rank.get)
+    while model.running:
+        model.step()
+        for pos in ((0, 0), (9, 6), (17, 11)):
+            free = [(shelf, shelf.pos) for shelf in shelves if shelf.current_load < shelf.capacity]
+            loaded = [(shelf, shelf.pos) for shelf in shelves if shelf.current_load > 0]
+            assert model.shelf_index.nearest_with_capacity(pos) is baseline_nearest(pos, free)
+            assert model.shelf_index.nearest_with_packages(pos) is baseline_nearest(pos, loaded)
@@ -0,0 +1,101 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from model import WarehouseModel
+from snapshot import fork, load_snapshot, restore, save_snapshot, take_snapshot
+
+CASES = [
+    dict(),
+    dict(step_mode="event", planner="cooperative"),
+    dict(docks="queued", dock_options={"slots": 1, "service_time": 2}),
+    dict(workload="poisson", deadlock_policy="yield"),
+    dict(layout="aisles:30x20", num_robots=16, initial_packages=200, movement="sync", dispatcher="hungarian"),
+]
+
+
+def make_model(**options):
+    params = dict(width=18, height=12, num_robots=6, initial_packages=80, max_time=400, k=1, seed=5)
+    params.update(options)
+    return WarehouseModel(paths_file=None, log_level=None, **params)
+
+
+def run(model, until=None):
+    while model.running and (until is None or model.time_elapsed < until):
+        model.step()
+    return model
+
+
+def state(model):
+    robots = sorted(model.schedule.agents, key=lambda robot: robot.unique_id)
+    return {
+        "counters": [model.time_elapsed, model.total_movements, model.total_packages_stored,
+                     model.total_packages_delivered, model.wait_ticks, model.conflicts, model.alternative_moves],
+        "robots": [(robot.unique_id, robot.pos, robot.carrying_package, robot.destination) for robot in robots],
+        "trajectory": model.trajectory.records(),
+        "kpis": model.datacollector.arrays(),
+        "rng": model.random.getstate(),
+        "docks": model.docks.metrics(),
+        "workload": model.workload.metrics(),
+        "deadlocks": model.deadlocks.metrics() if model.deadlocks is not None else None,
+    }
+
+
+def assert_same(a, b):
+    a, b = state(a), state(b)
+    for name in ("counters", "robots", "rng", "docks", "workload", "deadlocks"):
+        assert a[name] == b[name], name
+    assert np.array_equal(a["trajectory"], b["trajectory"])
+    for x, y in zip(a["kpis"], b["kpis"]):
+        assert np.array_equal(x, y)
+
+
+@pytest.mark.parametrize("options", CASES, ids=lambda options: ",".join(f"{k}={v}" for k, v in options.items())
+                         or "default")
+def test_restored_model_continues_like_the_original(options):
+    expected = run(make_model(**options))
+    model = run(make_model(**options), until=150)
+    restored = run(restore(take_snapshot(model)))
+    assert_same(restored, expected)
+    # The original keeps running on its own state
+    assert_same(run(model), expected)
+
+
+def test_saved_snapshot_round_trip(tmp_path):
+    expected = run(make_model(docks="queued", workload="poisson"))
+    snapshot = take_snapshot(run(make_model(docks="queued", workload="poisson"), until=150))
+    path = tmp_path / "tick_150.npz"
+    save_snapshot(snapshot, path)
+    loaded = load_snapshot(path)
+    assert loaded.time_elapsed == snapshot.time_elapsed
+    assert set(loaded.arrays) == set(snapshot.arrays)
+    for name, array in snapshot.arrays.items():
+        assert np.array_equal(loaded.arrays[name], array), name
+    assert_same(run(restore(loaded)), expected)
+
+
+def test_pickled_snapshot_restores():
+    expected = run(make_model())
+    snapshot = pickle.loads(pickle.dumps(take_snapshot(run(make_model(), until=100))))
+    assert_same(run(restore(snapshot)), expected)
+
+
+def test_fork_adds_robots_and_leaves_the_original_alone():
+    model = run(make_model(), until=100)
+    before = state(model)
+    branch = fork(model, num_robots=8, dispatcher="hungarian")
+    assert len(branch.schedule.agents) == 8
+    assert branch.time_elapsed == model.time_elapsed
+    run(branch)
+    after = state(model)
+    assert after["counters"] == before["counters"]
+    assert np.array_equal(after["trajectory"], before["trajectory"])
+
+
+def test_restore_rejects_fewer_robots_and_other_docks():
+    snapshot = take_snapshot(run(make_model(), until=50))
+    with pytest.raises(ValueError):
+        restore(snapshot, num_robots=4)
+    with pytest.raises(ValueError):
+        restore(snapshot, docks="queued")
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from model import WarehouseModel
+
+COUNTERS = ("time_elapsed", "total_movements", "total_packages_stored", "total_packages_delivered", "wait_ticks",
+            "conflicts", "alternative_moves", "replans_performed", "replans_avoided", "assignments",
+            "assignment_cost")
+
+CASES = [
+    dict(),
+    dict(planner="cooperative"),
+    dict(planner="flow", dispatcher="hungarian"),
+    dict(docks="queued", dock_options={"slots": 1, "service_time": 2}),
+    dict(deadlock_policy="detect"),
+    dict(deadlock_policy="yield"),
+    dict(movement="sync"),
+    dict(workload="poisson"),
+    dict(workload="trucks", docks="queued"),
+    dict(layout="aisles:30x20", num_robots=16, initial_packages=200, dispatcher="hungarian", planner="cooperative"),
+    dict(layout="aisles:30x20", num_robots=16, initial_packages=200),
+    dict(layout="aisles:30x20", num_robots=16, initial_packages=200, deadlock_policy="yield", movement="sync"),
+]
+
+
+def run(step_mode, **options):
+    params = dict(width=18, height=12, num_robots=6, initial_packages=80, max_time=400, k=1, seed=3)
+    params.update(options)
+    model = WarehouseModel(paths_file=None, log_level=None, step_mode=step_mode, **params)
+    while model.running:
+        model.step()
+    return model
+
+
+@pytest.mark.parametrize("options", CASES, ids=lambda options: ",".join(f"{k}={v}" for k, v in options.items())
+                         or "default")
+def test_event_stepping_matches_tick_stepping(options):
+    tick = run("tick", **options)
+    event = run("event", **options)
+    for name in COUNTERS:
+        assert getattr(event, name) == getattr(tick, name), name
+    assert np.array_equal(event.trajectory.records(), tick.trajectory.records())
+    for event_array, tick_array in zip(event.datacollector.arrays(), tick.datacollector.arrays()):
+        assert np.array_equal(event_array, tick_array)
+    assert event.random.getstate() == tick.random.getstate()
+    assert [robot.pos for robot in event.schedule.agents] == [robot.pos for robot in tick.schedule.agents]
+    assert event.docks.metrics() == tick.docks.metrics()
+    if tick.deadlocks is not None:
+        assert event.deadlocks.metrics() == tick.deadlocks.metrics()
+
+
+def test_event_stepping_skips_ticks():
+    model = run("event")
+    assert model.fast_forward.ticks_skipped > 0
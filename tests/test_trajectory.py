@@ -0,0 +1,30 @@
+import numpy as np
+
+from trajectory import ACTIONS, TrajectoryRecorder
+
+
+def fill(recorder, count=1000):
+    for index in range(count):
+        recorder.record(index // 7, index % 7, (index % 18, index % 12), ACTIONS[index % len(ACTIONS)])
+    return recorder
+
+
+def test_spilled_records_match_in_memory_chunks():
+    spilled = fill(TrajectoryRecorder(chunk_size=64))
+    kept = fill(TrajectoryRecorder(chunk_size=64, spill=False))
+    assert not spilled.chunks and len(kept.chunks) == 1000 // 64
+    assert np.array_equal(spilled.records(), kept.records())
+    # Reading back does not lose the write position
+    fill(spilled, 10)
+    fill(kept, 10)
+    assert np.array_equal(spilled.records(), kept.records())
+
+
+def test_extend_spills_history():
+    history = fill(TrajectoryRecorder(spill=False), 300).records()
+    recorder = TrajectoryRecorder(chunk_size=64)
+    recorder.extend(history)
+    fill(recorder, 100)
+    assert not recorder.chunks
+    assert recorder.count == 400
+    assert np.array_equal(recorder.records()[:300], history)
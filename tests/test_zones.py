@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from layout import resolve_layout
+from zones import _open_cells, run_zones, split_layout, zone_gateways
+
+HANDOFFS = dict(layout="aisles:60x40", num_robots=30, initial_packages=60, max_time=800, zones=3, epoch=5)
+
+
+@pytest.fixture(scope="module")
+def inline_run():
+    return run_zones(processes=False, **HANDOFFS)
+
+
+def test_gateways_face_each_other_on_open_cells():
+    layouts = split_layout(resolve_layout("aisles:60x40", None, None), 3)
+    gateways = zone_gateways(layouts)
+    for zone, zone_gates in enumerate(gateways):
+        assert zone_gates
+        layout, offset = layouts[zone]
+        for neighbour, cell, facing, _ in zone_gates:
+            assert cell in _open_cells(layout)
+            other_layout, other_offset = layouts[neighbour]
+            other = gateways[neighbour][facing]
+            assert other[0] == zone and other[1] in _open_cells(other_layout)
+            here = (cell[0] + offset[0], cell[1] + offset[1])
+            there = (other[1][0] + other_offset[0], other[1][1] + other_offset[1])
+            assert abs(here[0] - there[0]) + abs(here[1] - there[1]) == 1
+
+
+def test_robots_cross_borders_between_adjacent_cells(inline_run):
+    assert inline_run.totals["handoffs"] > 0
+    records = inline_run.records()
+    assert len(np.unique(records["robot"])) == HANDOFFS["num_robots"]
+    bounds = [offset[0] for _, offset in inline_run.layouts]
+    for robot in np.unique(records["robot"]):
+        rows = records[records["robot"] == robot]
+        zone = np.searchsorted(bounds, rows["x"], side="right") - 1
+        for index in np.flatnonzero(np.diff(zone)):
+            before, after = rows[index], rows[index + 1]
+            assert abs(int(after["x"]) - int(before["x"])) + abs(int(after["y"]) - int(before["y"])) == 1
+
+
+def test_processes_match_inline_run(inline_run):
+    run = run_zones(processes=True, **HANDOFFS)
+    assert run.totals == inline_run.totals
+    assert np.array_equal(run.records(), inline_run.records())
+    assert np.array_equal(run.kpis()[1], inline_run.kpis()[1])
+
+
+@pytest.mark.parametrize("options", [dict(step_mode="event"), dict(movement="sync", deadlock_policy="yield")])
+def test_handoffs_keep_counters_consistent(options):
+    run = run_zones(processes=False, debug=True, **{**HANDOFFS, **options})
+    assert run.totals["total_packages_delivered"] <= HANDOFFS["initial_packages"]
+
+
+def test_grants_go_through_queued_docks():
+    options = dict(docks="queued", dock_options={"slots": 2, "service_time": 1, "truck_capacity": 20})
+    run = run_zones(processes=False, debug=True, **{**HANDOFFS, "initial_packages": 200, **options})
+    assert sum(result["docks"]["unload_trucks_docked"] for result in run.zones) > 0
+    assert run.totals["total_packages_delivered"] > 0
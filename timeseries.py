@@ -0,0 +1,126 @@
+import os
+from collections import deque
+
+import numpy as np
+
+
+class TimeSeriesCollector:
+    # Headless replacement for mesa's DataCollector. One row function returns every
+    # value at once; rows go into a preallocated NumPy chunk. Full chunks are
+    #   - written to `path` (a directory of chunk_NNNNN.npz files) when a path is given,
+    #   - otherwise kept in memory, dropping the oldest once `capacity` rows are exceeded.
+    # `model_vars[label][-1]` works like DataCollector's, so ChartModule can read it.
+
+    def __init__(self, labels, row, interval=1, capacity=None, path=None, chunk_rows=4096, dtype=np.int64):
+        self.labels = list(labels)
+        self.row = row
+        self.interval = interval
+        self.capacity = capacity
+        self.path = path
+        if capacity is not None:
+            chunk_rows = max(1, min(chunk_rows, capacity))
+        self.buffer = np.empty((chunk_rows, len(self.labels)), dtype=dtype)
+        self.ticks = np.empty(chunk_rows, dtype=np.int64)
+        self.size = 0
+        self.chunks = deque()
+        self.rows_in_chunks = 0
+        self.chunks_written = 0
+        self.collected = 0
+        self.calls = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    @property
+    def model_vars(self):
+        return {label: ColumnView(self, column) for column, label in enumerate(self.labels)}
+
+    def collect(self, model):
+        self.calls += 1
+        if (self.calls - 1) % self.interval:
+            return
+        if self.size == len(self.buffer):
+            self.flush()
+        self.buffer[self.size] = self.row(model)
+        self.ticks[self.size] = model.time_elapsed
+        self.size += 1
+        self.collected += 1
+
+    def extend(self, ticks, values):
+        # Append already collected rows (e.g. from a snapshot) as one chunk, kept by reference in memory
+        self.flush()
+        if len(ticks):
+            self._store(ticks, values)
+
+    def flush(self):
+        if not self.size:
+            return
+        self._store(self.ticks[:self.size].copy(), self.buffer[:self.size].copy())
+        self.size = 0
+
+    def _store(self, ticks, values):
+        if self.path:
+            np.savez(os.path.join(self.path, f"chunk_{self.chunks_written:05d}.npz"), ticks=ticks, values=values)
+            self.chunks_written += 1
+            # Keep only the last chunk around so model_vars[label][-1] keeps working
+            self.chunks = deque([(ticks, values)])
+            self.rows_in_chunks = len(ticks)
+        else:
+            self.chunks.append((ticks, values))
+            self.rows_in_chunks += len(ticks)
+            while self.capacity is not None and self.rows_in_chunks > self.capacity:
+                dropped, _ = self.chunks.popleft()
+                self.rows_in_chunks -= len(dropped)
+
+    def latest(self, column):
+        if self.size:
+            return self.buffer[self.size - 1, column].item()
+        if self.chunks:
+            return self.chunks[-1][1][-1, column].item()
+        raise IndexError("no data collected yet")
+
+    def arrays(self):
+        # (ticks, values) of everything still available: on disk when a path is used, else in memory
+        parts = []
+        if self.path:
+            for name in sorted(os.listdir(self.path)):
+                if name.startswith("chunk_") and name.endswith(".npz"):
+                    with np.load(os.path.join(self.path, name)) as data:
+                        parts.append((data["ticks"], data["values"]))
+        else:
+            parts = list(self.chunks)
+        parts.append((self.ticks[:self.size], self.buffer[:self.size]))
+        ticks = np.concatenate([part[0] for part in parts])
+        values = np.concatenate([part[1] for part in parts])
+        return ticks, values
+
+    def to_dataframe(self):
+        import pandas as pd
+        ticks, values = self.arrays()
+        return pd.DataFrame(values, columns=self.labels, index=pd.Index(ticks, name="Step"))
+
+    # Same name as DataCollector's, for code written against mesa
+    get_model_vars_dataframe = to_dataframe
+
+    def to_arrow(self):
+        import pyarrow as pa
+        ticks, values = self.arrays()
+        columns = {"Step": ticks, **{label: values[:, column] for column, label in enumerate(self.labels)}}
+        return pa.table(columns)
+
+
+class ColumnView:
+    # Read-only view of one collected column; only the latest value is cheap
+    def __init__(self, collector, column):
+        self.collector = collector
+        self.column = column
+
+    def __len__(self):
+        return self.collector.rows_in_chunks + self.collector.size
+
+    def __getitem__(self, index):
+        if index == -1:
+            return self.collector.latest(self.column)
+        return self.collector.arrays()[1][index, self.column].tolist()
+
+    def __iter__(self):
+        return iter(self.collector.arrays()[1][:, self.column].tolist())
@@ -0,0 +1,112 @@
+import json
+import tempfile
+
+import numpy as np
+
+# Actions recorded in the robot trajectories, stored as one-byte codes
+ACTIONS = ("move", "pickup", "pickup_from_shelf", "deliver_load", "deliver_shelf")
+ACTION_CODES = {name: code for code, name in enumerate(ACTIONS)}
+
+RECORD_DTYPE = np.dtype([("tick", "<u4"), ("robot", "<u4"), ("x", "<i2"), ("y", "<i2"), ("action", "u1")])
+
+FORMATS = ("bin", "ndjson")
+
+
+class TrajectoryRecorder:
+    # Keeps (tick, robot, x, y, action) records in a preallocated NumPy buffer. When the buffer
+    # is full it is written out as a chunk: appended to `path` if given, otherwise spilled to an
+    # anonymous temporary file, so memory stays at one buffer however long the run is. spill=False
+    # keeps the chunks in memory instead (grows with the run); records() reads everything back.
+    # "bin" files are the raw RECORD_DTYPE array (np.fromfile / np.memmap can read them back);
+    # "ndjson" files start with a header line followed by one [tick, robot, x, y, action] per line.
+
+    def __init__(self, path=None, fmt="bin", chunk_size=65536, spill=True):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown trajectory format {fmt!r}, expected one of {FORMATS}")
+        self.path = path
+        self.fmt = fmt
+        self.buffer = np.empty(chunk_size, dtype=RECORD_DTYPE)
+        self.size = 0
+        self.count = 0
+        self.chunks = []
+        self.spill = tempfile.TemporaryFile() if spill and not path else None
+        if path:
+            with open(path, "w") as f:
+                if fmt == "ndjson":
+                    f.write(json.dumps({"fields": list(RECORD_DTYPE.names), "actions": list(ACTIONS)}))
+                    f.write("\n")
+
+    def record(self, tick, robot_id, pos, action):
+        if self.size == len(self.buffer):
+            self.flush()
+        self.buffer[self.size] = (tick, robot_id, pos[0], pos[1], ACTION_CODES[action])
+        self.size += 1
+        self.count += 1
+
+    def extend(self, records):
+        # Append already recorded history (e.g. from a snapshot); kept by reference if not spilled
+        self.flush()
+        if len(records):
+            self._write(records, copy=False)
+            self.count += len(records)
+
+    def flush(self):
+        if not self.size:
+            return
+        self._write(self.buffer[:self.size])
+        self.size = 0
+
+    def _write(self, chunk, copy=True):
+        if self.spill is not None:
+            chunk.tofile(self.spill)
+        elif not self.path:
+            self.chunks.append(chunk.copy() if copy else chunk)
+        elif self.fmt == "bin":
+            with open(self.path, "ab") as f:
+                chunk.tofile(f)
+        else:
+            with open(self.path, "a") as f:
+                for record in chunk.tolist():
+                    f.write("[%d,%d,%d,%d,%d]\n" % record)
+
+    def records(self):
+        if self.path:
+            self.flush()
+            return read_trajectory(self.path, self.fmt)
+        if self.spill is not None:
+            self.flush()
+            self.spill.seek(0)
+            records = np.fromfile(self.spill, dtype=RECORD_DTYPE)
+            self.spill.seek(0, 2)
+            return records
+        return np.concatenate(self.chunks + [self.buffer[:self.size]])
+
+    def robot_path(self, robot_id, records=None):
+        # Old path_taken schema: [{"position": [x, y], "action": "move"}, ...]
+        if records is None:
+            records = self.records()
+        rows = records[records["robot"] == robot_id]
+        return [{"position": [x, y], "action": ACTIONS[action]}
+                for x, y, action in zip(rows["x"].tolist(), rows["y"].tolist(), rows["action"].tolist())]
+
+    def export_json(self, path, robot_ids):
+        # Compatibility export with the robot_paths.json schema
+        records = self.records()
+        robots_data = [{"id": robot_id, "path": self.robot_path(robot_id, records)} for robot_id in robot_ids]
+        with open(path, "w") as f:
+            json.dump(robots_data, f, separators=(",", ":"))
+
+
+def read_trajectory(path, fmt="bin"):
+    if fmt == "bin":
+        return np.memmap(path, dtype=RECORD_DTYPE, mode="r") if _file_size(path) else np.empty(0, RECORD_DTYPE)
+    with open(path) as f:
+        f.readline()  # header
+        rows = [tuple(json.loads(line)) for line in f if line.strip()]
+    return np.array(rows, dtype=RECORD_DTYPE)
+
+
+def _file_size(path):
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        return f.tell()
@@ -0,0 +1,381 @@
+import csv
+import random
+from collections import deque
+
+# Streaming workloads: where inbound packages and outbound orders come from.
+#
+#   WarehouseModel(..., initial_packages=0, max_time=200000, workload="poisson",
+#                  workload_options={"inbound_rate": 0.2, "order_rate": 0.15})
+#   WarehouseModel(..., workload="trucks", docks="queued", dock_options={"truck_capacity": 40},
+#                  workload_options={"mean_gap": 400, "burst": [1, 3], "truck_size": 40, "order_rate": 0.1})
+#   WarehouseModel(..., workload="trace", workload_options={"path": "week.csv"})
+#   model.workload.metrics()   # arrivals, orders fulfilled/open, order lead times
+#
+# 'batch' is the original behaviour: initial_packages are created up front and the phase_size toggle in
+# should_deliver_to_load_truck() is the only demand. The streaming workloads add, tick by tick:
+#   - inbound packages, handed to the docks as they arrive (with queued docks every load is a truck);
+#   - outbound orders (when an order stream is configured). Open orders replace the phase toggle:
+#     carrying robots deliver to the load truck while orders are open, each delivery fulfils the
+#     oldest one, and idle robots pick stored packages from the shelves for the orders nobody is on.
+# Streams are drawn lazily from their own RNG (seeded from the model seed, so changing one stream
+# never changes another) or read row by row from a CSV trace, and the order backlog is kept as
+# [tick, count] runs (optionally capped with max_backlog), so memory stays flat however long the run.
+# The run keeps going while a stream can still deliver; for long runs also pass trajectory_file and
+# collect_capacity (or collect_path) so the trajectory and KPI series go to disk.
+#
+# Trace files have a header and one row per arrival, ticks ascending:
+#   tick,kind,count
+#   12,inbound,40
+#   15,order,2
+
+WORKLOADS = ("batch", "poisson", "trace", "trucks")
+
+WORKLOAD_COLUMNS = ["packages_arrived", "orders_received", "orders_fulfilled", "orders_open", "orders_dropped",
+                    "order_lead_mean", "order_lead_max", "shipped_unordered"]
+
+
+class BatchWorkload:
+    orders = None
+
+    def __init__(self, model):
+        self.model = model
+
+    def update(self):
+        pass
+
+    def pick_stop(self, robot):
+        return None
+
+    def pick_from(self, robot):
+        return None
+
+    def leave(self, robot):
+        pass
+
+    def ship(self):
+        pass
+
+    def pending(self):
+        return False
+
+    def next_event(self, start):
+        return None
+
+    def metrics(self):
+        return {}
+
+    def close(self):
+        pass
+
+    def get_state(self):
+        return {}
+
+    def set_state(self, state):
+        pass
+
+
+class PoissonStream:
+    # Single arrivals with exponential gaps of mean 1 / rate ticks; arrivals within one tick form one load
+    def __init__(self, rate, rng):
+        self.rate = rate
+        self.rng = rng
+        self.clock = 0.0
+        self.next_tick = None
+        self.advance()
+
+    def advance(self):
+        if self.rate <= 0:
+            self.next_tick = None
+            return
+        self.clock += self.rng.expovariate(self.rate)
+        self.next_tick = int(self.clock) + 1
+
+    def take(self, tick):
+        count = 0
+        while self.next_tick is not None and self.next_tick <= tick:
+            count += 1
+            self.advance()
+        return [count] if count else []
+
+    def get_state(self):
+        return {"rng": _rng_state(self.rng), "clock": self.clock, "next_tick": self.next_tick}
+
+    def set_state(self, state):
+        self.rng.setstate(_rng_tuple(state["rng"]))
+        self.clock = state["clock"]
+        self.next_tick = state["next_tick"]
+
+
+class TruckBursts:
+    # Bursts with exponential gaps of mean mean_gap ticks; a burst is burst[0]..burst[1] trucks of
+    # truck_size packages, spacing ticks apart
+    def __init__(self, mean_gap, burst, truck_size, spacing, rng):
+        self.mean_gap = mean_gap
+        self.burst = tuple(burst)
+        self.truck_size = truck_size
+        self.spacing = spacing
+        self.rng = rng
+        self.clock = 0.0
+        self.trucks = deque()  # arrival ticks left in the current burst
+        self.advance()
+
+    @property
+    def next_tick(self):
+        return self.trucks[0]
+
+    def advance(self):
+        self.clock += self.rng.expovariate(1 / self.mean_gap)
+        first = int(self.clock) + 1
+        self.trucks = deque(first + index * self.spacing for index in range(self.rng.randint(*self.burst)))
+
+    def take(self, tick):
+        loads = []
+        while self.trucks[0] <= tick:
+            self.trucks.popleft()
+            loads.append(self.truck_size)
+            if not self.trucks:
+                self.advance()
+        return loads
+
+    def get_state(self):
+        return {"rng": _rng_state(self.rng), "clock": self.clock, "trucks": list(self.trucks)}
+
+    def set_state(self, state):
+        self.rng.setstate(_rng_tuple(state["rng"]))
+        self.clock = state["clock"]
+        self.trucks = deque(state["trucks"])
+
+
+class TraceReplay:
+    # The rows of one kind in a CSV trace, read one at a time; only the next row is held in memory
+    def __init__(self, path, kind):
+        self.path = path
+        self.kind = kind
+        self.file = open(path, newline="")
+        header = next(csv.reader([self.file.readline()]), [])
+        missing = {"tick", "kind", "count"} - set(header)
+        if missing:
+            self.file.close()
+            raise ValueError(f"Trace {path} is missing the columns {sorted(missing)}")
+        self.columns = [header.index(name) for name in ("tick", "kind", "count")]
+        self.advance()
+
+    def advance(self):
+        while True:
+            self.offset = self.file.tell()
+            line = self.file.readline()
+            if not line:
+                self.next_tick = None
+                self.count = 0
+                self.offset = None
+                self.file.close()
+                return
+            row = next(csv.reader([line]), None)
+            if not row:
+                continue
+            tick, kind, count = (row[column].strip() for column in self.columns)
+            if kind == self.kind:
+                self.next_tick = int(tick)
+                self.count = int(count)
+                return
+
+    def take(self, tick):
+        loads = []
+        while self.next_tick is not None and self.next_tick <= tick:
+            if self.count > 0:
+                loads.append(self.count)
+            self.advance()
+        return loads
+
+    def close(self):
+        self.file.close()
+
+    def get_state(self):
+        return {"offset": self.offset}
+
+    def set_state(self, state):
+        if not self.file.closed:
+            self.file.close()
+        if state["offset"] is None:
+            self.next_tick = None
+            self.count = 0
+            self.offset = None
+            return
+        self.file = open(self.path, newline="")
+        self.file.seek(state["offset"])
+        self.advance()
+
+
+class StreamingWorkload:
+    _COUNTERS = ("packages_arrived", "orders_received", "orders_fulfilled", "orders_open", "orders_dropped",
+                 "lead_total", "lead_max", "shipped_unordered")
+
+    def __init__(self, model, inbound, orders=None, max_backlog=None):
+        self.model = model
+        self.inbound = inbound
+        self.orders = orders
+        self.max_backlog = max_backlog
+        self.backlog = deque()  # [tick, count] runs of open orders, oldest first
+        self.pickers = {}       # robot -> shelf stop it was sent to pick an order from
+        self.packages_arrived = 0
+        self.orders_received = 0
+        self.orders_fulfilled = 0
+        self.orders_open = 0
+        self.orders_dropped = 0
+        self.lead_total = 0
+        self.lead_max = 0
+        self.shipped_unordered = 0
+
+    def update(self):
+        model = self.model
+        tick = model.time_elapsed
+        for load in self.inbound.take(tick):
+            model.docks.receive([model.next_id() for _ in range(load)])
+            self.packages_arrived += load
+        if self.orders is None:
+            return
+        for count in self.orders.take(tick):
+            self.orders_received += count
+            if self.max_backlog is not None:
+                dropped = max(0, self.orders_open + count - self.max_backlog)
+                self.orders_dropped += dropped
+                count -= dropped
+            if count:
+                self.backlog.append([tick, count])
+                self.orders_open += count
+        self.outbound_changed()
+
+    def outbound_changed(self):
+        # Open orders replace the phase toggle: deliveries go to the load truck while any are open
+        self.model.delivering_to_load_truck = self.orders_open > 0
+        self.model.packages_delivered_in_phase = 0
+
+    def pick_stop(self, robot):
+        # Shelf stop an empty robot should pick an open order from (one robot per open order), or None
+        if self.orders is None:
+            return None
+        model = self.model
+        stop = self.pickers.pop(robot, None)
+        if stop is not None and self.shelf_at(stop) is not None:
+            self.pickers[robot] = stop
+            return stop
+        if len(self.pickers) >= self.orders_open:
+            return None
+        shelf = model.shelf_index.nearest_with_packages(robot.pos)
+        stop = None if shelf is None else model.shelf_index.stop_position(shelf)
+        if stop is not None:
+            self.pickers[robot] = stop
+        return stop
+
+    def pick_from(self, robot):
+        # Shelf a picker standing on its stop takes the package from
+        stop = self.pickers.get(robot)
+        if stop is None or robot.pos != stop:
+            return None
+        del self.pickers[robot]
+        return self.shelf_at(stop)
+
+    def leave(self, robot):
+        # The robot takes no more tasks here (parked or removed); its order goes to another picker
+        self.pickers.pop(robot, None)
+
+    def shelf_at(self, stop):
+        shelf = self.model.shelf_index.by_pos.get(self.model.shelf_to_stop.get(stop))
+        return shelf if shelf is not None and shelf.current_load > 0 else None
+
+    def ship(self):
+        # A package reached the load truck: it fulfils the oldest open order
+        if not self.orders_open:
+            self.shipped_unordered += 1
+            return
+        run = self.backlog[0]
+        lead = self.model.time_elapsed - run[0]
+        self.lead_total += lead
+        self.lead_max = max(self.lead_max, lead)
+        run[1] -= 1
+        if not run[1]:
+            self.backlog.popleft()
+        self.orders_open -= 1
+        self.orders_fulfilled += 1
+        self.outbound_changed()
+
+    def pending(self):
+        # Packages or orders still to come, or open orders the shelves can still serve
+        return (self.inbound.next_tick is not None
+                or self.orders is not None and self.orders.next_tick is not None
+                or self.orders_open > 0 and self.model.total_packages_stored > 0)
+
+    def next_event(self, start):
+        # First tick at which update() brings something in
+        ticks = [stream.next_tick for stream in (self.inbound, self.orders)
+                 if stream is not None and stream.next_tick is not None]
+        return min(ticks, default=None)
+
+    def metrics(self):
+        return {"packages_arrived": self.packages_arrived,
+                "orders_received": self.orders_received,
+                "orders_fulfilled": self.orders_fulfilled,
+                "orders_open": self.orders_open,
+                "orders_dropped": self.orders_dropped,
+                "order_lead_mean": self.lead_total / self.orders_fulfilled if self.orders_fulfilled else 0.0,
+                "order_lead_max": self.lead_max,
+                "shipped_unordered": self.shipped_unordered}
+
+    def close(self):
+        for stream in (self.inbound, self.orders):
+            if isinstance(stream, TraceReplay):
+                stream.close()
+
+    def get_state(self):
+        state = {name: getattr(self, name) for name in self._COUNTERS}
+        state["inbound"] = self.inbound.get_state()
+        state["orders"] = self.orders.get_state() if self.orders is not None else None
+        state["backlog"] = [list(run) for run in self.backlog]
+        state["pickers"] = [[robot.unique_id, list(stop)] for robot, stop in self.pickers.items()]
+        return state
+
+    def set_state(self, state):
+        for name in self._COUNTERS:
+            setattr(self, name, state[name])
+        self.inbound.set_state(state["inbound"])
+        if self.orders is not None:
+            self.orders.set_state(state["orders"])
+        self.backlog = deque(list(run) for run in state["backlog"])
+        robots = {agent.unique_id: agent for agent in self.model.schedule.agents}
+        self.pickers = {robots[robot]: tuple(stop) for robot, stop in state["pickers"]}
+
+
+def make_workload(name, model, options=None):
+    options = dict(options or {})
+    if name == "batch":
+        return BatchWorkload(model)
+    seed = options.pop("seed", model.params["seed"])
+    max_backlog = options.pop("max_backlog", None)
+    order_rate = options.pop("order_rate", None)
+    orders = PoissonStream(order_rate, random.Random(f"{seed}/orders")) if order_rate is not None else None
+    if name == "poisson":
+        inbound = PoissonStream(options.pop("inbound_rate", 0.1), random.Random(f"{seed}/inbound"))
+    elif name == "trucks":
+        inbound = TruckBursts(options.pop("mean_gap", 300), options.pop("burst", (1, 3)),
+                              options.pop("truck_size", 40), options.pop("spacing", 10),
+                              random.Random(f"{seed}/inbound"))
+    elif name == "trace":
+        path = options.pop("path")
+        inbound = TraceReplay(path, "inbound")
+        if options.pop("orders", True):
+            orders = TraceReplay(path, "order")
+    else:
+        raise ValueError(f"Unknown workload {name!r}, expected one of {WORKLOADS}")
+    if options:
+        raise ValueError(f"Unknown options for the {name} workload: {sorted(options)}")
+    return StreamingWorkload(model, inbound, orders, max_backlog)
+
+
+def _rng_state(rng):
+    version, internal, gauss = rng.getstate()
+    return [version, list(internal), gauss]
+
+
+def _rng_tuple(state):
+    version, internal, gauss = state
+    return version, tuple(internal), gauss
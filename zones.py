@@ -0,0 +1,557 @@
+# Zone-partitioned runs: the floor is cut into strips along the aisles, each strip is simulated by
+# its own WarehouseModel in its own worker process, and the zones trade packages and robots every
+# `epoch` ticks over a shared-memory board.
+#
+#   result = run_zones(layout="aisles:120x80", num_robots=120, initial_packages=2000, max_time=3000, zones=4)
+#   result.totals, result.kpis(), result.export_paths_to_json("robot_paths.json")
+#
+# Docks: every zone has dock ports (the real dock where it lies in the zone, otherwise a conveyor
+# port on the zone's edge) on the two shared dock queues:
+#   - inbound: the coordinator hands packages from the unload dock to the zones, one at a time in
+#     zone order, up to each zone's demand (robots minus packages already waiting at its port);
+#     a zone takes them in through its dock model, so docks="queued" trucks them in like any run;
+#   - outbound: whatever a zone drops at its load port counts as loaded on the shared load truck.
+# Robot handoffs: every border has a few gateways, pairs of open cells facing each other across the
+# cut. A zone's idle robots (no package, none left for them to pick up) are called across when the
+# next zone has packages waiting that none of its own free robots can take, one per free gateway:
+# the zone sends its nearest robot without a package there, and the robot parks on the gateway (off
+# the schedule, still on its cell). At the next barrier a parked robot steps across if the cell
+# facing it is free (or holds a robot parked the other way: they swap); it leaves its zone and
+# enters the next one with its role, and the step is recorded as a move on the first tick of the
+# epoch. Merged outputs follow every robot across zones under one id.
+# Dispatch stays zone-local (nearest shelf in the robot's zone), so a run is not tick for tick the
+# same as one WarehouseModel on the whole floor.
+# Zones never read each other's state inside an epoch, and the coordinator decides only from the
+# board at epoch barriers, so a run gives the same result with processes=False (zones stepped one
+# after another in this process) as with one process per zone.
+
+import multiprocessing
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from agent import Robot
+from layout import Layout, resolve_layout
+from model import KPI_LABELS, WarehouseModel
+from state import ROLES, ROLE_CODES
+from trajectory import TrajectoryRecorder
+
+# Board columns, one row per zone plus a coordinator row at the end
+GRANT, FIRST_ID, UNLOAD, CARRYING, DEMAND, STORED, OUTBOUND, DELIVERED, MOVEMENTS, TIME, RUNNING, SPARE = range(12)
+STOP, REMAINING = range(2)
+BOARD_COLUMNS = 12
+
+# Gateway columns, one row per gateway of a zone: what is on its cell (written by the zone) and what
+# happens there at the barrier (written by the coordinator)
+STATE, RESERVED, ROBOT, ROLE, CALL, DEPART, ARRIVE, ARRIVE_ROLE = range(8)
+GATE_COLUMNS = 8
+FREE, BUSY, PARKED = range(3)
+NO_ROBOT = -1
+
+GATES_PER_BORDER = 2
+
+# Granted packages and zone robots get ids in their own ranges so merged outputs stay unique
+PACKAGE_ID_BASE = 10 ** 9
+ROBOT_ID_STRIDE = 10 ** 6
+
+SUMMED_COUNTERS = ("total_movements", "total_packages_stored", "total_packages_delivered", "wait_ticks",
+                   "conflicts", "alternative_moves", "assignment_cost", "replans_performed", "replans_avoided")
+
+
+def zone_cuts(layout, zones, axis):
+    # Cut coordinates along axis (0 = x, 1 = y) that keep every shelf with its stop cells and every
+    # truck with its stop on one side, as close as possible to an even split
+    size = (layout.width, layout.height)[axis]
+    pairs = list(layout.shelf_stops.items()) + [(layout.unload_stop, layout.unload_truck),
+                                                (layout.load_stop, layout.load_truck)]
+    valid = [cut for cut in range(1, size)
+             if all(not min(a[axis], b[axis]) < cut <= max(a[axis], b[axis]) for a, b in pairs)]
+    cuts = []
+    for index in range(1, zones):
+        target = index * size / zones
+        candidates = [cut for cut in valid if not cuts or cut > cuts[-1]]
+        if not candidates:
+            return None
+        cuts.append(min(candidates, key=lambda cut: (abs(cut - target), cut)))
+    return cuts
+
+
+def split_layout(layout, zones, axis=None):
+    # [(Layout, offset)] per zone; offset is the (dx, dy) from zone to floor coordinates.
+    # axis=None picks the axis whose cuts give the most even zones.
+    if zones == 1:
+        return [(layout, (0, 0))]
+    options = []
+    for candidate in ((0, 1) if axis is None else (axis,)):
+        cuts = zone_cuts(layout, zones, candidate)
+        if cuts is not None:
+            size = (layout.width, layout.height)[candidate]
+            bounds = [0] + cuts + [size]
+            widths = [hi - lo for lo, hi in zip(bounds, bounds[1:])]
+            options.append((max(widths) - min(widths), candidate, bounds))
+    if not options:
+        raise ValueError(f"Layout {layout.name} cannot be cut into {zones} zones without splitting a shelf from its stops")
+    _, axis, bounds = min(options)
+    return [_zone_layout(layout, axis, lo, hi, index) for index, (lo, hi) in enumerate(zip(bounds, bounds[1:]))]
+
+
+def _zone_layout(layout, axis, lo, hi, index):
+    offset = (lo, 0) if axis == 0 else (0, lo)
+    width, height = ((hi - lo, layout.height) if axis == 0 else (layout.width, hi - lo))
+
+    def inside(pos):
+        return lo <= pos[axis] < hi
+
+    def local(pos):
+        return (pos[0] - offset[0], pos[1] - offset[1])
+
+    shelves = [local(pos) for pos in layout.shelves if inside(pos)]
+    shelf_stops = {local(stop): local(shelf) for stop, shelf in layout.shelf_stops.items() if inside(shelf)}
+    taken = set(shelves) | set(shelf_stops)
+    docks = []
+    for truck, stop in ((layout.unload_truck, layout.unload_stop), (layout.load_truck, layout.load_stop)):
+        if inside(truck):
+            dock = (local(truck), local(stop))
+        else:
+            dock = _dock_port(width, height, taken, local(truck))
+        taken |= set(dock)
+        docks += dock
+    spawns = [local(pos) for pos in layout.robot_spawns if inside(pos) and local(pos) not in taken]
+    spawns += [(x, y) for x in range(width) for y in range(height)
+               if (x, y) not in taken and (x, y) not in spawns]
+    zone = Layout(width, height, shelves, shelf_stops, *docks, spawns, name=f"{layout.name}_zone{index}")
+    # Spawns are only candidates: keep the cells robots can actually leave from
+    reachable = zone.reachable_from(zone.unload_stop)
+    zone = Layout(width, height, shelves, shelf_stops, *docks, [pos for pos in spawns if pos in reachable],
+                  name=zone.name)
+    return zone, offset
+
+
+def _dock_port(width, height, taken, towards):
+    # Conveyor port standing in for a dock outside the zone: a truck cell on the zone's edge, as close
+    # as possible to where the real dock is, with its stop cell one step inwards
+    edge = [(x, y) for x in range(width) for y in range(height) if x in (0, width - 1) or y in (0, height - 1)]
+    edge.sort(key=lambda pos: (abs(pos[0] - towards[0]) + abs(pos[1] - towards[1]), pos))
+    for truck in edge:
+        inward = ((1 if truck[0] == 0 else -1 if truck[0] == width - 1 else 0),
+                  (1 if truck[1] == 0 else -1 if truck[1] == height - 1 else 0))
+        for step in ((inward[0], 0), (0, inward[1])):
+            stop = (truck[0] + step[0], truck[1] + step[1])
+            if step != (0, 0) and truck not in taken and stop not in taken:
+                return truck, stop
+    raise ValueError(f"No free edge cell for a dock port in a {width}x{height} zone")
+
+
+def zone_gateways(layouts, per_border=GATES_PER_BORDER):
+    # Per zone: [(neighbour zone, cell, index of the facing gateway in the neighbour's list, heading of
+    # a robot entering through it)], cells in zone coordinates. A border gets up to per_border pairs
+    # of open cells (reachable, no stop or dock) facing each other across the cut, spread along it
+    gateways = [[] for _ in layouts]
+    if len(layouts) < 2:
+        return gateways
+    axis = 0 if layouts[1][1][0] else 1
+
+    def cell(across, along):
+        return (across, along) if axis == 0 else (along, across)
+
+    inward = cell(1, 0)
+    for zone in range(len(layouts) - 1):
+        low, high = layouts[zone][0], layouts[zone + 1][0]
+        edge = (low.width, low.height)[axis] - 1
+        low_open, high_open = _open_cells(low), _open_cells(high)
+        candidates = [along for along in range((low.width, low.height)[1 - axis])
+                      if cell(edge, along) in low_open and cell(0, along) in high_open]
+        count = min(per_border, len(candidates))
+        for index in range(count):
+            along = candidates[(2 * index + 1) * len(candidates) // (2 * count)]
+            gateways[zone].append((zone + 1, cell(edge, along), len(gateways[zone + 1]), (-inward[0], -inward[1])))
+            gateways[zone + 1].append((zone, cell(0, along), len(gateways[zone]) - 1, inward))
+    return gateways
+
+
+def _open_cells(layout):
+    stops = set(layout.shelf_stops) | {layout.unload_stop, layout.load_stop}
+    return layout.reachable_from(layout.unload_stop) - stops
+
+
+class BorderDispatcher:
+    # The zone model's dispatcher for every robot except those called across a border, which are
+    # routed to their gateway
+
+    def __init__(self, dispatcher, worker):
+        self.dispatcher = dispatcher
+        self.worker = worker
+
+    def assign(self, robots, steady=()):
+        leaving = self.worker.leaving
+        self.dispatcher.assign([robot for robot in robots if robot not in leaving], steady)
+        for robot in robots:
+            gate = leaving.get(robot)
+            if gate is not None:
+                self.worker.model.plan_route(robot, self.worker.gateways[gate][1])
+
+    def keeps_destination(self, robot, pos):
+        gate = self.worker.leaving.get(robot)
+        if gate is None:
+            return self.dispatcher.keeps_destination(robot, pos)
+        return robot.destination == self.worker.gateways[gate][1]
+
+    def get_state(self):
+        return self.dispatcher.get_state()
+
+    def set_state(self, state):
+        self.dispatcher.set_state(state)
+
+
+class ZoneWorker:
+    # One zone's model plus its side of the board protocol
+    def __init__(self, zone, layout, num_robots, params, gateways=()):
+        self.zone = zone
+        self.model = WarehouseModel(layout.width, layout.height, num_robots, 0, layout=layout, k=0,
+                                    stop_when_empty=False, paths_file=None, log_level=None, **params)
+        self.model.dispatcher = BorderDispatcher(self.model.dispatcher, self)
+        self.gateways = list(gateways)
+        self.reserved = [None] * len(self.gateways)  # robot called to (or parked on) each gateway
+        self.leaving = {}  # robot -> gateway it was called to
+        self.handoffs = 0
+        # Every robot that has been in the zone: model id -> id in the merged run
+        self.global_ids = {robot.unique_id: zone * ROBOT_ID_STRIDE + robot.unique_id for robot in self.robots()}
+
+    def robots(self):
+        return [agent for agent in self.model.schedule.agents if isinstance(agent, Robot)]
+
+    def receive(self, board, gates):
+        model = self.model
+        first = int(board[self.zone, FIRST_ID])
+        grant = int(board[self.zone, GRANT])
+        if grant:
+            # Through the dock model: queued docks bring them in by truck (capacity, yard, turnaround)
+            model.docks.receive(range(first, first + grant))
+        rows = gates[self.zone]
+        # Departures first: a robot swapping with one parked the other way frees the cell it arrives on
+        for gate, robot in enumerate(self.reserved):
+            if rows[gate, DEPART]:
+                del self.leaving[robot]
+                self.reserved[gate] = None
+                model.remove_robot(robot)
+        for gate, (_, cell, _, heading) in enumerate(self.gateways):
+            if rows[gate, ARRIVE] != NO_ROBOT:
+                robot = model.add_robot(cell, ROLES[rows[gate, ARRIVE_ROLE]])
+                robot.heading = heading
+                self.global_ids[robot.unique_id] = int(rows[gate, ARRIVE])
+                # The step across the border, on the first tick of the epoch
+                model.trajectory.record(model.time_elapsed + 1, robot.unique_id, cell, "move")
+                robot.movements += 1
+                model.total_movements += 1
+                self.handoffs += 1
+        for gate in range(len(self.gateways)):
+            if rows[gate, CALL]:
+                self.call(gate)
+        self.park_arrived()
+
+    def call(self, gate):
+        # Sends the nearest robot without a package (ties: lowest id) to the gateway
+        cell = self.gateways[gate][1]
+        distance = self.model.navigation.distance
+        options = []
+        for robot in self.robots():
+            if robot.carrying_package is None and robot not in self.leaving:
+                steps = distance(robot.pos, cell)
+                if steps is not None:
+                    options.append((steps, robot.unique_id, robot))
+        if options:
+            robot = min(options, key=lambda option: option[:2])[2]
+            self.leaving[robot] = gate
+            self.reserved[gate] = robot
+
+    def park_arrived(self):
+        # Robots called across wait on their gateway for the next barrier
+        model = self.model
+        for gate, robot in enumerate(self.reserved):
+            if robot is not None and robot not in model.parked and robot.pos == self.gateways[gate][1]:
+                model.park(robot)
+
+    def run_epoch(self, ticks):
+        model = self.model
+        for _ in range(ticks):
+            if not model.running:
+                break
+            model.step()
+            self.park_arrived()
+
+    def publish(self, board, gates):
+        model = self.model
+        world = model.world
+        row = board[self.zone]
+        row[UNLOAD] = len(model.unload_truck.packages) + model.docks.incoming()  # queued docks: trucks in the yard too
+        row[CARRYING] = model.robots_carrying
+        row[DEMAND] = max(0, world.num_robots - len(self.leaving) - row[UNLOAD])
+        row[STORED] = model.total_packages_stored
+        row[OUTBOUND] = len(model.load_truck.packages)
+        row[DELIVERED] = model.total_packages_delivered
+        row[MOVEMENTS] = model.total_movements
+        row[TIME] = model.time_elapsed
+        row[RUNNING] = model.running
+        row[SPARE] = sum(1 for robot in self.robots() if robot.carrying_package is None and robot not in self.leaving)
+        rows = gates[self.zone]
+        for gate, (_, cell, _, _) in enumerate(self.gateways):
+            robot = self.reserved[gate]
+            parked = robot is not None and robot in model.parked
+            rows[gate, STATE] = PARKED if parked else BUSY if model.occupancy.is_occupied(cell) else FREE
+            rows[gate, RESERVED] = robot is not None
+            rows[gate, ROBOT] = self.global_ids[robot.unique_id] if parked else NO_ROBOT
+            rows[gate, ROLE] = ROLE_CODES[robot.role] if parked else 0
+
+    def result(self):
+        model = self.model
+        ticks, values = model.datacollector.arrays()
+        return {
+            "zone": self.zone,
+            "counters": {name: getattr(model, name) for name in SUMMED_COUNTERS},
+            "time_elapsed": model.time_elapsed,
+            "outbound": len(model.load_truck.packages),
+            "robot_ids": [[robot_id, global_id] for robot_id, global_id in self.global_ids.items()],
+            "handoffs": self.handoffs,
+            "docks": model.docks.metrics(),
+            "records": model.trajectory.records(),
+            "kpi_ticks": ticks,
+            "kpi_values": values,
+        }
+
+
+def _zone_process(zone, layout_data, layout_name, num_robots, params, gateways, epoch, memory_name, shapes,
+                  barrier, ready, results):
+    memory = shared_memory.SharedMemory(name=memory_name)
+    board, gates = _board_views(memory, shapes)
+    try:
+        worker = ZoneWorker(zone, Layout.from_dict(layout_data, name=layout_name), num_robots, params, gateways)
+        worker.publish(board, gates)
+        ready.put(zone)  # first demand is on the board
+        while True:
+            barrier.wait()  # grants and handoffs are on the board
+            if board[-1, STOP]:
+                break
+            worker.receive(board, gates)
+            worker.run_epoch(epoch)
+            worker.publish(board, gates)
+            barrier.wait()  # epoch done
+        results.put(worker.result())
+    except BaseException:
+        barrier.abort()  # release the coordinator and the other zones instead of leaving them waiting
+        raise
+    finally:
+        del board, gates
+        memory.close()
+
+
+def _board_views(memory, shapes):
+    # The board and the gateway table, one after the other in the shared block
+    board_shape, gates_shape = shapes
+    board = np.ndarray(board_shape, dtype=np.int64, buffer=memory.buf)
+    gates = np.ndarray(gates_shape, dtype=np.int64, buffer=memory.buf, offset=board.nbytes)
+    return board, gates
+
+
+class ZoneRun:
+    def __init__(self, layouts, zone_results, remaining_by_tick, initial_packages):
+        self.layouts = layouts
+        self.zones = sorted(zone_results, key=lambda result: result["zone"])
+        self.remaining_by_tick = remaining_by_tick  # [(tick, packages still at the unload dock)]
+        self.time_elapsed = max(result["time_elapsed"] for result in self.zones)
+        self.totals = {name: sum(result["counters"][name] for result in self.zones) for name in SUMMED_COUNTERS}
+        self.totals["packages_loaded"] = sum(result["outbound"] for result in self.zones)
+        self.totals["packages_at_unload_dock"] = remaining_by_tick[-1][1] if remaining_by_tick else initial_packages
+        self.totals["handoffs"] = sum(result["handoffs"] for result in self.zones)
+
+    def robot_id(self, zone, robot_id):
+        # Merged id of a zone model's robot
+        return dict(self.zones[zone]["robot_ids"])[robot_id]
+
+    def robot_ids(self):
+        # Every robot of the run once, in the zone it started in (arrivals: the zone it first entered)
+        seen = {}
+        for result in self.zones:
+            for _, global_id in result["robot_ids"]:
+                seen.setdefault(global_id, None)
+        return list(seen)
+
+    def records(self):
+        # Every zone's trajectory in floor coordinates and merged robot ids, ordered by tick then zone
+        parts = []
+        for result in self.zones:
+            records = result["records"].copy()
+            dx, dy = self.layouts[result["zone"]][1]
+            records["x"] += dx
+            records["y"] += dy
+            ids = np.array(result["robot_ids"], dtype=np.int64).reshape(-1, 2)
+            order = np.argsort(ids[:, 0])
+            records["robot"] = ids[order, 1][np.searchsorted(ids[order, 0], records["robot"])]
+            parts.append(records)
+        records = np.concatenate(parts)
+        return records[np.argsort(records["tick"], kind="stable")]
+
+    def kpis(self):
+        # (ticks, values) with KPI_LABELS columns, summed over the zones; the unload column also
+        # counts packages still waiting at the shared unload dock
+        ticks = self.zones[0]["kpi_ticks"]
+        values = np.zeros((len(ticks), len(KPI_LABELS)), dtype=np.int64)
+        for result in self.zones:
+            count = min(len(ticks), len(result["kpi_values"]))
+            values[:count] += result["kpi_values"][:count]
+        grant_ticks = np.array([tick for tick, _ in self.remaining_by_tick])
+        remaining = np.array([left for _, left in self.remaining_by_tick])
+        values[:, KPI_LABELS.index("Packages in Unload Truck")] += remaining[
+            np.searchsorted(grant_ticks, ticks, side="left") - 1]
+        return ticks, values
+
+    def export_paths_to_json(self, path):
+        recorder = TrajectoryRecorder(spill=False)
+        recorder.extend(self.records())
+        recorder.export_json(path, self.robot_ids())
+
+
+def _wait_ready(ready, workers, timeout):
+    # Workers can die while starting up (before they can break the barrier), so poll for them
+    started = set()
+    waited = 0
+    while len(started) < len(workers):
+        try:
+            started.add(ready.get(timeout=1))
+        except queue.Empty:
+            waited += 1
+            dead = [worker.name for worker in workers if worker.exitcode not in (None, 0)]
+            if dead or (timeout is not None and waited >= timeout):
+                raise RuntimeError(f"Zone workers did not start: {dead or 'timeout'}")
+
+
+def allocate(board, remaining):
+    # Packages per zone this epoch: one at a time in zone order while zones still want more
+    demand = board[:-1, DEMAND].copy()
+    grants = np.zeros(len(demand), dtype=np.int64)
+    while remaining and demand.any():
+        for zone in np.flatnonzero(demand):
+            if not remaining:
+                break
+            grants[zone] += 1
+            demand[zone] -= 1
+            remaining -= 1
+    return grants
+
+
+def plan_handoffs(board, gates, gateways):
+    # Barrier side of the robot handoffs, from what the zones published: which parked robots cross
+    # and which gateways call a robot. Needs this epoch's grants on the board
+    gates[:, :, CALL] = 0
+    gates[:, :, DEPART] = 0
+    gates[:, :, ARRIVE] = NO_ROBOT
+    running = board[:-1, RUNNING]
+    for zone, zone_gates in enumerate(gateways):
+        for gate, (neighbour, _, facing, _) in enumerate(zone_gates):
+            if (gates[zone, gate, STATE] == PARKED and running[zone] and running[neighbour]
+                    and gates[neighbour, facing, STATE] != BUSY):
+                gates[zone, gate, DEPART] = 1
+                gates[neighbour, facing, ARRIVE] = gates[zone, gate, ROBOT]
+                gates[neighbour, facing, ARRIVE_ROLE] = gates[zone, gate, ROLE]
+
+    # Idle robots (no package and none left to pick up in their zone this epoch) are called towards
+    # packages waiting in the next zone that none of its own free robots can take
+    backlog = board[:-1, UNLOAD] + board[:-1, GRANT]
+    idle = np.maximum(board[:-1, SPARE] - backlog, 0)
+    short = backlog - board[:-1, SPARE]
+    for zone, zone_gates in enumerate(gateways):
+        for gate, (neighbour, _, _, _) in enumerate(zone_gates):
+            if gates[zone, gate, RESERVED] and not gates[zone, gate, DEPART]:
+                short[neighbour] -= 1  # already on its way
+    for zone, zone_gates in enumerate(gateways):
+        for gate, (neighbour, _, _, _) in enumerate(zone_gates):
+            if (not gates[zone, gate, RESERVED] and running[zone] and running[neighbour]
+                    and idle[zone] > 0 and short[neighbour] > 0):
+                gates[zone, gate, CALL] = 1
+                idle[zone] -= 1
+                short[neighbour] -= 1
+
+
+def run_zones(width=None, height=None, num_robots=20, initial_packages=200, max_time=1000, zones=2, epoch=10,
+              layout=None, axis=None, processes=True, seed=0, timeout=600, gates_per_border=GATES_PER_BORDER,
+              **params):
+    # Extra keyword arguments (planner, dispatcher, step_mode, phase_size, ...) go to every zone model
+    floor = resolve_layout(layout, width, height)
+    layouts = split_layout(floor, zones, axis)
+    zones = len(layouts)
+    gateways = zone_gateways(layouts, gates_per_border)
+    robots = [num_robots // zones + (1 if index < num_robots % zones else 0) for index in range(zones)]
+    for (zone_layout, _), count in zip(layouts, robots):
+        if count > len(zone_layout.robot_spawns):
+            raise ValueError(f"Zone {zone_layout.name} has {len(zone_layout.robot_spawns)} spawn points, {count} robots assigned")
+    zone_params = [{**params, "max_time": max_time, "seed": seed * 1000 + index} for index in range(zones)]
+
+    shapes = ((zones + 1, BOARD_COLUMNS), (zones, max(1, max(len(zone_gates) for zone_gates in gateways)), GATE_COLUMNS))
+    size = sum(int(np.prod(shape)) for shape in shapes) * 8
+    memory = shared_memory.SharedMemory(create=True, size=size) if processes else None
+    if processes:
+        board, gates = _board_views(memory, shapes)
+    else:
+        board, gates = np.zeros(shapes[0], dtype=np.int64), np.zeros(shapes[1], dtype=np.int64)
+    board[:] = 0
+    gates[:] = 0
+    gates[:, :, ARRIVE] = NO_ROBOT
+    try:
+        if processes:
+            context = multiprocessing.get_context()
+            barrier = context.Barrier(zones + 1, timeout=timeout)
+            ready, results = context.Queue(), context.Queue()
+            workers = [context.Process(target=_zone_process, daemon=True,
+                                       args=(index, zone_layout.to_dict(), zone_layout.name, robots[index],
+                                             zone_params[index], gateways[index], epoch, memory.name, shapes,
+                                             barrier, ready, results))
+                       for index, (zone_layout, _) in enumerate(layouts)]
+            for worker in workers:
+                worker.start()
+            _wait_ready(ready, workers, timeout)
+        else:
+            workers = [ZoneWorker(index, zone_layout, robots[index], zone_params[index], gateways[index])
+                       for index, (zone_layout, _) in enumerate(layouts)]
+            for worker in workers:
+                worker.publish(board, gates)
+
+        remaining = initial_packages
+        next_package = PACKAGE_ID_BASE
+        remaining_by_tick = []
+        tick = 0
+        while True:
+            grants = allocate(board, remaining)
+            board[:-1, GRANT] = grants
+            board[:-1, FIRST_ID] = next_package + np.concatenate(([0], np.cumsum(grants)[:-1]))
+            next_package += int(grants.sum())
+            remaining -= int(grants.sum())
+            board[-1, REMAINING] = remaining
+            remaining_by_tick.append((tick, remaining))
+            plan_handoffs(board, gates, gateways)
+            if processes:
+                barrier.wait()
+                barrier.wait()
+            else:
+                for worker in workers:
+                    worker.receive(board, gates)
+                    worker.run_epoch(epoch)
+                    worker.publish(board, gates)
+            tick += epoch
+            drained = not remaining and not board[:-1, UNLOAD].any() and not board[:-1, CARRYING].any()
+            if drained or not board[:-1, RUNNING].any():
+                break
+
+        if processes:
+            board[-1, STOP] = 1
+            barrier.wait()
+            zone_results = [results.get(timeout=timeout) for _ in workers]
+            for worker in workers:
+                worker.join()
+        else:
+            zone_results = [worker.result() for worker in workers]
+    finally:
+        del board, gates
+        if memory is not None:
+            memory.close()
+            memory.unlink()
+    return ZoneRun(layouts, zone_results, remaining_by_tick, initial_packages)